@@ -0,0 +1,15 @@
+"""Package that defines benchmarks for the pyutils library.
+
+The benchmarks are not run by the :mod:`unittest` test runner. Each module can
+be executed at the root of the project directory, e.g.::
+
+    $ python -m benchmarks.bench_colored_logger
+
+The benchmark suite of the logging stack writes its results as JSON and can
+compare them with the results of a previous run in order to catch
+regressions::
+
+    $ python -m benchmarks.bench_logging_stack -o results.json \
+          --compare baseline.json
+
+"""
@@ -0,0 +1,186 @@
+"""Benchmark of the atomic writes of :mod:`~pyutils.genutils`.
+
+:func:`~pyutils.genutils.write_file`, :func:`~pyutils.genutils.dump_pickle`
+and :func:`~pyutils.genutils.dumps_json` are timed with each fsync policy
+('none', 'file' and 'file+dir') and compared with a direct (non-atomic) write
+to the file, i.e. how the files were written before the writes were atomic.
+
+The cost of fsync depends a lot on the storage, e.g. a tmpfs doesn't do
+anything when fsyncing. Use ``--dir`` to run the benchmark on the file system
+of the call site.
+
+The results are written as JSON and can be compared with a previous run::
+
+    $ python -m benchmarks.bench_atomic_write -o baseline.json
+    $ python -m benchmarks.bench_atomic_write --compare baseline.json
+
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from benchmarks.utils import (compare_results, get_metadata, load_results,
+                              write_results)
+from pyutils.genutils import dump_pickle, dumps_json, write_file
+
+POLICIES = ['direct', 'none', 'file', 'file+dir']
+
+
+def get_data(size):
+    """Get the data written by the benchmark.
+
+    Parameters
+    ----------
+    size : int
+        Approximate size in bytes of the data once serialized.
+
+    Returns
+    -------
+    text : str
+        The text written by :func:`~pyutils.genutils.write_file`.
+    records : list of dict
+        The records written by :func:`~pyutils.genutils.dump_pickle` and
+        :func:`~pyutils.genutils.dumps_json`.
+
+    """
+    text = ("x" * 79 + "\n") * max(1, size // 80)
+    records = [{'id': i, 'name': "item {}".format(i), 'value': i * 0.5}
+               for i in range(max(1, size // 50))]
+    return text, records
+
+
+def get_writers(text, records):
+    """Get the functions that write the data with each policy.
+
+    Parameters
+    ----------
+    text : str
+        The text written by :func:`~pyutils.genutils.write_file`.
+    records : list of dict
+        The records written by :func:`~pyutils.genutils.dump_pickle` and
+        :func:`~pyutils.genutils.dumps_json`.
+
+    Returns
+    -------
+    writers : dict
+        The functions that take the path of the file, keyed by (name of the
+        function, policy).
+
+    """
+    def direct_text(filepath):
+        with open(filepath, 'w') as f:
+            f.write(text)
+
+    def direct_pickle(filepath):
+        with open(filepath, 'wb') as f:
+            pickle.dump(records, f)
+
+    def direct_json(filepath):
+        with open(filepath, 'w', encoding='utf8') as f:
+            f.write(json.dumps(records, sort_keys=True, ensure_ascii=False))
+
+    writers = {
+        ('write_file', 'direct'): direct_text,
+        ('dump_pickle', 'direct'): direct_pickle,
+        ('dumps_json', 'direct'): direct_json
+    }
+    for policy in POLICIES[1:]:
+        writers[('write_file', policy)] = \
+            lambda path, p=policy: write_file(path, text, fsync=p)
+        writers[('dump_pickle', policy)] = \
+            lambda path, p=policy: dump_pickle(path, records, fsync=p)
+        writers[('dumps_json', policy)] = \
+            lambda path, p=policy: dumps_json(path, records, fsync=p)
+    return writers
+
+
+def time_writes(writer, filepath, number):
+    """Time the writes of a file.
+
+    Parameters
+    ----------
+    writer : function
+        The function that writes the file.
+    filepath : str
+        Path to the file.
+    number : int
+        Number of writes.
+
+    Returns
+    -------
+    float
+        The median time of a write in seconds.
+
+    """
+    times = []
+    for _ in range(number):
+        start = time.perf_counter()
+        writer(filepath)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    """Run the benchmark, write and compare the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fsync policies of the atomic writes")
+    parser.add_argument("-n", "--number", type=int, default=50,
+                        help="Number of writes per case")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+",
+                        default=[1024, 1024 ** 2],
+                        help="Sizes of the data in bytes")
+    parser.add_argument("-d", "--dir", default=None,
+                        help="Directory where the files are written (the "
+                             "default is a temporary directory)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path to the JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="Path to a JSON results file used as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown allowed before a case is "
+                             "reported as a regression")
+    args = parser.parse_args()
+    results = []
+    print("{:<36}{:>12}{:>12}".format("Case", "ms/write", "vs direct"),
+          file=sys.stderr)
+    with TemporaryDirectory(dir=args.dir) as tmpdir:
+        for size in args.sizes:
+            writers = get_writers(*get_data(size))
+            direct = {}
+            for (name, policy), writer in writers.items():
+                filepath = os.path.join(tmpdir, "{}.out".format(name))
+                seconds = time_writes(writer, filepath, args.number)
+                if policy == 'direct':
+                    direct[name] = seconds
+                case = "{} [{}] {} B".format(name, policy, size)
+                results.append({
+                    'name': case,
+                    'ms_per_write': seconds * 1e3,
+                    'overhead': seconds / direct[name]
+                })
+                print("{:<36}{:>12.3f}{:>12.2f}".format(
+                    case, seconds * 1e3, seconds / direct[name]),
+                    file=sys.stderr)
+    if args.output:
+        write_results(args.output, get_metadata(number=args.number,
+                                                sizes=args.sizes), results)
+    if args.compare:
+        baseline = load_results(args.compare)['results']
+        regressions = compare_results(results, baseline, 'ms_per_write',
+                                      args.tolerance, higher_is_better=False)
+        for name, old, new in regressions:
+            print("Regression in {}: {:.3f} -> {:.3f} ms".format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Micro-benchmarks for :mod:`~pyutils.colored_logger`.
+
+The cost of the logging calls whose level is disabled (e.g. a DEBUG call when
+the logger's level is WARNING) is compared between a plain
+:class:`logging.Logger` and a :class:`~pyutils.colored_logger.ColoredLogger`.
+The two should cost about the same since
+:class:`~pyutils.colored_logger.ColoredLogger` checks the level before doing
+anything with the message.
+
+Usage::
+
+    $ python -m benchmarks.bench_colored_logger
+
+"""
+
+import argparse
+import logging
+import timeit
+
+from pyutils.colored_logger import ColoredLogger
+
+
+def get_disabled_logger(logger_class, name):
+    """Get a logger whose level disables the DEBUG and INFO calls.
+
+    Parameters
+    ----------
+    logger_class : type
+        :class:`logging.Logger` or one of its subclasses.
+    name : str
+        Name of the logger.
+
+    Returns
+    -------
+    logger : logging.Logger
+        The logger with the WARNING level and a :class:`logging.NullHandler`.
+
+    """
+    logger = logger_class(name)
+    logger.setLevel(logging.WARNING)
+    logger.addHandler(logging.NullHandler())
+    return logger
+
+
+def time_call(fnc, number, repeat):
+    """Get the best time per call (in nanoseconds) of a function.
+
+    Parameters
+    ----------
+    fnc : function
+        The function to be timed. It is called without arguments.
+    number : int
+        Number of calls per run.
+    repeat : int
+        Number of runs. The best run is kept.
+
+    Returns
+    -------
+    float
+        Time per call in nanoseconds.
+
+    """
+    return min(timeit.repeat(fnc, number=number, repeat=repeat)) / number * 1e9
+
+
+def run_disabled_calls(number=200000, repeat=5):
+    """Time the disabled logging calls of the plain and colored loggers.
+
+    Parameters
+    ----------
+    number : int, optional
+        Number of calls per run (the default value is 200000).
+    repeat : int, optional
+        Number of runs (the default value is 5).
+
+    Returns
+    -------
+    results : dict
+        The time per call in nanoseconds, keyed by the name of the case.
+
+    """
+    plain = get_disabled_logger(logging.Logger, "bench.plain")
+    colored = get_disabled_logger(ColoredLogger, "bench.colored")
+    exc = TypeError("can only concatenate str (not 'int') to str")
+    cases = {
+        'Logger.debug': lambda: plain.debug("Item %s", 1),
+        'ColoredLogger.debug': lambda: colored.debug("Item %s", 1),
+        'ColoredLogger.debug (tags)':
+            lambda: colored.debug("Item <color>%s</color>", 1),
+        'ColoredLogger.info (exception)': lambda: colored.info(exc),
+        'ColoredLogger.log': lambda: colored.log(logging.DEBUG, "Item %s", 1)
+    }
+    return {name: time_call(fnc, number, repeat)
+            for name, fnc in cases.items()}
+
+
+def main():
+    """Run the benchmarks and print the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the disabled calls of ColoredLogger")
+    parser.add_argument("-n", "--number", type=int, default=200000,
+                        help="Number of calls per run")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Number of runs")
+    args = parser.parse_args()
+    results = run_disabled_calls(args.number, args.repeat)
+    baseline = results['Logger.debug']
+    print("{:<34}{:>12}{:>10}".format("Disabled call", "ns/call", "ratio"))
+    for name, ns in results.items():
+        print("{:<34}{:>12.1f}{:>10.2f}".format(name, ns, ns / baseline))
+
+
+if __name__ == '__main__':
+    main()
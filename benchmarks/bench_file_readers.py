@@ -0,0 +1,207 @@
+"""Benchmark of the file readers of :mod:`~pyutils.genutils`.
+
+A large text file is generated and read with
+:func:`~pyutils.genutils.read_file` and its streaming and memory-mapped
+companions. Each reader counts the newlines of the file so that all of its
+content is accessed.
+
+Each case runs in a new interpreter so that its peak RSS (resident set size)
+isn't polluted by the other cases. The throughput (MB/s), the peak RSS and the
+peak RSS minus the RSS before reading the file are reported.
+
+NOTE: the pages of a memory-mapped file that were accessed count in the RSS
+but they are backed by the file, i.e. the OS can evict them under memory
+pressure without swapping.
+
+The results are written as JSON and can be compared with a previous run::
+
+    $ python -m benchmarks.bench_file_readers -o baseline.json
+    $ python -m benchmarks.bench_file_readers --compare baseline.json
+
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from benchmarks.utils import (compare_results, get_metadata, get_peak_rss,
+                              load_results, write_results)
+
+# Size of the chunks read by the chunked readers
+CHUNK_SIZE = 1 << 20
+CASES = ['read_file', 'read_binary_file', 'iter_file (lines)',
+         'iter_file (binary chunks)', 'mmap_file']
+
+
+def count_newlines(case, filepath):
+    """Count the newlines of a file with one of the readers.
+
+    Parameters
+    ----------
+    case : str
+        Name of the reader, one of `CASES`.
+    filepath : str
+        Path to the file to be read.
+
+    Returns
+    -------
+    int
+        Number of newlines in the file.
+
+    """
+    from pyutils import genutils
+    if case == 'read_file':
+        return genutils.read_file(filepath).count("\n")
+    elif case == 'read_binary_file':
+        return genutils.read_binary_file(filepath).count(b"\n")
+    elif case == 'iter_file (lines)':
+        return sum(1 for _ in genutils.iter_file(filepath))
+    elif case == 'iter_file (binary chunks)':
+        return sum(chunk.count(b"\n") for chunk in genutils.iter_file(
+            filepath, chunk_size=CHUNK_SIZE, binary=True))
+    elif case == 'mmap_file':
+        view = genutils.mmap_file(filepath)
+        try:
+            # NOTE: only one chunk is copied at a time
+            return sum(bytes(view[i:i + CHUNK_SIZE]).count(b"\n")
+                       for i in range(0, len(view), CHUNK_SIZE))
+        finally:
+            view.release()
+    raise ValueError("Unknown case: {}".format(case))
+
+
+def run_child(case, filepath):
+    """Run a case in the current process and print its measures as JSON.
+
+    Parameters
+    ----------
+    case : str
+        Name of the reader, one of `CASES`.
+    filepath : str
+        Path to the file to be read.
+
+    """
+    # NOTE: the import isn't counted in the reading time
+    import pyutils.genutils
+    rss_before = get_peak_rss()
+    start = time.perf_counter()
+    nb_lines = count_newlines(case, filepath)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'nb_lines': nb_lines,
+                      'peak_rss': get_peak_rss(), 'rss_before': rss_before}))
+
+
+def run_case(case, filepath, repeat=3):
+    """Run a case in new interpreters and keep its best time.
+
+    Parameters
+    ----------
+    case : str
+        Name of the reader, one of `CASES`.
+    filepath : str
+        Path to the file to be read.
+    repeat : int, optional
+        Number of runs (the default value is 3).
+
+    Returns
+    -------
+    result : dict
+        The throughput in MB/s and the peak RSS in MB of the case.
+
+    """
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_file_readers",
+             "--child", case, filepath],
+            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        runs.append(json.loads(proc.stdout))
+    best = min(runs, key=lambda r: r['seconds'])
+    size_mb = os.path.getsize(filepath) / 1e6
+    peak_rss = max(r['peak_rss'] for r in runs)
+    return {
+        'name': case,
+        'mb_per_sec': size_mb / best['seconds'],
+        'seconds': best['seconds'],
+        'peak_rss_mb': peak_rss / 1e6,
+        'rss_delta_mb': max(r['peak_rss'] - r['rss_before']
+                            for r in runs) / 1e6,
+        'nb_lines': best['nb_lines']
+    }
+
+
+def write_test_file(filepath, size_mb):
+    """Write a text file made of log-like lines.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file to be written.
+    size_mb : int
+        Approximate size of the file in MB.
+
+    """
+    line = "2019-08-29 00:58:22 | scripts.scraper | INFO | Processing item " \
+           "{:08d}\n"
+    lines_per_block = 10000
+    block_size = len(line.format(0)) * lines_per_block
+    with open(filepath, 'w') as f:
+        for b in range(max(1, size_mb * 10 ** 6 // block_size)):
+            f.write("".join(line.format(b * lines_per_block + i)
+                            for i in range(lines_per_block)))
+
+
+def main():
+    """Run the benchmark, write and compare the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the file readers of pyutils.genutils")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "FILE"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("-s", "--size", type=int, default=512,
+                        help="Size of the file in MB")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of runs per case")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path to the JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="Path to a JSON results file used as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown allowed before a case is "
+                             "reported as a regression")
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+    results = []
+    with TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "bench.txt")
+        write_test_file(filepath, args.size)
+        print("{:<28}{:>10}{:>14}{:>14}".format(
+            "Reader", "MB/s", "peak RSS MB", "RSS delta MB"), file=sys.stderr)
+        for case in CASES:
+            result = run_case(case, filepath, args.repeat)
+            results.append(result)
+            print("{:<28}{:>10.1f}{:>14.1f}{:>14.1f}".format(
+                case, result['mb_per_sec'], result['peak_rss_mb'],
+                result['rss_delta_mb']), file=sys.stderr)
+    if args.output:
+        write_results(args.output, get_metadata(size_mb=args.size,
+                                                repeat=args.repeat), results)
+    if args.compare:
+        baseline = load_results(args.compare)['results']
+        regressions = compare_results(results, baseline, 'mb_per_sec',
+                                      args.tolerance)
+        for name, old, new in regressions:
+            print("Regression in {}: {:.1f} -> {:.1f} MB/s".format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark of the import time of the pyutils modules.
+
+Each module is imported in a new interpreter started with ``-X importtime``
+and the cumulative import time reported by Python is parsed. The imports are
+repeated and the median is kept. The modules imported by each pyutils module
+which take the most time are also reported.
+
+The results are written as JSON and can be compared with a previous run::
+
+    $ python -m benchmarks.bench_import_time -o baseline.json
+    $ python -m benchmarks.bench_import_time --compare baseline.json
+
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+from benchmarks.utils import (compare_results, get_metadata, load_results,
+                              write_results)
+
+MODULES = ['pyutils', 'pyutils.colored_logger', 'pyutils.dbutils',
+           'pyutils.webcache']
+
+
+def parse_importtime(output):
+    """Parse the output of ``python -X importtime``.
+
+    Parameters
+    ----------
+    output : str
+        The lines written to stderr by the interpreter, e.g.::
+
+            import time: self [us] | cumulative | imported package
+            import time:       388 |        388 |   pyutils
+
+    Returns
+    -------
+    times : dict
+        The (self, cumulative) times in microseconds keyed by module name.
+
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def time_import(module, repeat=10):
+    """Get the import times of a module in new interpreters.
+
+    Parameters
+    ----------
+    module : str
+        Name of the module, e.g. 'pyutils.dbutils'.
+    repeat : int, optional
+        Number of imports (the default value is 10).
+
+    Returns
+    -------
+    result : dict
+        The median cumulative import time of the module in microseconds and
+        the median self times of the modules it imports.
+
+    Raises
+    ------
+    ImportError
+        Raised if the module can't be imported, e.g. a dependency is missing.
+
+    """
+    cumulative = []
+    self_times = {}
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             "import {}".format(module)],
+            stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode:
+            raise ImportError("{} can't be imported: {}".format(
+                module, proc.stderr.strip().splitlines()[-1]))
+        times = parse_importtime(proc.stderr)
+        cumulative.append(times[module][1])
+        for name, (self_us, _) in times.items():
+            self_times.setdefault(name, []).append(self_us)
+    top = sorted(((statistics.median(v), k) for k, v in self_times.items()),
+                 reverse=True)[:10]
+    return {
+        'name': module,
+        'cumulative_us': statistics.median(cumulative),
+        'min_cumulative_us': min(cumulative),
+        'top_self_us': {name: us for us, name in top}
+    }
+
+
+def main():
+    """Run the benchmark, write and compare the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the import time of the pyutils modules")
+    parser.add_argument("-r", "--repeat", type=int, default=10,
+                        help="Number of imports per module")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path to the JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="Path to a JSON results file used as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown allowed before a module is "
+                             "reported as a regression")
+    args = parser.parse_args()
+    results = []
+    print("{:<28}{:>16}".format("Module", "cumulative us"), file=sys.stderr)
+    for module in MODULES:
+        try:
+            result = time_import(module, args.repeat)
+        except ImportError as e:
+            print("{:<28}{:>16}".format(module, "skipped"), file=sys.stderr)
+            print("  {}".format(e), file=sys.stderr)
+            continue
+        results.append(result)
+        print("{:<28}{:>16.0f}".format(module, result['cumulative_us']),
+              file=sys.stderr)
+    if args.output:
+        write_results(args.output, get_metadata(repeat=args.repeat), results)
+    if args.compare:
+        baseline = load_results(args.compare)['results']
+        regressions = compare_results(results, baseline, 'cumulative_us',
+                                      args.tolerance, higher_is_better=False)
+        for name, old, new in regressions:
+            print("Regression in {}: {:.0f} -> {:.0f} us".format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""Benchmark of :func:`~pyutils.genutils.dumps_json` on large documents.
+
+A list of records whose JSON representation is about ``--size`` MB (100 MB by
+default) is written with:
+
+- baseline: :func:`json.dumps` and a file opened with :func:`codecs.open`,
+  i.e. how :func:`~pyutils.genutils.dumps_json` used to write the documents
+- dumps_json: the whole document serialized at once
+- dumps_json (stream): the document serialized and written element by element
+- the same two cases with ``encoder='auto'``, i.e. :mod:`orjson` or
+  :mod:`ujson` if one of them is installed
+
+Each case runs in a new interpreter so that its peak RSS (resident set size)
+isn't polluted by the other cases. The throughput (MB/s) and the peak RSS
+minus the RSS after building the records are reported. All the cases use the
+fsync policy 'none' so that the serialization is measured, not the storage.
+
+The results are written as JSON and can be compared with a previous run::
+
+    $ python -m benchmarks.bench_json_dump -o baseline.json
+    $ python -m benchmarks.bench_json_dump --compare baseline.json
+
+"""
+
+import argparse
+import codecs
+import json
+import os
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from benchmarks.utils import (compare_results, get_metadata, get_peak_rss,
+                              load_results, write_results)
+
+CASES = ['baseline', 'dumps_json', 'dumps_json (stream)',
+         'dumps_json (auto)', 'dumps_json (auto, stream)']
+# Approximate size of the JSON representation of a record
+RECORD_SIZE = 150
+
+
+def get_records(size_mb):
+    """Get the records written by the benchmark.
+
+    Parameters
+    ----------
+    size_mb : int
+        Approximate size in MB of the JSON representation of the records.
+
+    Returns
+    -------
+    list of dict
+        The records.
+
+    """
+    return [{'id': i, 'name': "item {}".format(i), 'price': i * 0.25,
+             'tags': ["tag{}".format(i % 10), "café"], 'active': i % 2 == 0,
+             'description': "Record number {:010d}".format(i)}
+            for i in range(size_mb * 10 ** 6 // RECORD_SIZE)]
+
+
+def dump(case, records, filepath):
+    """Write the records as JSON with one of the cases.
+
+    Parameters
+    ----------
+    case : str
+        Name of the case, one of `CASES`.
+    records : list of dict
+        The records to be written.
+    filepath : str
+        Path to the JSON file.
+
+    """
+    from pyutils.genutils import dumps_json
+    if case == 'baseline':
+        with codecs.open(filepath, 'w', 'utf8') as f:
+            f.write(json.dumps(records, sort_keys=True, ensure_ascii=False))
+    elif case == 'dumps_json':
+        dumps_json(filepath, records, fsync='none')
+    elif case == 'dumps_json (stream)':
+        dumps_json(filepath, records, fsync='none', stream=True)
+    elif case == 'dumps_json (auto)':
+        dumps_json(filepath, records, fsync='none', encoder='auto')
+    elif case == 'dumps_json (auto, stream)':
+        dumps_json(filepath, records, fsync='none', stream=True,
+                   encoder='auto')
+    else:
+        raise ValueError("Unknown case: {}".format(case))
+
+
+def run_child(case, size_mb, filepath):
+    """Run a case in the current process and print its measures as JSON.
+
+    Parameters
+    ----------
+    case : str
+        Name of the case, one of `CASES`.
+    size_mb : str
+        Approximate size in MB of the JSON document.
+    filepath : str
+        Path to the JSON file.
+
+    """
+    # NOTE: the import isn't counted in the writing time
+    import pyutils.genutils
+    records = get_records(int(size_mb))
+    rss_before = get_peak_rss()
+    start = time.perf_counter()
+    dump(case, records, filepath)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'peak_rss': get_peak_rss(),
+                      'rss_before': rss_before}))
+
+
+def run_case(case, size_mb, filepath, repeat=3):
+    """Run a case in new interpreters and keep its best time.
+
+    Parameters
+    ----------
+    case : str
+        Name of the case, one of `CASES`.
+    size_mb : int
+        Approximate size in MB of the JSON document.
+    filepath : str
+        Path to the JSON file.
+    repeat : int, optional
+        Number of runs (the default value is 3).
+
+    Returns
+    -------
+    result : dict
+        The throughput in MB/s and the extra peak RSS in MB of the case.
+
+    """
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_json_dump", "--child",
+             case, str(size_mb), filepath],
+            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        runs.append(json.loads(proc.stdout))
+    best = min(runs, key=lambda r: r['seconds'])
+    output_mb = os.path.getsize(filepath) / 1e6
+    return {
+        'name': case,
+        'mb_per_sec': output_mb / best['seconds'],
+        'seconds': best['seconds'],
+        'output_mb': output_mb,
+        'rss_delta_mb': max(r['peak_rss'] - r['rss_before']
+                            for r in runs) / 1e6
+    }
+
+
+def main():
+    """Run the benchmark, write and compare the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark dumps_json() on large JSON documents")
+    parser.add_argument("--child", nargs=3, metavar=("CASE", "SIZE", "FILE"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("-s", "--size", type=int, default=100,
+                        help="Size of the JSON document in MB")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of runs per case")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path to the JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="Path to a JSON results file used as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown allowed before a case is "
+                             "reported as a regression")
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+    results = []
+    print("{:<28}{:>10}{:>12}{:>14}".format(
+        "Case", "MB/s", "output MB", "RSS delta MB"), file=sys.stderr)
+    with TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "bench.json")
+        for case in CASES:
+            result = run_case(case, args.size, filepath, args.repeat)
+            results.append(result)
+            print("{:<28}{:>10.1f}{:>12.1f}{:>14.1f}".format(
+                case, result['mb_per_sec'], result['output_mb'],
+                result['rss_delta_mb']), file=sys.stderr)
+    if args.output:
+        write_results(args.output, get_metadata(size_mb=args.size,
+                                                repeat=args.repeat), results)
+    if args.compare:
+        baseline = load_results(args.compare)['results']
+        regressions = compare_results(results, baseline, 'mb_per_sec',
+                                      args.tolerance)
+        for name, old, new in regressions:
+            print("Regression in {}: {:.1f} -> {:.1f} MB/s".format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Throughput benchmark of :class:`~pyutils.logutils.JsonFormatter`.
+
+The log records are created beforehand and only their formatting is timed on
+a single core. The target is at least 100k records per second.
+:class:`logging.Formatter` and :func:`json.dumps` of a :obj:`dict` built for
+each record are given for comparison.
+
+Usage::
+
+    $ python -m benchmarks.bench_json_formatter
+
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from pyutils.logutils import JsonFormatter
+
+
+def make_records(nb_records):
+    """Create log records with and without color tags.
+
+    Parameters
+    ----------
+    nb_records : int
+        Number of log records to be created.
+
+    Returns
+    -------
+    records : list of logging.LogRecord
+        The log records.
+
+    """
+    logger = logging.getLogger("bench.json")
+    records = []
+    for i in range(nb_records):
+        if i % 2:
+            msg, args = "Waiting <color>%d</color> seconds...", (i % 10,)
+        else:
+            msg, args = "200: OK for %s", ("https://example.com/%d" % i,)
+        records.append(logger.makeRecord(logger.name, logging.INFO, __file__,
+                                         i, msg, args, None))
+    return records
+
+
+def format_with_dict(record):
+    """Format a log record by building a :obj:`dict` and calling
+    :func:`json.dumps`.
+    """
+    return json.dumps({'asctime': record.created, 'name': record.name,
+                       'levelname': record.levelname,
+                       'message': record.getMessage()})
+
+
+def time_formatting(format_fnc, records):
+    """Get the number of log records formatted per second.
+
+    Parameters
+    ----------
+    format_fnc : function
+        The function that formats one log record.
+    records : list of logging.LogRecord
+        The log records to be formatted.
+
+    Returns
+    -------
+    float
+        Number of log records formatted per second.
+
+    """
+    start = time.perf_counter()
+    for record in records:
+        format_fnc(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def main():
+    """Run the benchmarks and print the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the JSON formatter")
+    parser.add_argument("-n", "--records", type=int, default=200000,
+                        help="Number of log records")
+    args = parser.parse_args()
+    records = make_records(args.records)
+    cases = {
+        'logging.Formatter': logging.Formatter(
+            "%(asctime)s | %(name)s | %(levelname)s | %(message)s").format,
+        'json.dumps(dict)': format_with_dict,
+        'JsonFormatter': JsonFormatter().format,
+        'JsonFormatter (no asctime)': JsonFormatter(
+            fields=['created', 'name', 'levelname', 'message']).format
+    }
+    print("{:<30}{:>14}".format("Formatter", "records/s"))
+    for name, format_fnc in cases.items():
+        print("{:<30}{:>14.0f}".format(name,
+                                       time_formatting(format_fnc, records)))
+
+
+if __name__ == '__main__':
+    main()
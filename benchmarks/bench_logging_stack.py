@@ -0,0 +1,229 @@
+"""Benchmark suite for the logging stack of pyutils.
+
+The number of messages per second and the percentiles of the latency per
+call are measured for every combination of:
+
+- logger: plain :class:`logging.Logger`,
+  :class:`~pyutils.colored_logger.ColoredLogger` with messages without tags
+  and with ``<color>`` tags
+- handlers: console only, file only, and console plus file, as configured by
+  :func:`~pyutils.logutils.setup_basic_logger`
+- callers: single-threaded and multi-threaded
+
+The console handlers write to :data:`os.devnull` and the file handlers to a
+temporary directory. Thus, the benchmark runs offline.
+
+The results are written as JSON so that two runs can be compared, e.g.::
+
+    $ python -m benchmarks.bench_logging_stack -o baseline.json
+    $ python -m benchmarks.bench_logging_stack -o new.json \\
+          --compare baseline.json --tolerance 0.2
+
+The last command exits with status 1 if a case got slower than the baseline by
+more than the tolerance.
+
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+from tempfile import TemporaryDirectory
+
+from benchmarks.utils import (compare_results, get_metadata, get_percentiles,
+                              load_results, write_results)
+from pyutils.colored_logger import ColoredLogger
+from pyutils.logutils import setup_basic_logger
+
+# Loggers: (logger class, message)
+LOGGERS = {
+    'plain': (logging.Logger, "Processing item %d..."),
+    'colored': (ColoredLogger, "Processing item %d..."),
+    'colored_tags': (ColoredLogger, "Processing <color>item %d</color>...")
+}
+# Handlers: (add_console_handler, add_file_handler)
+HANDLERS = {
+    'console': (True, False),
+    'file': (False, True),
+    'console_file': (True, True)
+}
+
+
+def get_logger(name, logger_class, add_console_handler, add_file_handler,
+               log_filepath, devnull):
+    """Setup a logger with :func:`~pyutils.logutils.setup_basic_logger`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the logger.
+    logger_class : type
+        :class:`logging.Logger` or :class:`~pyutils.colored_logger.ColoredLogger`.
+    add_console_handler : bool
+        Whether a console handler is added.
+    add_file_handler : bool
+        Whether a file handler is added.
+    log_filepath : str
+        Path to the log file.
+    devnull : file object
+        The stream used by the console handler instead of :obj:`sys.stderr`.
+
+    Returns
+    -------
+    logger : logging.Logger
+        The logger.
+
+    """
+    manager = logging.Logger.manager
+    old_logger_class = manager.loggerClass
+    manager.setLoggerClass(logger_class)
+    try:
+        # The console handler gets sys.stderr when it is created
+        with contextlib.redirect_stderr(devnull):
+            logger = setup_basic_logger(
+                name, add_console_handler=add_console_handler,
+                add_file_handler=add_file_handler, log_filepath=log_filepath,
+                remove_all_initial_handlers=True)
+    finally:
+        manager.loggerClass = old_logger_class
+    logger.propagate = False
+    return logger
+
+
+def run_case(logger, msg, nb_threads, nb_messages):
+    """Log messages from one or many threads and time each call.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        The logger used for logging.
+    msg : str
+        The message with a placeholder for the number of the message.
+    nb_threads : int
+        Number of threads logging at the same time.
+    nb_messages : int
+        Number of messages logged per thread.
+
+    Returns
+    -------
+    elapsed : float
+        Time in seconds for all the threads to log their messages.
+    latencies : list of int
+        Time in nanoseconds of each call.
+
+    """
+    barrier = threading.Barrier(nb_threads + 1)
+    samples = [[] for _ in range(nb_threads)]
+
+    def log_messages(thread_samples):
+        perf_counter_ns = time.perf_counter_ns
+        append = thread_samples.append
+        barrier.wait()
+        for i in range(nb_messages):
+            start = perf_counter_ns()
+            logger.info(msg, i)
+            append(perf_counter_ns() - start)
+
+    threads = [threading.Thread(target=log_messages, args=(s,))
+               for s in samples]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, [ns for thread_samples in samples for ns in thread_samples]
+
+
+def run_suite(nb_messages=20000, threads=(1, 4)):
+    """Run all the benchmark cases.
+
+    Parameters
+    ----------
+    nb_messages : int, optional
+        Number of messages logged per thread (the default value is 20000).
+    threads : tuple of int, optional
+        The numbers of threads tested (the default value is (1, 4)).
+
+    Returns
+    -------
+    results : list of dict
+        The results of each case.
+
+    """
+    results = []
+    with TemporaryDirectory() as tmpdir, open(os.devnull, 'w') as devnull:
+        for logger_name, (logger_class, msg) in LOGGERS.items():
+            for handlers_name, (add_console, add_file) in HANDLERS.items():
+                for nb_threads in threads:
+                    name = "{}-{}-{}threads".format(logger_name, handlers_name,
+                                                    nb_threads)
+                    logger = get_logger(
+                        "bench.stack." + name, logger_class, add_console,
+                        add_file, os.path.join(tmpdir, name + ".log"), devnull)
+                    elapsed, latencies = run_case(logger, msg, nb_threads,
+                                                  nb_messages)
+                    for h in list(logger.handlers):
+                        h.close()
+                        logger.removeHandler(h)
+                    total = nb_threads * nb_messages
+                    results.append({
+                        'name': name,
+                        'logger': logger_name,
+                        'handlers': handlers_name,
+                        'threads': nb_threads,
+                        'messages': total,
+                        'seconds': elapsed,
+                        'msgs_per_sec': total / elapsed,
+                        'latency_ns': get_percentiles(latencies)
+                    })
+    return results
+
+
+def main():
+    """Run the benchmark suite, write and compare the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the logging stack of pyutils")
+    parser.add_argument("-m", "--messages", type=int, default=20000,
+                        help="Number of messages logged per thread")
+    parser.add_argument("-t", "--threads", default="1,4",
+                        help="Comma-separated numbers of threads")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Path to the JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="Path to a JSON results file used as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown allowed before a case is "
+                             "reported as a regression")
+    args = parser.parse_args()
+    threads = tuple(int(t) for t in args.threads.split(","))
+    results = run_suite(args.messages, threads)
+    print("{:<36}{:>12}{:>10}{:>10}{:>10}".format(
+        "Case", "msgs/s", "p50 ns", "p99 ns", "p99.9 ns"), file=sys.stderr)
+    for r in results:
+        lat = r['latency_ns']
+        print("{:<36}{:>12.0f}{:>10}{:>10}{:>10}".format(
+            r['name'], r['msgs_per_sec'], lat['p50'], lat['p99'],
+            lat['p99.9']), file=sys.stderr)
+    if args.output:
+        write_results(args.output,
+                      get_metadata(messages=args.messages, threads=threads),
+                      results)
+    if args.compare:
+        baseline = load_results(args.compare)['results']
+        regressions = compare_results(results, baseline, 'msgs_per_sec',
+                                      args.tolerance)
+        for name, old, new in regressions:
+            print("Regression in {}: {:.0f} -> {:.0f} msgs/s".format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
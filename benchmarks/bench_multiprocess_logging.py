@@ -0,0 +1,176 @@
+"""Throughput benchmark of logging from many worker processes.
+
+Two setups are compared:
+
+- direct: each worker process calls
+  :func:`~pyutils.logutils.setup_basic_logger` with ``add_file_handler=True``
+  and writes to the same log file
+- collector: the worker processes send their log records to a
+  :class:`~pyutils.logutils.LogCollector` which is the only process writing
+  to the log file
+
+The number of log lines per second and the number of corrupted lines (e.g.
+interleaved writes) are reported.
+
+Usage::
+
+    $ python -m benchmarks.bench_multiprocess_logging
+
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+
+from pyutils.logutils import (LogCollector, init_worker_logging,
+                              setup_basic_logger)
+
+LOGGER_NAME = "bench.worker"
+# Pattern of a valid log line
+LINE_REGEX = re.compile(r"^Task \d+: message \d+$")
+
+
+def log_direct(log_filepath, task, nb_messages):
+    """Log messages from a worker process which writes to the log file.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file shared by all the worker processes.
+    task : int
+        Number of the task.
+    nb_messages : int
+        Number of messages to be logged.
+
+    """
+    logger = setup_basic_logger(LOGGER_NAME, add_file_handler=True,
+                                log_filepath=log_filepath,
+                                remove_all_initial_handlers=True)
+    logger.propagate = False
+    for i in range(nb_messages):
+        logger.info("Task %d: message %d", task, i)
+    for h in logger.handlers:
+        h.flush()
+
+
+def log_to_collector(task, nb_messages):
+    """Log messages from a worker process initialized with
+    :func:`~pyutils.logutils.init_worker_logging`.
+
+    Parameters
+    ----------
+    task : int
+        Number of the task.
+    nb_messages : int
+        Number of messages to be logged.
+
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for i in range(nb_messages):
+        logger.info("Task %d: message %d", task, i)
+
+
+def count_lines(log_filepath):
+    """Count the valid and corrupted lines of a log file.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file.
+
+    Returns
+    -------
+    nb_valid, nb_corrupted : tuple of int
+        The number of valid lines and the number of corrupted lines.
+
+    """
+    nb_valid = nb_corrupted = 0
+    with open(log_filepath) as f:
+        for line in f:
+            if LINE_REGEX.match(line.rstrip("\n")):
+                nb_valid += 1
+            else:
+                nb_corrupted += 1
+    return nb_valid, nb_corrupted
+
+
+def run_direct(log_filepath, nb_workers, nb_tasks, nb_messages):
+    """Time the setup where each worker process writes to the log file.
+
+    Returns
+    -------
+    float
+        Elapsed time in seconds.
+
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        futures = [executor.submit(log_direct, log_filepath, task, nb_messages)
+                   for task in range(nb_tasks)]
+        for f in futures:
+            f.result()
+    return time.perf_counter() - start
+
+
+def run_collector(log_filepath, nb_workers, nb_tasks, nb_messages):
+    """Time the setup where the worker processes send their log records to a
+    :class:`~pyutils.logutils.LogCollector`.
+
+    Returns
+    -------
+    float
+        Elapsed time in seconds.
+
+    """
+    logger = setup_basic_logger(LOGGER_NAME, add_file_handler=True,
+                                log_filepath=log_filepath,
+                                remove_all_initial_handlers=True)
+    logger.propagate = False
+    start = time.perf_counter()
+    with LogCollector() as collector:
+        with ProcessPoolExecutor(max_workers=nb_workers,
+                                 initializer=init_worker_logging,
+                                 initargs=(collector.queue,)) as executor:
+            futures = [executor.submit(log_to_collector, task, nb_messages)
+                       for task in range(nb_tasks)]
+            for f in futures:
+                f.result()
+    elapsed = time.perf_counter() - start
+    for h in logger.handlers:
+        h.close()
+        logger.removeHandler(h)
+    return elapsed
+
+
+def main():
+    """Run the benchmarks and print the results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark logging from many worker processes")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Number of worker processes")
+    parser.add_argument("-t", "--tasks", type=int, default=8,
+                        help="Number of tasks")
+    parser.add_argument("-m", "--messages", type=int, default=20000,
+                        help="Number of messages logged per task")
+    args = parser.parse_args()
+    nb_lines = args.tasks * args.messages
+    print("{:<12}{:>12}{:>14}{:>12}{:>12}".format(
+        "Setup", "seconds", "lines/s", "valid", "corrupted"))
+    with TemporaryDirectory() as tmpdir:
+        for name, run in [("direct", run_direct),
+                          ("collector", run_collector)]:
+            log_filepath = os.path.join(tmpdir, "{}.log".format(name))
+            elapsed = run(log_filepath, args.workers, args.tasks,
+                          args.messages)
+            nb_valid, nb_corrupted = count_lines(log_filepath)
+            print("{:<12}{:>12.3f}{:>14.0f}{:>12}{:>12}".format(
+                name, elapsed, nb_lines / elapsed, nb_valid, nb_corrupted))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Functions used by the benchmarks.
+
+The results of the benchmarks are written as JSON so that they can be
+compared between two runs, e.g. before and after a change in
+:mod:`~pyutils.colored_logger` or :mod:`~pyutils.logutils`.
+
+"""
+
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+import pyutils
+
+
+def compare_results(results, baseline_results, key, tolerance=0.1,
+                    higher_is_better=True):
+    """Find the benchmark cases that regressed compared to a baseline.
+
+    The cases are matched by their ``name``.
+
+    Parameters
+    ----------
+    results : list of dict
+        The results of the current run.
+    baseline_results : list of dict
+        The results of the baseline run.
+    key : str
+        The metric compared, e.g. 'msgs_per_sec'.
+    tolerance : float, optional
+        The relative change allowed before a case is considered as a
+        regression (the default value is 0.1, i.e. 10%).
+    higher_is_better : bool, optional
+        Whether a higher value of the metric is better (the default value is
+        True).
+
+    Returns
+    -------
+    regressions : list of tuple
+        The regressions as (name, baseline value, current value).
+
+    """
+    baseline = {r['name']: r[key] for r in baseline_results}
+    regressions = []
+    for r in results:
+        if r['name'] not in baseline:
+            continue
+        old, new = baseline[r['name']], r[key]
+        if higher_is_better:
+            regressed = new < old * (1 - tolerance)
+        else:
+            regressed = new > old * (1 + tolerance)
+        if regressed:
+            regressions.append((r['name'], old, new))
+    return regressions
+
+
+def get_metadata(**params):
+    """Get information about the machine and the run of a benchmark.
+
+    Parameters
+    ----------
+    **params
+        The parameters of the benchmark, e.g. the number of messages.
+
+    Returns
+    -------
+    dict
+        The metadata of the run.
+
+    """
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pyutils': pyutils.__version__,
+        'argv': sys.argv,
+        'params': params
+    }
+
+
+def get_peak_rss():
+    """Get the peak RSS (resident set size) of the current process.
+
+    Returns
+    -------
+    int
+        The peak RSS in bytes.
+
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_percentiles(samples, percents=(50, 90, 99, 99.9)):
+    """Get percentiles of samples with the nearest-rank method.
+
+    Parameters
+    ----------
+    samples : list of float
+        The samples, e.g. latencies in nanoseconds.
+    percents : tuple of float, optional
+        The percentiles to compute (the default value is (50, 90, 99, 99.9)).
+
+    Returns
+    -------
+    dict
+        The percentiles keyed by name, e.g. 'p50' and 'p99.9'.
+
+    """
+    samples = sorted(samples)
+    n = len(samples)
+    percentiles = {}
+    for p in percents:
+        rank = min(max(int(round(p / 100 * n + 0.5)) - 1, 0), n - 1)
+        percentiles['p{:g}'.format(p)] = samples[rank]
+    return percentiles
+
+
+def load_results(filepath):
+    """Load the results of a benchmark from a JSON file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the JSON file written by :func:`write_results`.
+
+    Returns
+    -------
+    dict
+        The metadata and results of the benchmark.
+
+    """
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def write_results(filepath, metadata, results):
+    """Write the results of a benchmark in a JSON file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the JSON file. If it is '-', the results are written to
+        stdout.
+    metadata : dict
+        The metadata of the run (see :func:`get_metadata`).
+    results : list of dict
+        The results of the benchmark cases.
+
+    """
+    data = json.dumps({'metadata': metadata, 'results': results}, indent=2,
+                      sort_keys=True)
+    if filepath == '-':
+        print(data)
+    else:
+        with open(filepath, 'w') as f:
+            f.write(data + "\n")
@@ -3,18 +3,38 @@
 """
 
 
-def install_colored_logger():
+def install_colored_logger(async_mode=False, queue_size=10000,
+                           overflow_policy="block"):
     """TODO
 
-    Returns
-    -------
+    Parameters
+    ----------
+    async_mode : bool, optional
+        Whether the ColoredLoggers put their log records in a queue and let a
+        background thread do the rendering of the colors and the I/O (the
+        default value is False which implies that the log records are handled
+        in the logging thread).
+    queue_size : int, optional
+        Maximum number of log records waiting in the queue when `async_mode`
+        is True (the default value is 10000).
+    overflow_policy : str, {'block', 'drop-oldest', 'drop-new'}, optional
+        What to do with a new log record when the queue is full and
+        `async_mode` is True (the default value is 'block' which implies that
+        the logging thread waits for a free slot in the queue).
+
+    Raises
+    ------
+    ValueError
+        Raised if the overflow policy is not supported.
 
     """
     import logging
-    from pyutils.colored_logger import ColoredLogger
+    from pyutils import colored_logger
     # if name in logging.Logger.manager.loggerDict:
     #    del logging.Logger.manager.loggerDict[name]
-    logging.Logger.manager.setLoggerClass(ColoredLogger)
+    logging.Logger.manager.setLoggerClass(colored_logger.ColoredLogger)
+    if async_mode:
+        colored_logger.start_async_mode(queue_size, overflow_policy)
 
 
 def uninstall_colored_logger():
@@ -33,6 +53,8 @@ def uninstall_colored_logger():
     # Check logging.Logger.manager.loggerDict and you will some have
     # ColoredLogger as the logger class. Right now, not a big problem.
     colored_logger._disableColoring = True
+    # Handle the queued log records before going back to synchronous logging
+    colored_logger.stop_async_mode()
 
 
 # Version of pyutils package
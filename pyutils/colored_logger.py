@@ -12,12 +12,11 @@ Attributes
 ----------
 _nameToLevel : list of str
     The list of logging levels' names as supported by :mod:`logging`.
-_levelToColoredMessage : dict
-    Dictionary that defines a template for writing messages with colors based
-    on the name of the log level.
+_levelToSgrParams : dict
+    Dictionary that defines the SGR parameters of the ANSI escape sequence
+    that colors messages based on the name of the log level.
     Its keys are the names of the log levels (e.g. debug and info) and its
-    values are strings that consist of ANSI escape sequences with placeholders
-    for the color code and the log message.
+    values are strings with a placeholder for the color code.
 _unixLevelToColor : dict
     Colors for the different log levels when working on the standard Unix
     terminal.
@@ -41,53 +40,54 @@ and green on a Unix terminal (macOS). You can test it with
 It's only the log messages that can be colored, not the whole log record (like
 the module name or the level name).
 
+By default, the text between ``<color>`` and ``</color>`` gets the color of the
+log level. The tag also accepts attributes, e.g. ``<color fg="red" bold>`` or
+``<color fg="bright_cyan" bg="black" underline>``, and the tags can be nested.
+
+Only the console handlers whose stream can display colors get color codes,
+e.g. not when stderr is redirected to a file or a pipe. The environment
+variables ``FORCE_COLOR``, ``NO_COLOR`` and ``TERM=dumb`` are also taken into
+account. The capabilities of each handler are checked only once.
+
 """
 
+import atexit
 import copy
+import functools
 import logging
 import os
-import warnings
-# import xml.etree.ElementTree as E
-from logging import getLevelName, Logger, NullHandler, StreamHandler, NOTSET
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+import weakref
+from logging import (getLevelName, FileHandler, Logger, StreamHandler,
+                     CRITICAL, DEBUG, ERROR, INFO, NOTSET, WARNING)
+
+from pyutils.logutils import get_error_msg, JsonFormatter
 
 _disableColoring = False
-try:
-    from lxml import html
-except ImportError:
-    print("lxml not found. You can install it with: pip install lxml")
-    print("We will fallback to a non-colored logger")
-    _disableColoring = True
-
-from html.parser import HTMLParser
-from pyutils.logutils import get_error_msg
-
-
-# TODO: fix DeprecationWarning: The unescape method is deprecated and will be
-# removed in 3.5, use html.unescape() instead.
-# msg = h.unescape(msg)
-# ref.: https://stackoverflow.com/a/50519680
-def warn(*args, **kwargs):
-    pass
-
-
-warnings.warn = warn
 
 
 # WARN = WARNING and FATAL = CRITICAL
 _levels = ['CRITICAL', 'FATAL', 'ERROR', 'WARN', 'WARNING', 'INFO', 'DEBUG',
            'NOTSET']
 
-# TODO: explain, incl. CRITICAL different code than other levels (highlight)
-_levelToColoredMessage = {
-    'NOTSET':       "\033[{}m{}\033[0m",
-    'DEBUG':        "\033[{}m{}\033[0m",
-    'INFO':         "\033[{}m{}\033[0m",
-    'WARNING':      "\033[{}m{}\033[0m",
-    'ERROR':        "\033[{}m{}\033[0m",
-    'EXCEPTION':    "\033[{}m{}\033[0m",
-    'CRITICAL':     "\033[7;31;{}m{}\033[0m"
+# SGR parameters of the log levels, i.e. what goes between "\033[" and "m" of
+# the escape sequence that colors a message. The placeholder is the color code
+# of the level. CRITICAL is highlighted (reverse video on red).
+_levelToSgrParams = {
+    'NOTSET':       "{}",
+    'DEBUG':        "{}",
+    'INFO':         "{}",
+    'WARNING':      "{}",
+    'ERROR':        "{}",
+    'EXCEPTION':    "{}",
+    'CRITICAL':     "7;31;{}"
 }
-_levelToColoredMessage['WARN'] = _levelToColoredMessage['WARNING']
+_levelToSgrParams['WARN'] = _levelToSgrParams['WARNING']
 
 # Color codes for the log levels in the production environment
 _prodLevelToColorCode = {
@@ -119,17 +119,406 @@ _envToColorCodes = {
     'DEV': _devLevelToColorCode
 }
 
+# SGR parameters of the log levels in each environment. They are formatted
+# only once, here.
+_envToLevelSgrParams = {
+    env: {level: params.format(color_codes[level])
+          for level, params in _levelToSgrParams.items()}
+    for env, color_codes in _envToColorCodes.items()
+}
+
+# Attributes of the <color> tag, e.g. <color fg="red" bold>
+# - fg, bg: a color name (e.g. 'red' or 'bright_red'), 'default' or a color
+#   number of the 256-color palette (0-255)
+# - flags without values, e.g. bold or underline
+_colorNameToOffset = {
+    'black': 0, 'red': 1, 'green': 2, 'yellow': 3, 'blue': 4, 'magenta': 5,
+    'cyan': 6, 'white': 7
+}
+_flagToSgrParam = {
+    'bold': "1", 'dim': "2", 'italic': "3", 'underline': "4", 'blink': "5",
+    'reverse': "7", 'strike': "9"
+}
+
+# Regex used for splitting a log message into its text and its tags. Since the
+# pattern is in a capturing group, the tags are kept by `re.split()` at the odd
+# indices of the returned list. Only the <color> tag can have attributes.
+_tagsRegex = re.compile(r"(</(?:log|color)>|<log>|<color(?:\s[^<>]*)?>)")
+# Regex used for parsing the attributes of a <color> tag, e.g. fg="red" or
+# bold. The value can be in double quotes, single quotes or without quotes.
+_attrRegex = re.compile(
+    r"""([a-z_]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"']+)))?""")
+
+# Maximum number of compiled format strings kept in the cache
+_MARKUP_CACHE_SIZE = 1024
+
+
+def _get_color_param(value, base):
+    """Get the SGR parameter of a color attribute (fg or bg).
+
+    Parameters
+    ----------
+    value : str
+        The value of the attribute, e.g. 'red', 'bright_red', 'default' or
+        '208'.
+    base : int
+        30 for a foreground color and 40 for a background color.
+
+    Returns
+    -------
+    param : str or None
+        The SGR parameter, e.g. '31' for ``fg="red"``, or None if the color
+        is unknown.
+
+    """
+    value = value.lower()
+    if value in _colorNameToOffset:
+        return str(base + _colorNameToOffset[value])
+    if value.startswith("bright_") and value[7:] in _colorNameToOffset:
+        # The bright colors are at 90-97 (fg) and 100-107 (bg)
+        return str(base + 60 + _colorNameToOffset[value[7:]])
+    if value == "default":
+        return str(base + 9)
+    if value.isdigit() and int(value) < 256:
+        return "{};5;{}".format(base + 8, int(value))
+    return None
+
+
+def _parse_color_tag(tag, parent):
+    """Get the style of an opening <color> tag.
+
+    A nested tag inherits the style of its parent: the colors that it doesn't
+    set and all the flags. The foreground color of a top-level tag without
+    ``fg`` is the color of the log level.
+
+    Parameters
+    ----------
+    tag : str
+        The opening tag, e.g. ``<color>`` or ``<color fg="red" bold>``.
+    parent : tuple or None
+        The style of the enclosing <color> tag, or None for a top-level tag.
+
+    Returns
+    -------
+    style : tuple
+        ``(flags, bg, fg)`` where `flags` is a tuple of SGR parameters, `bg`
+        is an SGR parameter or None (no background) and `fg` is an SGR
+        parameter or None (the color of the log level).
+
+    Notes
+    -----
+    The unknown attributes and colors are ignored so that a typo in a log
+    message never makes the logging call fail.
+
+    """
+    flags, bg, fg = parent if parent else ((), None, None)
+    for name, *values in _attrRegex.findall(tag[len("<color"):-1]):
+        value = "".join(values)
+        if name in ('fg', 'bg') and value:
+            param = _get_color_param(value, 30 if name == 'fg' else 40)
+            if param is None:
+                continue
+            if name == 'fg':
+                fg = param
+            else:
+                bg = param
+        elif name in _flagToSgrParam and _flagToSgrParam[name] not in flags:
+            flags += (_flagToSgrParam[name],)
+    return flags, bg, fg
+
+
+@functools.lru_cache(maxsize=_MARKUP_CACHE_SIZE)
+def _compile_markup(msg, unescape=True):
+    """Compile a log message with tags into a sequence of literal segments.
+
+    The log message is tokenized in one pass into text and tags. The text
+    (whose HTML character references are unescaped if `unescape` is True) and
+    the escape sequences are merged into literal segments. The message is
+    split wherever the SGR parameters of the log level go, i.e. in the escape
+    sequences that use the color of the log level. Thus, the rendered message
+    is ``level_params.join(segments)``.
+
+    Each distinct message, i.e. the format string of a logging call before its
+    arguments are merged, is compiled only once.
+
+    Parameters
+    ----------
+    msg : str
+        The message to be compiled, e.g. ``Database <color>created</color>``.
+    unescape : bool, optional
+        Whether the HTML character references of the text are unescaped (the
+        default value is True). It is False for the messages whose literal
+        text was already unescaped before their arguments were merged (see
+        :func:`_unescape_markup`).
+
+    Returns
+    -------
+    segments : tuple of str
+        The literal segments of the message, e.g. ``('Database \\033[',
+        'mcreated\\033[0m')``.
+
+    """
+    # NOTE: imported here so that the programs that don't render colors
+    # don't pay for its import (html.entities is big)
+    import html
+    segments = []
+    literal = []
+    # Styles of the open <color> tags, innermost last
+    styles = []
+
+    def add_escape(style):
+        flags, bg, fg = style
+        params = ";".join(flags + ((bg,) if bg else ()))
+        if fg is None:
+            # The color of the log level goes last so that it isn't
+            # overridden, e.g. CRITICAL's highlight
+            literal.append("\033[" + params + (";" if params else ""))
+            segments.append("".join(literal))
+            literal[:] = ["m"]
+        else:
+            literal.append("\033[{}m".format(
+                params + ";" + fg if params else fg))
+
+    for i, token in enumerate(_tagsRegex.split(msg)):
+        if i % 2 == 0:  # Text
+            if token:
+                literal.append(html.unescape(token) if unescape else token)
+        elif token.startswith("<color"):
+            styles.append(_parse_color_tag(
+                token, styles[-1] if styles else None))
+            add_escape(styles[-1])
+        elif token == "</color>" and styles:
+            styles.pop()
+            literal.append("\033[0m")
+            if styles:
+                add_escape(styles[-1])
+        # NOTE: the <log> tags and the unmatched </color> tags are dropped
+    if styles:
+        # Unclosed <color> tag: the color mustn't leak to the next messages
+        literal.append("\033[0m")
+    segments.append("".join(literal))
+    return tuple(segments)
+
+
+def _render_markup(msg, level, env, unescape=True):
+    """Render the color tags of a log message into ANSI escape sequences.
+
+    The text between ``<color>`` and ``</color>`` is colored with the color of
+    the log level, or with the style given by the attributes of the tag, e.g.
+    ``<color fg="red" bold>``. The tags can be nested: the inner text gets the
+    style of the inner tag and the style of the outer tag is restored after
+    it. The ``<log>`` tags are dropped.
+
+    The message is compiled once by :func:`_compile_markup`. Rendering it is
+    then a single string join.
+
+    Parameters
+    ----------
+    msg : str
+        The message to be rendered, e.g. ``Database <color>created</color>``.
+    level : str
+        The name of the log level associated with the log message, e.g.
+        'DEBUG' or 'INFO'.
+    env : str, {'DEV', 'PROD'}
+        The environment whose color codes will be used.
+    unescape : bool, optional
+        Whether the HTML character references of the text are unescaped (the
+        default value is True).
+
+    Returns
+    -------
+    str
+        The log message with color codes and without any tags.
+
+    Notes
+    -----
+    As with the previous renderer that was based on :mod:`lxml`, the HTML
+    character references (e.g. ``&amp;`` or ``&#769;``) are unescaped.
+
+    """
+    return _envToLevelSgrParams[env][level].join(
+        _compile_markup(msg, unescape))
+
+
+def _unescape_markup(msg):
+    """Unescape the HTML character references of the text of a log message
+    but not of its tags.
+
+    It is used on the format string of a log message before its arguments
+    are merged into it, e.g. by a worker process whose records are rendered
+    by a :class:`~pyutils.logutils.LogCollector`. Thus, as in the logging
+    process, only the literal text is unescaped, not the arguments.
+
+    Parameters
+    ----------
+    msg : str
+        The message with tags, e.g. ``Tom <color>&amp;</color> %s``.
+
+    Returns
+    -------
+    str
+        The message whose text is unescaped, e.g.
+        ``Tom <color>&</color> %s``.
+
+    """
+    import html
+    tokens = _tagsRegex.split(msg)
+    tokens[::2] = [html.unescape(token) for token in tokens[::2]]
+    return "".join(tokens)
+
+
+# Routes of the handlers, i.e. which version of a log record with tags a
+# handler receives:
+# - _ROUTE_COLOR: the log message with color codes (console handlers whose
+#   stream can display colors, see _supports_color())
+# - _ROUTE_RAW: the log message without tags (e.g. file handlers or console
+#   handlers redirected to a file or a pipe)
+# - _ROUTE_MARKUP: the log message with its tags (queue handlers). The record
+#   is forwarded to another process or thread which does the routing, e.g.
+#   the collector of :class:`~pyutils.logutils.LogCollector`
+# - _ROUTE_SKIP: nothing. It is the case of handler classes that were added to
+#   a logger instead of handler objects, e.g. addHandler(NullHandler)
+_ROUTE_COLOR = "color"
+_ROUTE_RAW = "raw"
+_ROUTE_MARKUP = "markup"
+_ROUTE_SKIP = "skip"
+
+# The route of each handler is computed only once per formatter and stream of
+# the handler, i.e. (formatter, stream, route) is cached. Weak references are
+# used so that the closed and deleted handlers don't stay in memory.
+_handlerToRoute = weakref.WeakKeyDictionary()
+
+# Overflow policies of the asynchronous mode, i.e. what to do with a new log
+# record when the queue is full
+_OVERFLOW_BLOCK = "block"
+_OVERFLOW_DROP_OLDEST = "drop-oldest"
+_OVERFLOW_DROP_NEW = "drop-new"
+_overflowPolicies = [_OVERFLOW_BLOCK, _OVERFLOW_DROP_OLDEST, _OVERFLOW_DROP_NEW]
+
+# Dispatcher used in the asynchronous mode. If None, the log records are
+# passed to the handlers in the logging thread.
+_asyncDispatcher = None
+# Dispatcher of the AsyncLoggerAdapter logging in the current thread. It takes
+# precedence over _asyncDispatcher.
+_adapterDispatcher = threading.local()
+# All the dispatchers, so that they can be reset in a forked child process
+_dispatchers = weakref.WeakSet()
+
+
+def _is_queue_handler(handler):
+    """Check if a handler is a :class:`logging.handlers.QueueHandler`.
+
+    :mod:`logging.handlers` is slow to import. If it is not already imported,
+    the handler can't be a :class:`~logging.handlers.QueueHandler`.
+
+    Parameters
+    ----------
+    handler : logging.Handler
+        The handler to be checked.
+
+    Returns
+    -------
+    bool
+        True if the handler is a :class:`~logging.handlers.QueueHandler`.
+
+    """
+    handlers_module = sys.modules.get('logging.handlers')
+    return handlers_module is not None \
+        and isinstance(handler, handlers_module.QueueHandler)
+
 
-# TODO: set as semi-private
-def _generate_tags():
-    tags = []
-    for name in _tagNames:
-        tags.extend(["<{}>".format(name), "</{}>".format(name)])
-    return tags
+def _supports_color(handler):
+    """Check if the stream of a handler can display colors.
 
+    The checks are done in this order:
 
-_tagNames = ["log", "color"]
-_tags = _generate_tags()
+    1. ``FORCE_COLOR`` is set (and not '0'): colors are displayed, e.g. for a
+       CI log viewer that renders ANSI escape sequences
+    2. ``NO_COLOR`` is set (see https://no-color.org): no colors
+    3. ``TERM=dumb``: no colors
+    4. ``PYCHARM_HOSTED`` is set: colors are displayed since the PyCharm run
+       console isn't a TTY but renders color codes
+    5. otherwise, colors are displayed only if the stream is a TTY, i.e. not
+       if it is redirected to a file or a pipe
+
+    Parameters
+    ----------
+    handler : logging.StreamHandler
+        The handler to be checked.
+
+    Returns
+    -------
+    bool
+        True if the stream of the handler can display colors.
+
+    """
+    force_color = os.environ.get("FORCE_COLOR")
+    if force_color is not None and force_color != "0":
+        return True
+    if os.environ.get("NO_COLOR"):
+        return False
+    if os.environ.get("TERM") == "dumb":
+        return False
+    if os.environ.get("PYCHARM_HOSTED"):
+        return True
+    isatty = getattr(getattr(handler, 'stream', None), 'isatty', None)
+    try:
+        return bool(isatty and isatty())
+    except (OSError, ValueError):
+        # e.g. ValueError: I/O operation on closed file
+        return False
+
+
+def _get_route(handler):
+    """Get the route of a handler, i.e. which version of a log record it gets.
+
+    The handler is classified the first time it is seen and its route is then
+    cached. Thus, the capabilities of its stream (see :func:`_supports_color`)
+    are only checked once and the console handlers that can't display colors
+    never go through :func:`_render_markup`. The route is computed again if
+    the formatter or the stream of the handler is replaced, e.g. by
+    :meth:`logging.Handler.setFormatter` with a
+    :class:`~pyutils.logutils.JsonFormatter`.
+
+    Parameters
+    ----------
+    handler : logging.Handler
+        The handler whose route will be returned.
+
+    Returns
+    -------
+    route : str, {_ROUTE_COLOR, _ROUTE_RAW, _ROUTE_MARKUP, _ROUTE_SKIP}
+        The route of the handler.
+
+    """
+    formatter = getattr(handler, 'formatter', None)
+    stream = getattr(handler, 'stream', None)
+    try:
+        cached_formatter, cached_stream, route = _handlerToRoute[handler]
+        if cached_formatter is formatter and cached_stream is stream:
+            return route
+    except KeyError:
+        pass
+    # NOTE: isinstance(NullHandler, NullHandler) is False since NullHandler is
+    # a class and not an object. A handler class doesn't have any level and
+    # thus can't handle records, e.g. AttributeError: type object
+    # 'NullHandler' has no attribute 'level'
+    if isinstance(handler, type):
+        route = _ROUTE_SKIP
+    elif _is_queue_handler(handler):
+        route = _ROUTE_MARKUP
+    # NOTE: FileHandler is a subclass of StreamHandler but it mustn't write
+    # color codes in the log file. Also, the JSON objects written by the
+    # console handlers mustn't have color codes.
+    elif isinstance(handler, StreamHandler) \
+            and not isinstance(handler, FileHandler) \
+            and not isinstance(handler.formatter, JsonFormatter) \
+            and _supports_color(handler):
+        route = _ROUTE_COLOR
+    else:
+        route = _ROUTE_RAW
+    _handlerToRoute[handler] = (formatter, stream, route)
+    return route
 
 
 class ColoredLogger(Logger):
@@ -170,6 +559,8 @@ class ColoredLogger(Logger):
         Log a message with the EXCEPTION log level
     critical()
         Log a message with the CRITICAL log level
+    log()
+        Log a message with the given numeric log level
 
     Raises
     ------
@@ -184,138 +575,157 @@ class ColoredLogger(Logger):
         # TODO: explain both type of environments and why it is so
         self._env = "DEV" if bool(os.environ.get("PYCHARM_HOSTED")) else "PROD"
         self._level_to_color = _envToColorCodes[self._env]
-        self._removed_handlers = []
         self._disabled = False
+        # LoggingMetrics that gets the time spent adding color to messages
+        self._metrics = None
 
-    def _log_with_color(self, logging_fnc, msg, level, *args, **kwargs):
-        """Call the specified logging function by adding color to the messages.
+    def _log_with_color(self, level, msg, args, **kwargs):
+        """Log a message that can have color tags.
 
-        This method calls the logger's logging method to write a message with
-        color (if specified).
+        The message is preprocessed (e.g. an ``Exception`` is converted to a
+        string) and then logged with :meth:`logging.Logger._log`. It is only
+        called by the public logging methods once they have checked that the
+        log level is enabled. Thus, disabled calls cost nothing more than the
+        check on the level.
 
-        Only the console handler gets its message colored, not the other type
-        of handlers, e.g. file handler.
+        Only the console handlers get their messages colored, not the other
+        types of handlers, e.g. file handler. The routing of the messages is
+        done in :meth:`callHandlers` and the coloring is only done if a
+        console handler is going to emit the message.
 
         Parameters
         ----------
+        level : int
+            The numeric log level, e.g. ``logging.INFO``.
         msg : str or Exception
             The message (``str``) to be logged. The message can also be an
             ``Exception`` object, e.g. ``TypeError`` or
             ``sqlite3.IntegrityError``, which will be converted to a string
             (see get_error_msg). The message should be an ``Exception`` if the
             log level is 'ERROR', 'exception' or 'critical'.
-        level : str
-            The name of the log level, e.g. 'DEBUG' and 'INFO'.
-
-        """
-        msg = self._preprocess_msg(msg)
-        if self._found_tags(msg):  # log msg with color
-            # IMPORTANT: Only the console handler gets colored messages. The
-            # other handlers don't, such as the file handler.
-            #
-            # Get the log message with color codes
-            colored_msg = self._add_color_to_msg(msg, level)
-            # Get the raw message without color tags
-            raw_msg = self._remove_all_tags(msg)
-            # IMPORTANT: Disable the other non-console handlers when logging in
-            # the console. Hence, the color codes will not appear in the log
-            # file.
-            #
-            # Remove non-console handlers from the logger
-            self._remove_everything_but(handlers_to_keep=[StreamHandler])
-            # NOTE: it is possible that no console handlers are to be found
-            # since the user might have set the logger to log to a file only
-            # for example.
-            #
-            # Log the colored message in the console
-            if self.handlers:
-                # Call the message-logging function, e.g. logger.info()
-                logging_fnc(colored_msg, *args, **kwargs)
-            # Add the removed non-console handlers back to the logger
-            self._add_handlers_back()
-            # IMPORTANT: take type of NullHandlers ... TODO: explain
-            # isinstance(NullHandler, NullHandler) = False
-            # type(NullHandler) is NullHandler = False
-            # But
-            # isinstance(StreamHandler OBJECT, StreamHandler) = True
-            # type(StreamHandler OBJECT) is StreamHandler = True
-            # Reason: NullHandler is a class not an object
-            #
-            # Remove the console handlers and Nullhandler from the logger since
-            # we are now going to log with non-console handlers
-            self._keep_everything_but(
-                handlers_to_remove=[NullHandler, StreamHandler])
-            # Log the non-colored message with the non-console handlers
-            if self.handlers:
-                logging_fnc(raw_msg, *args, **kwargs)
-            # Add the handlers back to the logger
-            self._add_handlers_back()
-        else:  # log msg without color
-            # TODO: explain why we remove NullHandler. If you don't, you get
-            # the following error
-            # AttributeError: type object 'NullHandler' has no attribute 'level'
-            self._keep_everything_but(
-                handlers_to_remove=[NullHandler])
-            logging_fnc(msg, *args, **kwargs)
-            # Add the removed handlers back to the logger
-            self._add_handlers_back()
-
-    def _add_handlers_back(self):
-        """Add the removed handlers back to the logger.
-        """
-        for h in self._removed_handlers:
-            self.addHandler(h)
-        self._removed_handlers.clear()
-
-    def _remove_handler(self, h):
-        """Remove a handler from the logger.
+        args : tuple
+            The arguments which are merged into `msg`.
+
+        """
+        self._log(level, self._preprocess_msg(msg), args, **kwargs)
+
+    def callHandlers(self, record):
+        """Pass a record to all relevant handlers, with or without color.
+
+        It works like :meth:`logging.Logger.callHandlers` but if the log
+        message has tags, each handler gets the version of the record that it
+        can display: the console handlers get the message with color codes and
+        the other handlers (e.g. file handler) get the message without tags.
+
+        The handlers of the logger are never removed or added back. Thus, many
+        threads can log at the same time with the same logger.
+
+        If the asynchronous mode is on (see :func:`start_async_mode`), the
+        record is only put in a queue and the rendering and I/O are done in a
+        background thread. The same is done for the records logged through an
+        :class:`AsyncLoggerAdapter`, with the adapter's queue.
 
         Parameters
         ----------
-        h : logging.Handler
-            The handler to be removed from the logger.
+        record : logging.LogRecord
+            The log record to be passed to the handlers.
 
         """
-        self._removed_handlers.append(h)
-        self.removeHandler(h)
+        dispatcher = getattr(_adapterDispatcher, 'dispatcher', None) \
+            or _asyncDispatcher
+        if dispatcher is None:
+            self._call_handlers(record)
+        else:
+            dispatcher.enqueue(self, record)
 
-    def _keep_everything_but(self, handlers_to_remove):
-        """TODO
+    def _call_handlers(self, record):
+        """Pass a record to all relevant handlers in the current thread.
 
         Parameters
         ----------
-        handlers_to_remove : list of Handlers
-
-        """
-        if not isinstance(handlers_to_remove, list):
-            raise TypeError("handlers_to_remove must be a list")
-        # self._removed_handlers = []
-        # IMPORTANT: TODO you are iterating throughout handlers which you are also
-        # removing items from. Thus it is better to work on a copy of handlers
-        # If you don't, there will items you won't process.
-        # TODO: check also logutils.setup_basic_logger where I don't use 'type(h) in' but just 'h in'
-        handlers = copy.copy(self.handlers)
-        for i, h in enumerate(handlers):
-            if type(h) in handlers_to_remove:
-                self._remove_handler(h)
-
-    def _remove_everything_but(self, handlers_to_keep):
-        """TODO
+        record : logging.LogRecord
+            The log record to be passed to the handlers.
+
+        """
+        has_tags = isinstance(record.msg, str) and self._found_tags(record.msg)
+        # Versions of the record with tags, keyed by route. They are only
+        # built if a handler needs them.
+        routed_records = {}
+        c = self
+        found = 0
+        while c:
+            for hdlr in c.handlers:
+                route = _get_route(hdlr)
+                if route == _ROUTE_SKIP:
+                    continue
+                found = found + 1
+                if record.levelno >= hdlr.level:
+                    if has_tags and route != _ROUTE_MARKUP:
+                        routed_record = routed_records.get(route)
+                        if routed_record is None:
+                            routed_record = self._route_record(record, route)
+                            routed_records[route] = routed_record
+                        hdlr.handle(routed_record)
+                    else:
+                        hdlr.handle(record)
+            if not c.propagate:
+                c = None  # break out
+            else:
+                c = c.parent
+        if found == 0:
+            if logging.lastResort:
+                if record.levelno >= logging.lastResort.level:
+                    logging.lastResort.handle(
+                        self._route_record(record, _ROUTE_RAW)
+                        if has_tags else record)
+            elif logging.raiseExceptions \
+                    and not self.manager.emittedNoHandlerWarning:
+                sys.stderr.write("No handlers could be found for logger"
+                                 " \"%s\"\n" % self.name)
+                self.manager.emittedNoHandlerWarning = True
+
+    def _route_record(self, record, route):
+        """Get a copy of a record with tags for the given route.
 
         Parameters
         ----------
-        handlers_to_keep : list of Handlers
+        record : logging.LogRecord
+            The log record whose message has tags.
+        route : str, {_ROUTE_COLOR, _ROUTE_RAW}
+            The route of the handler that will get the record.
 
-        """
-        if not isinstance(handlers_to_keep, list):
-            raise TypeError("handlers_to_keep must be a list")
-        # self._removed_handlers = []
-        handlers = copy.copy(self.handlers)
-        for h in handlers:
-            if not type(h) in handlers_to_keep:
-                self._remove_handler(h)
+        Returns
+        -------
+        routed_record : logging.LogRecord
+            The copy of the record whose message is colored (console handlers)
+            or without tags (other handlers).
 
-    def _add_color_to_msg(self, msg, level):
+        """
+        routed_record = copy.copy(record)
+        if route == _ROUTE_COLOR \
+                and record.levelname in _levelToSgrParams:
+            # NOTE: the record of a worker process (see LogCollector) has its
+            # arguments merged. Its message whose literal text was unescaped
+            # before the merge is rendered, without unescaping the arguments.
+            msg = getattr(record, '_unescaped_msg', None)
+            unescape = msg is None
+            if unescape:
+                msg = record.msg
+            metrics = self._metrics
+            if metrics is None:
+                routed_record.msg = self._add_color_to_msg(
+                    msg, record.levelname, unescape)
+            else:
+                start = time.perf_counter()
+                routed_record.msg = self._add_color_to_msg(
+                    msg, record.levelname, unescape)
+                metrics.add_render_time(self.name,
+                                        time.perf_counter() - start)
+        else:
+            routed_record.msg = self._remove_all_tags(record.msg)
+        return routed_record
+
+    def _add_color_to_msg(self, msg, level, unescape=True):
         """Add color to the log message. TODO
 
         Add color to the log message based on the log level (e.g. by default
@@ -328,6 +738,9 @@ class ColoredLogger(Logger):
         level : str
             The name of the log level associated with log message, e.g. 'DEBUG'
             or 'INFO'.
+        unescape : bool, optional
+            Whether the HTML character references of the message are
+            unescaped (the default value is True).
 
         Notes
         -----
@@ -341,40 +754,7 @@ class ColoredLogger(Logger):
         https://stackoverflow.com/a/45924203`_.
 
         """
-        # TODO: explain
-        level_color_code = self._level_to_color[level]
-        msg = "<log>{}</log>".format(msg)
-        # NOTE: Use lxml.html.fromstring() since it is more forgiving of
-        # invalid HTML, e.g. <color>test </color><urllib3.connection...>
-        # Ref: https://stackoverflow.com/a/24439467
-        #
-        # NOTE: check also into using html.parser.HTMLParser
-        # Ref.: https://docs.python.org/3/library/html.parser.html
-        #
-        # root = ET.fromstring(msg)  # With ET
-        root = html.fromstring(msg)  # Wtih html
-        for color_tag in root.findall("color"):
-            colored_msg = _levelToColoredMessage[level]
-            # NOTE: must escape control characters or will get a ValueError:
-            # "All strings must be XML compatible: Unicode or ASCII, no NULL
-            # bytes or control characters"
-            colored_msg = colored_msg.replace("\x1b", "\\x1b")  # With html
-            color_tag.text = colored_msg.format(level_color_code,
-                                                color_tag.text)
-        # msg = ET.tostring(root).decode()  # With ET
-        msg = html.tostring(root).decode()  # With html
-        # TODO: unescape() is deprecated.
-        # See https://stackoverflow.com/a/2087433
-        # TODO: why we do it? Because we don't HTML entities code (e.g. &#769;
-        # which is the acute accent character)
-        h = HTMLParser()
-        msg = h.unescape(msg)
-        # Cleanup msg from any tags and escape characters (With html)
-        msg = msg.replace("<log>", "").replace("</log>", "")
-        msg = msg.replace("<color>", "").replace("</color>", "")
-        msg = msg.replace("\\x1b", "\x1b")  # With html
-        # Return log message with color
-        return msg
+        return _render_markup(msg, level, self._env, unescape)
 
     def _preprocess_msg(self, msg):
         """TODO
@@ -412,10 +792,7 @@ class ColoredLogger(Logger):
             TODO
 
         """
-        for tag in _tags:
-            if tag in msg:
-                return True
-        return False
+        return "<" in msg and _tagsRegex.search(msg) is not None
 
     @staticmethod
     def _remove_all_tags(msg):
@@ -430,9 +807,7 @@ class ColoredLogger(Logger):
         msg : str
 
         """
-        for t in _tags:
-            msg = msg.replace(t, "")
-        return msg
+        return _tagsRegex.sub("", msg)
 
     def disable_color(self):
         """TODO
@@ -440,7 +815,6 @@ class ColoredLogger(Logger):
         self._disabled = True
 
     # Logging methods start here
-    # TODO: add support for log(self, level, msg, *args, **kwargs) in logging
     def debug(self, msg, *args, **kwargs):
         """Log a message with the 'debug' log level.
 
@@ -450,7 +824,8 @@ class ColoredLogger(Logger):
             The message to be logged.
 
         """
-        self._log_with_color(super().debug, msg, 'DEBUG', *args, **kwargs)
+        if self.isEnabledFor(DEBUG):
+            self._log_with_color(DEBUG, msg, args, **kwargs)
 
     def info(self, msg, *args, **kwargs):
         """Log a message with the INFO log level.
@@ -463,7 +838,8 @@ class ColoredLogger(Logger):
             The message to be logged in a console and file.
 
         """
-        self._log_with_color(super().info, msg, 'INFO', *args, **kwargs)
+        if self.isEnabledFor(INFO):
+            self._log_with_color(INFO, msg, args, **kwargs)
 
     def warning(self, msg, *args, **kwargs):
         """Log a message with the WARNING log level.
@@ -474,7 +850,8 @@ class ColoredLogger(Logger):
             The message to be logged.
 
         """
-        self._log_with_color(super().warning, msg, 'WARNING', *args, **kwargs)
+        if self.isEnabledFor(WARNING):
+            self._log_with_color(WARNING, msg, args, **kwargs)
 
     # Deprecated method
     warn = warning
@@ -491,9 +868,10 @@ class ColoredLogger(Logger):
             (see get_error_msg).
 
         """
-        self._log_with_color(super().error, msg, 'ERROR', *args, **kwargs)
+        if self.isEnabledFor(ERROR):
+            self._log_with_color(ERROR, msg, args, **kwargs)
 
-    def exception(self, msg, *args, **kwargs):
+    def exception(self, msg, *args, exc_info=True, **kwargs):
         """Log a message with the EXCEPTION log level.
 
         Parameters
@@ -504,7 +882,7 @@ class ColoredLogger(Logger):
             ``sqlite3.IntegrityError``, which will be converted to a string
             (see get_error_msg).
         """
-        self._log_with_color(super().exception, msg, 'EXCEPTION', *args, **kwargs)
+        self.error(msg, *args, exc_info=exc_info, **kwargs)
 
     def critical(self, msg, *args, **kwargs):
         """Log a message with the EXCEPTION log level.
@@ -517,10 +895,487 @@ class ColoredLogger(Logger):
             ``sqlite3.IntegrityError``, which will be converted to a string
             (see get_error_msg).
         """
-        self._log_with_color(super().critical, msg, 'CRITICAL', *args, **kwargs)
+        if self.isEnabledFor(CRITICAL):
+            self._log_with_color(CRITICAL, msg, args, **kwargs)
 
     fatal = critical
 
+    def log(self, level, msg, *args, **kwargs):
+        """Log a message with the given numeric log level.
+
+        Parameters
+        ----------
+        level : int
+            The numeric log level, e.g. ``logging.INFO``.
+        msg : str or Exception
+            The message (``str``) to be logged. The message can also be an
+            ``Exception`` object, e.g. ``TypeError`` or
+            ``sqlite3.IntegrityError``, which will be converted to a string
+            (see get_error_msg).
+
+        Raises
+        ------
+        TypeError
+            Raised if `level` is not an integer and
+            :attr:`logging.raiseExceptions` is True.
+
+        """
+        if not isinstance(level, int):
+            if logging.raiseExceptions:
+                raise TypeError("level must be an integer")
+            else:
+                return
+        if self.isEnabledFor(level):
+            self._log_with_color(level, msg, args, **kwargs)
+
     def __repr__(self):
         level = getLevelName(self.getEffectiveLevel())
         return '<%s %s (%s)>' % (self.__class__.__name__, self.name, level)
+
+
+class AsyncDispatcher:
+    """A class that passes the log records of ColoredLoggers to their handlers
+    from a background thread.
+
+    The logging thread only puts the log records in a bounded queue. A
+    background thread gets them from the queue, adds color to or removes the
+    tags from the messages and calls the handlers, e.g. the file handlers
+    setup by :func:`~pyutils.logutils.setup_basic_logger`. Thus, a slow disk
+    doesn't slow down the logging thread.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        Maximum number of log records waiting in the queue (the default value
+        is 10000).
+    overflow_policy : str, {'block', 'drop-oldest', 'drop-new'}, optional
+        What to do with a new log record when the queue is full: wait for a
+        free slot ('block'), drop the oldest record in the queue
+        ('drop-oldest') or drop the new record ('drop-new') (the default value
+        is 'block').
+
+    A forked child process doesn't inherit the background thread. Thus, the
+    dispatcher gets a new queue in the child (the records queued in the parent
+    are handled by the parent) and its background thread is started again if
+    it was running.
+
+    Attributes
+    ----------
+    nb_dropped : int
+        Number of log records dropped because the queue was full or the
+        dispatcher was stopped.
+
+    Raises
+    ------
+    ValueError
+        Raised if the overflow policy is not supported.
+
+    """
+
+    _sentinel = None
+
+    def __init__(self, queue_size=10000, overflow_policy=_OVERFLOW_BLOCK):
+        if overflow_policy not in _overflowPolicies:
+            raise ValueError(
+                "Overflow policy '{}' is not supported. These are the "
+                "supported policies: {}".format(overflow_policy,
+                                                _overflowPolicies))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflow_policy = overflow_policy
+        self.nb_dropped = 0
+        # Guards nb_dropped and _stopped so that the sentinel put by stop() is
+        # never dropped by the 'drop-oldest' policy
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+        _dispatchers.add(self)
+
+    def enqueue(self, logger, record):
+        """Put a log record in the queue.
+
+        If the queue is full, the overflow policy is applied. If it is called
+        from the background thread (e.g. a handler that logs), the record is
+        passed to the handlers right away. Once :meth:`stop` is called, the
+        records are dropped since no thread would get them from the queue.
+
+        Parameters
+        ----------
+        logger : ColoredLogger
+            The logger that created the record.
+        record : logging.LogRecord
+            The log record to be passed to the handlers of `logger`.
+
+        """
+        if threading.current_thread() is self._thread:
+            logger._call_handlers(record)
+            return
+        if self._stopped:
+            self._drop()
+            return
+        item = (logger, record)
+        if self.overflow_policy == _OVERFLOW_BLOCK:
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            with self._lock:
+                self.nb_dropped += 1
+                if self.overflow_policy == _OVERFLOW_DROP_NEW:
+                    return
+                # NOTE: stop() puts the sentinel only after _stopped is set
+                # with the lock held. Thus, the oldest item is a record, not
+                # the sentinel.
+                if self._stopped:
+                    return
+                # Drop the oldest record to make room for the new one
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                except queue.Empty:
+                    pass
+
+    def flush(self):
+        """Wait until all the log records in the queue are handled.
+        """
+        if self._thread is not None:
+            self.queue.join()
+
+    def start(self):
+        """Start the background thread that handles the log records.
+        """
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._monitor,
+                                            name="ColoredLoggerDispatcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Handle the remaining log records and stop the background thread.
+
+        The records put in the queue afterwards are dropped.
+
+        """
+        with self._lock:
+            self._stopped = True
+        if self._thread is not None:
+            self.queue.put(self._sentinel)
+            self._thread.join()
+            self._thread = None
+
+    def _drop(self):
+        """Count a dropped log record.
+        """
+        with self._lock:
+            self.nb_dropped += 1
+
+    def _reset_after_fork(self, restart=True):
+        """Reset the dispatcher in a forked child process.
+
+        The child has a copy of the queue (and maybe of its locks held by
+        other threads of the parent) but not the background thread.
+
+        Parameters
+        ----------
+        restart : bool, optional
+            Whether the background thread is started again if it was running
+            in the parent (the default value is True). If False, the
+            dispatcher is stopped.
+
+        """
+        was_running = self._thread is not None
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        if was_running and restart:
+            self.start()
+        elif not restart:
+            self._stopped = True
+
+    def _monitor(self):
+        """Get the log records from the queue and pass them to the handlers.
+
+        It runs in the background thread until the sentinel is found.
+
+        """
+        q = self.queue
+        while True:
+            item = q.get()
+            try:
+                if item is self._sentinel:
+                    break
+                logger, record = item
+                logger._call_handlers(record)
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+            finally:
+                q.task_done()
+
+
+class AsyncLoggerAdapter:
+    """An adapter that lets coroutines log with a ColoredLogger without
+    blocking the event loop.
+
+    The logging methods (e.g. :meth:`info`) are not coroutines: they only
+    create the log record in the calling thread and put it in the queue of an
+    :class:`AsyncDispatcher`. Its background thread adds color to or removes
+    the tags from the messages and calls the handlers, in the order of the
+    calls. The tags and colors work as with the
+    :class:`~pyutils.colored_logger.ColoredLogger` itself. The records of the
+    logger's children aren't affected, unless they are also logged through an
+    adapter.
+
+    Since the records are formatted in the background thread, the arguments
+    of a message shouldn't be modified after the call. Once the adapter is
+    closed, its logging methods raise a :exc:`RuntimeError`.
+
+    Parameters
+    ----------
+    logger : ColoredLogger
+        The logger whose records are handled in the background thread.
+    queue_size : int, optional
+        Maximum number of log records waiting in the queue (the default value
+        is 10000).
+    overflow_policy : str, {'block', 'drop-oldest', 'drop-new'}, optional
+        What to do with a new log record when the queue is full (the default
+        value is 'block'). See :class:`AsyncDispatcher`.
+    dispatcher : AsyncDispatcher, optional
+        The dispatcher shared with other adapters (the default value is None
+        which implies that the adapter starts its own dispatcher).
+
+    Raises
+    ------
+    TypeError
+        Raised if the logger is not a ColoredLogger, e.g.
+        :func:`~pyutils.install_colored_logger` was not called before the
+        logger was created.
+    ValueError
+        Raised if the overflow policy is not supported.
+
+    Examples
+    --------
+    >>> async def main():
+    ...     async with AsyncLoggerAdapter(logging.getLogger("server")) as log:
+    ...         log.info("Listening on <color>%s</color>", port)
+    ...         await serve()
+    ...         await log.flush()
+
+    """
+
+    def __init__(self, logger, queue_size=10000,
+                 overflow_policy=_OVERFLOW_BLOCK, dispatcher=None):
+        if not isinstance(logger, ColoredLogger):
+            raise TypeError("The logger '{}' is not a ColoredLogger".format(
+                logger.name))
+        self.logger = logger
+        self._closed = False
+        self._own_dispatcher = dispatcher is None
+        if dispatcher is None:
+            dispatcher = AsyncDispatcher(queue_size, overflow_policy)
+            dispatcher.start()
+            # The queued records are handled when the interpreter exits
+            atexit.register(dispatcher.stop)
+        self.dispatcher = dispatcher
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Wait until the queued log records are handled and stop the
+        background thread (if the adapter started it).
+        """
+        self._closed = True
+        if self._own_dispatcher:
+            # NOTE: otherwise the exit function would keep the dispatcher
+            # (and thus its queue and thread) alive until the exit
+            atexit.unregister(self.dispatcher.stop)
+            await self._run_in_executor(self.dispatcher.stop)
+        else:
+            await self.flush()
+
+    def close(self):
+        """Like :meth:`aclose` but blocking, e.g. for a synchronous cleanup.
+        """
+        self._closed = True
+        if self._own_dispatcher:
+            atexit.unregister(self.dispatcher.stop)
+            self.dispatcher.stop()
+        else:
+            self.dispatcher.flush()
+
+    async def flush(self):
+        """Wait until the queued log records are handled.
+
+        The event loop isn't blocked while waiting.
+
+        """
+        await self._run_in_executor(self.dispatcher.flush)
+
+    def debug(self, msg, *args, **kwargs):
+        """Log a message with the DEBUG level without blocking.
+        """
+        if self.logger.isEnabledFor(DEBUG):
+            self._log(DEBUG, msg, args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        """Log a message with the INFO level without blocking.
+        """
+        if self.logger.isEnabledFor(INFO):
+            self._log(INFO, msg, args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        """Log a message with the WARNING level without blocking.
+        """
+        if self.logger.isEnabledFor(WARNING):
+            self._log(WARNING, msg, args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        """Log a message with the ERROR level without blocking.
+        """
+        if self.logger.isEnabledFor(ERROR):
+            self._log(ERROR, msg, args, **kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        """Log a message with the ERROR level and the exception information
+        without blocking.
+        """
+        if self.logger.isEnabledFor(ERROR):
+            self._log(ERROR, msg, args, exc_info=exc_info, **kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        """Log a message with the CRITICAL level without blocking.
+        """
+        if self.logger.isEnabledFor(CRITICAL):
+            self._log(CRITICAL, msg, args, **kwargs)
+
+    def log(self, level, msg, *args, **kwargs):
+        """Log a message with the given numeric level without blocking.
+
+        Raises
+        ------
+        TypeError
+            Raised if `level` is not an integer and
+            :attr:`logging.raiseExceptions` is True.
+
+        """
+        if not isinstance(level, int):
+            if logging.raiseExceptions:
+                raise TypeError("level must be an integer")
+            else:
+                return
+        if self.logger.isEnabledFor(level):
+            self._log(level, msg, args, **kwargs)
+
+    def _log(self, level, msg, args, **kwargs):
+        """Create the log record and put it in the queue of the dispatcher.
+
+        Raises
+        ------
+        RuntimeError
+            Raised if the adapter is closed.
+
+        """
+        if self._closed:
+            raise RuntimeError("The adapter of the logger '{}' is "
+                               "closed".format(self.logger.name))
+        _adapterDispatcher.dispatcher = self.dispatcher
+        try:
+            self.logger._log_with_color(level, msg, args, **kwargs)
+        finally:
+            _adapterDispatcher.dispatcher = None
+
+    @staticmethod
+    async def _run_in_executor(func):
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None, func)
+
+
+def flush_async_mode():
+    """Wait until the log records queued in the asynchronous mode are handled.
+    """
+    if _asyncDispatcher is not None:
+        _asyncDispatcher.flush()
+
+
+def start_async_mode(queue_size=10000, overflow_policy=_OVERFLOW_BLOCK):
+    """Start the asynchronous mode of the ColoredLoggers.
+
+    The ColoredLoggers put their log records in a queue and a background
+    thread does the rendering of the colors and the I/O. The queued records
+    are handled when the interpreter exits.
+
+    A forked child process (e.g. a :mod:`multiprocessing` worker) doesn't
+    inherit the asynchronous mode: its records are passed to the handlers in
+    the logging thread since a child process may exit without handling its
+    queue, e.g. with :func:`os._exit`. It can call :func:`start_async_mode`
+    again.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        Maximum number of log records waiting in the queue (the default value
+        is 10000).
+    overflow_policy : str, {'block', 'drop-oldest', 'drop-new'}, optional
+        What to do with a new log record when the queue is full (the default
+        value is 'block'). See :class:`AsyncDispatcher`.
+
+    Returns
+    -------
+    dispatcher : AsyncDispatcher
+        The dispatcher whose background thread handles the log records.
+
+    Raises
+    ------
+    ValueError
+        Raised if the overflow policy is not supported.
+
+    """
+    global _asyncDispatcher
+    dispatcher = AsyncDispatcher(queue_size, overflow_policy)
+    stop_async_mode()
+    dispatcher.start()
+    _asyncDispatcher = dispatcher
+    return dispatcher
+
+
+def stop_async_mode():
+    """Stop the asynchronous mode after the queued log records are handled.
+    """
+    global _asyncDispatcher
+    dispatcher = _asyncDispatcher
+    _asyncDispatcher = None
+    if dispatcher is not None:
+        dispatcher.stop()
+
+
+def _after_fork_in_child():
+    """Reset the dispatchers in a forked child process.
+
+    The asynchronous mode is stopped and the other dispatchers (e.g. of the
+    :class:`AsyncLoggerAdapter`) get a new queue and background thread.
+
+    """
+    global _asyncDispatcher
+    dispatcher = _asyncDispatcher
+    _asyncDispatcher = None
+    for d in list(_dispatchers):
+        d._reset_after_fork(restart=d is not dispatcher)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+# NOTE: logging registers its own shutdown function (flush and close all
+# handlers) when it is imported. Since the exit functions are called in the
+# reverse order of their registration, the queue is emptied before the
+# handlers are closed.
+atexit.register(stop_async_mode)
+
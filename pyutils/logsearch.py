@@ -0,0 +1,326 @@
+"""Module that defines an index for searching log files.
+
+The log files written by the handlers setup with
+:func:`~pyutils.logutils.setup_logging_from_cfg` (or
+:func:`~pyutils.logutils.setup_basic_logger`) are indexed incrementally in a
+SQLite database with a full-text search (FTS5) table. Each log record is
+indexed by timestamp, level, logger name and message. The index remembers up to
+which byte each log file was indexed. Thus, indexing a log file again only
+reads the lines appended since the last time, and a search doesn't need to
+scan the log files.
+
+The log lines are parsed with the format string of the handler's formatter,
+e.g. ``"%(asctime)s | %(name)-42s | %(levelname)-8s | %(message)s"``, or as
+JSON objects written by :class:`~pyutils.logutils.JsonFormatter`. The lines
+that don't match the format (e.g. the lines of a traceback) are added to the
+message of the previous log record.
+
+The script ``search_logs`` (see :mod:`pyutils.scripts.search_logs`) is a
+command-line interface to this module.
+
+See Also
+--------
+dbutils : module that defines common database functions.
+logutils : module that defines common logging functions.
+
+"""
+
+import logging
+import os
+import time
+
+from pyutils.dbutils import connect_db
+from pyutils.logutils import VERBOSE_FORMAT, get_line_regex, parse_log_line
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Format of the verbose formatter in the YAML logging config files
+DEFAULT_FORMAT = VERBOSE_FORMAT
+
+_schema = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    inode INTEGER,
+    offset INTEGER NOT NULL DEFAULT 0,
+    last_record_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    offset INTEGER NOT NULL,
+    timestamp TEXT,
+    level TEXT,
+    logger TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS records_timestamp ON records(timestamp);
+CREATE INDEX IF NOT EXISTS records_level ON records(level, timestamp);
+CREATE INDEX IF NOT EXISTS records_logger ON records(logger, timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    message, content='records', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, message)
+    VALUES ('delete', old.id, old.message);
+END;
+CREATE TRIGGER IF NOT EXISTS records_au AFTER UPDATE OF message ON records
+BEGIN
+    INSERT INTO records_fts(records_fts, rowid, message)
+    VALUES ('delete', old.id, old.message);
+    INSERT INTO records_fts(rowid, message) VALUES (new.id, new.message);
+END;
+"""
+
+
+class LogIndex:
+    """A class that indexes log files in a SQLite database for searching them.
+
+    Parameters
+    ----------
+    db_filepath : str
+        Path to the SQLite database of the index. It is created if it doesn't
+        exist.
+    fmt : str, optional
+        The format string of the formatter that wrote the log files, or 'json'
+        for the files written by :class:`~pyutils.logutils.JsonFormatter` (the
+        default value is `DEFAULT_FORMAT`, the format of the verbose formatter
+        of the YAML logging config files).
+    batch_size : int, optional
+        Number of log records inserted per transaction (the default value is
+        10000).
+
+    Raises
+    ------
+    sqlite3.Error
+        Raised if the database can't be opened or created, e.g. the SQLite
+        library doesn't support FTS5.
+
+    Examples
+    --------
+    >>> with LogIndex("logs.sqlite") as index:
+    ...     index.index_file("debug.log")
+    ...     records = index.search("timeout", level="ERROR",
+    ...                            start="2019-08-29 00:00:00")
+
+    """
+
+    def __init__(self, db_filepath, fmt=DEFAULT_FORMAT, batch_size=10000):
+        self.db_filepath = db_filepath
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self._line_regex = None if fmt == 'json' else get_line_regex(fmt)
+        self.conn = connect_db(db_filepath)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the connection to the database.
+        """
+        self.conn.close()
+
+    def index_file(self, log_filepath):
+        """Index the log records appended to a log file since the last time.
+
+        Indexing resumes at the byte offset where the previous call stopped.
+        If the log file was replaced (e.g. rotated) or truncated, its records
+        are indexed again from the beginning.
+
+        Parameters
+        ----------
+        log_filepath : str
+            Path to the log file.
+
+        Returns
+        -------
+        nb_records : int
+            Number of new log records indexed.
+
+        Raises
+        ------
+        OSError
+            Raised if the log file can't be read.
+        sqlite3.Error
+            Raised if any SQLite-related error occurs.
+
+        """
+        log_filepath = os.path.abspath(log_filepath)
+        stat = os.stat(log_filepath)
+        row = self.conn.execute(
+            "SELECT id, inode, offset, last_record_id FROM files "
+            "WHERE path = ?", (log_filepath,)).fetchone()
+        with self.conn:
+            if row is None:
+                file_id = self.conn.execute(
+                    "INSERT INTO files (path, inode) VALUES (?, ?)",
+                    (log_filepath, stat.st_ino)).lastrowid
+                offset, last_record_id = 0, None
+            else:
+                file_id, inode, offset, last_record_id = row
+                if inode != stat.st_ino or stat.st_size < offset:
+                    # The file was replaced or truncated: index it again
+                    logger.debug("Reindexing '%s'", log_filepath)
+                    self.conn.execute("DELETE FROM records WHERE file_id = ?",
+                                      (file_id,))
+                    self.conn.execute(
+                        "UPDATE files SET inode = ?, offset = 0, "
+                        "last_record_id = NULL WHERE id = ?",
+                        (stat.st_ino, file_id))
+                    offset, last_record_id = 0, None
+        if stat.st_size == offset:
+            return 0
+        nb_records = 0
+        start_time = time.perf_counter()
+        with open(log_filepath, 'rb') as f:
+            f.seek(offset)
+            # Record being parsed: [offset, timestamp, level, logger, message]
+            current = None
+            batch = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Incomplete line still being written: index it next time
+                    break
+                text = line.decode('utf-8', 'replace').rstrip("\r\n")
+                fields = parse_log_line(text, self._line_regex)
+                if fields is None:
+                    # Continuation of the previous message, e.g. a traceback
+                    if current is not None:
+                        current[4] += "\n" + text
+                    elif last_record_id is not None:
+                        self.conn.execute(
+                            "UPDATE records SET message = message || ? "
+                            "WHERE id = ?", ("\n" + text, last_record_id))
+                    else:
+                        current = [offset, None, None, None, text]
+                else:
+                    if current is not None:
+                        batch.append(current)
+                    current = [offset] + list(fields)
+                offset += len(line)
+                if len(batch) >= self.batch_size:
+                    last_record_id = self._insert(file_id, batch, offset,
+                                                  current, last_record_id)
+                    nb_records += len(batch)
+                    batch = []
+            if current is not None:
+                batch.append(current)
+            nb_records += len(batch)
+            self._insert(file_id, batch, offset, None, last_record_id)
+        logger.debug("%d log records indexed from '%s' in %.3f s", nb_records,
+                     log_filepath, time.perf_counter() - start_time)
+        return nb_records
+
+    def search(self, text=None, level=None, logger_name=None, start=None,
+               end=None, limit=100):
+        """Search the indexed log records.
+
+        All the criteria are optional and combined.
+
+        Parameters
+        ----------
+        text : str, optional
+            Full-text query on the messages, in the FTS5 query syntax, e.g.
+            ``'timeout'``, ``'"connection reset"'`` or ``'disk AND full'``.
+        level : str or list of str, optional
+            Level name(s) of the records, e.g. 'ERROR' or ['ERROR',
+            'CRITICAL'].
+        logger_name : str, optional
+            Name of the logger. The records of its children are also found,
+            e.g. 'scripts' finds the records of 'scripts.scraper'.
+        start : str, optional
+            Only the records logged at or after this date and time, in the
+            format of ``asctime``, e.g. '2019-08-29 00:58:22'.
+        end : str, optional
+            Only the records logged before this date and time.
+        limit : int, optional
+            Maximum number of records returned (the default value is 100).
+
+        Returns
+        -------
+        records : list of dict
+            The records found, from oldest to newest. The keys are 'timestamp',
+            'level', 'logger', 'message', 'path' (the log file) and 'offset'
+            (the byte offset of the record in the log file).
+
+        Raises
+        ------
+        sqlite3.Error
+            Raised if any SQLite-related error occurs, e.g. the full-text query
+            is invalid.
+
+        """
+        where = []
+        values = []
+        if text:
+            where.append("r.id IN (SELECT rowid FROM records_fts "
+                         "WHERE records_fts MATCH ?)")
+            values.append(text)
+        if level:
+            levels = [level] if isinstance(level, str) else list(level)
+            where.append("r.level IN ({})".format(
+                ", ".join("?" * len(levels))))
+            values.extend(lvl.upper() for lvl in levels)
+        if logger_name:
+            where.append("(r.logger = ? OR substr(r.logger, 1, ?) = ?)")
+            values.extend([logger_name, len(logger_name) + 1,
+                           logger_name + "."])
+        if start:
+            where.append("r.timestamp >= ?")
+            values.append(start)
+        if end:
+            where.append("r.timestamp < ?")
+            values.append(end)
+        sql = "SELECT r.timestamp, r.level, r.logger, r.message, f.path, " \
+              "r.offset FROM records AS r JOIN files AS f ON f.id = r.file_id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY r.timestamp, r.id LIMIT ?"
+        values.append(limit)
+        keys = ('timestamp', 'level', 'logger', 'message', 'path', 'offset')
+        return [dict(zip(keys, row))
+                for row in self.conn.execute(sql, values)]
+
+    def _insert(self, file_id, batch, offset, current, last_record_id):
+        """Insert parsed log records and save the offset reached.
+
+        Parameters
+        ----------
+        file_id : int
+            Id of the log file in the table ``files``.
+        batch : list of list
+            The parsed log records.
+        offset : int
+            The byte offset reached in the log file.
+        current : list or None
+            The record being parsed, i.e. not in the batch yet. The offset is
+            saved at its beginning so that it is parsed again if the indexing
+            is interrupted.
+        last_record_id : int or None
+            Id of the last record indexed from the file.
+
+        Returns
+        -------
+        last_record_id : int or None
+            Id of the last record inserted.
+
+        """
+        with self.conn:
+            for record in batch:
+                last_record_id = self.conn.execute(
+                    "INSERT INTO records (file_id, offset, timestamp, level, "
+                    "logger, message) VALUES (?, ?, ?, ?, ?, ?)",
+                    [file_id] + record).lastrowid
+            self.conn.execute(
+                "UPDATE files SET offset = ?, last_record_id = ? WHERE id = ?",
+                (current[0] if current else offset, last_record_id, file_id))
+        return last_record_id
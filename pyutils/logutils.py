@@ -12,12 +12,1741 @@ genutils : module that defines many general and useful functions.
 
 """
 
+import collections
 import copy
-import logging.config
+import logging
 import os
-from datetime import datetime
+import re
+import struct
+import sys
+import threading
+import time
+import traceback
+import weakref
 
-from pyutils.genutils import load_yaml
+# Parsed YAML logging configs: {abspath: ((mtime_ns, size), config_dict)}
+_loggingConfigCache = {}
+# File handlers shared by the loggers:
+# {(abspath, format, level, buffered): handler}
+_sharedFileHandlers = {}
+_sharedFileHandlersLock = threading.Lock()
+
+# Format of the verbose formatter in the YAML logging config files
+VERBOSE_FORMAT = "%(asctime)s | %(name)-42s | %(levelname)-8s | %(message)s"
+
+# Regexes of the fields of a log line, by attribute of the LogRecord. The
+# other fields match any text.
+_fieldToRegex = {
+    'asctime': r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d{3})?",
+    'levelname': r"[A-Z]+",
+    'levelno': r"\d+",
+    'message': r".*"
+}
+
+_placeholderRegex = re.compile(
+    r"%\((\w+)\)[-#0 +]*(\d*)(?:\.\d+)?[diouxXeEfFgGcrsa]")
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """A file handler that writes the log records to disk in batches.
+
+    :class:`logging.FileHandler` flushes its stream after every record, i.e.
+    one write system call per record. This handler keeps the formatted records
+    in memory and writes them all at once when:
+
+    - the buffered records reach `buffer_size` characters
+    - `flush_interval` seconds have passed (checked by a background thread)
+    - a record with a level greater than or equal to `flush_level` is handled,
+      e.g. an ERROR is written right away with the records before it
+    - the handler is flushed or closed, e.g. by :func:`logging.shutdown` when
+      the interpreter exits
+
+    It can be used from a YAML logging config file::
+
+        handlers:
+          file:
+            class: pyutils.logutils.BufferedFileHandler
+            filename: debug.log
+            buffer_size: 65536
+            flush_interval: 1.0
+            flush_level: ERROR
+
+    or from :func:`setup_basic_logger` with ``buffered_file_handler=True``.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the log file.
+    mode : str, optional
+        Mode used to open the file (the default value is 'a').
+    encoding : str, optional
+        Encoding of the file (the default value is None which implies that
+        the platform-dependent encoding is used).
+    delay : bool, optional
+        Whether the file is only opened when the first batch is written (the
+        default value is False).
+    buffer_size : int, optional
+        Number of characters buffered before the records are written (the
+        default value is 65536).
+    flush_interval : float, optional
+        Maximum number of seconds a record stays in the buffer. If None or 0,
+        the buffer is not flushed periodically (the default value is 1.0).
+    flush_level : int or str, optional
+        The records with this level or higher are written right away (the
+        default value is ``logging.ERROR``).
+
+    Raises
+    ------
+    TypeError
+        Raised if the flush level is neither an integer nor a string.
+    ValueError
+        Raised if the flush level is a string that isn't the name of a log
+        level, e.g. 'EROR'.
+
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 buffer_size=65536, flush_interval=1.0,
+                 flush_level=logging.ERROR):
+        if isinstance(flush_level, str):
+            # e.g. 'ERROR' from a YAML logging config file
+            level = logging.getLevelName(flush_level.upper())
+            # NOTE: getLevelName() returns 'Level <name>' for an unknown name
+            if not isinstance(level, int):
+                raise ValueError(
+                    "Flush level '{}' is not a log level".format(flush_level))
+            flush_level = level
+        elif not isinstance(flush_level, int):
+            raise TypeError("Flush level {!r} is neither an integer nor a "
+                            "string".format(flush_level))
+        super().__init__(filename, mode, encoding, delay)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._buffer = []
+        self._buffered_size = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        if flush_interval:
+            # NOTE: the thread only keeps a weak reference to the handler so
+            # that an unused handler can still be garbage collected
+            self._thread = threading.Thread(
+                target=self._flush_periodically,
+                args=(weakref.ref(self), self._stop_event, flush_interval),
+                name="BufferedFileHandlerFlusher", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Write the buffered records and close the file.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+        super().close()
+
+    def emit(self, record):
+        """Add a formatted log record to the buffer.
+
+        The buffer is written if it is full or if the level of the record is
+        greater than or equal to `flush_level`.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be written.
+
+        """
+        try:
+            msg = self.format(record) + self.terminator
+            self._buffer.append(msg)
+            self._buffered_size += len(msg)
+            if self._buffered_size >= self.buffer_size \
+                    or record.levelno >= self.flush_level:
+                self._write_buffer()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Write the buffered records to the file.
+        """
+        self.acquire()
+        try:
+            self._write_buffer()
+            super().flush()
+        finally:
+            self.release()
+
+    @staticmethod
+    def _flush_periodically(handler_ref, stop_event, interval):
+        """Flush the handler every `interval` seconds until it is closed.
+
+        It runs in the background thread of the handler.
+
+        """
+        while not stop_event.wait(interval):
+            handler = handler_ref()
+            if handler is None:
+                break
+            try:
+                handler.flush()
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+            del handler
+
+    def _write_buffer(self):
+        """Write the buffered records with one write call.
+
+        The lock of the handler must be held.
+
+        """
+        if not self._buffer:
+            return
+        if self.stream is None:
+            if self.mode == 'w' and getattr(self, '_closed', False):
+                # Closed handler opened in 'w' mode: don't truncate the file
+                self._buffer.clear()
+                self._buffered_size = 0
+                return
+            self.stream = self._open()
+        data = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_size = 0
+        self.stream.write(data)
+        self.stream.flush()
+
+
+class JsonFormatter(logging.Formatter):
+    """A formatter that writes each log record as one JSON object per line.
+
+    The color tags (e.g. ``<color>``) are removed from the log messages with
+    the same method as :class:`~pyutils.colored_logger.ColoredLogger`. Thus,
+    log shippers can read the log files as JSON Lines instead of parsing the
+    plain text.
+
+    To be fast, the JSON object is not built from a :obj:`dict` for each
+    record: the JSON keys are encoded once when the formatter is created and
+    only the values are encoded for each record.
+
+    The formatter can be selected in a logging config file (see
+    :func:`setup_logging_from_cfg`) with the ``class`` key, in which case the
+    fields are given in ``format``, or with the ``()`` key::
+
+        formatters:
+          json:
+            class: pyutils.logutils.JsonFormatter
+            format: "asctime name levelname message"
+          json_utc:
+            (): pyutils.logutils.JsonFormatter
+            fields: [created, name, levelname, message]
+
+    Parameters
+    ----------
+    fmt : str, optional
+        The names of the fields separated by whitespace, e.g. ``"asctime
+        levelname message"``. It is only used if `fields` is None (the default
+        value is None).
+    datefmt : str, optional
+        The format of the ``asctime`` field as accepted by
+        :func:`time.strftime` (the default value is None which implies that
+        the ISO8601-like format of :class:`logging.Formatter` is used).
+    style : str, optional
+        Not used. It is accepted for compatibility with
+        :class:`logging.Formatter` (the default value is '%').
+    validate : bool, optional
+        Not used. It is accepted for compatibility with
+        :class:`logging.Formatter` (the default value is True).
+    fields : list of str, optional
+        The attributes of the log records written in the JSON objects, e.g.
+        'name', 'lineno', 'process' or 'created'. 'asctime' and 'message' are
+        computed like :class:`logging.Formatter` does (the default value is
+        None which implies that `fmt` or the default fields are used).
+    ensure_ascii : bool, optional
+        If `ensure_ascii` is False, the JSON objects can contain non-ASCII
+        characters. Otherwise, all such characters are escaped. See
+        :func:`json.dumps` (the default value is False).
+
+    Notes
+    -----
+    If an exception or stack information is logged, it is written under the
+    ``exc_info`` or ``stack_info`` key.
+
+    """
+
+    default_fields = ['asctime', 'name', 'levelname', 'message']
+
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True,
+                 fields=None, ensure_ascii=False):
+        # NOTE: imported here so that importing logutils stays cheap
+        import json
+        super().__init__(datefmt=datefmt)
+        if fields is None:
+            fields = fmt.split() if fmt else self.default_fields
+        self.fields = list(fields)
+        # C-accelerated escaping of the strings. The other types of values go
+        # through the full encoder.
+        if ensure_ascii:
+            self._encode_str = json.encoder.encode_basestring_ascii
+        else:
+            self._encode_str = json.encoder.encode_basestring
+        self._encode_other = json.JSONEncoder(ensure_ascii=ensure_ascii,
+                                              default=str).encode
+        # JSON keys encoded once, e.g. '"name": '
+        self._prefixes = [(self._encode_str(field) + ": ", field)
+                          for field in self.fields]
+        self._exc_prefix = self._encode_str('exc_info') + ": "
+        self._stack_prefix = self._encode_str('stack_info') + ": "
+        self._uses_time = 'asctime' in self.fields
+        self._remove_all_tags = None
+
+    def usesTime(self):
+        return self._uses_time
+
+    def format(self, record):
+        """Format a log record as a JSON object.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be formatted.
+
+        Returns
+        -------
+        str
+            The JSON object on one line.
+
+        """
+        message = record.getMessage()
+        if "<" in message:
+            message = self._get_tags_remover()(message)
+        record.message = message
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        encode = self._encode
+        items = [prefix + encode(getattr(record, field, None))
+                 for prefix, field in self._prefixes]
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            items.append(self._exc_prefix + self._encode_str(record.exc_text))
+        if record.stack_info:
+            items.append(self._stack_prefix + self._encode_str(
+                self.formatStack(record.stack_info)))
+        return "{" + ", ".join(items) + "}"
+
+    def _encode(self, value):
+        """Encode a value of a log record as JSON.
+
+        The most common types of values (:obj:`str`, :obj:`int` and
+        :obj:`float`) don't go through :class:`json.JSONEncoder`.
+
+        Parameters
+        ----------
+        value
+            The value to be encoded.
+
+        Returns
+        -------
+        str
+            The JSON representation of `value`.
+
+        """
+        value_type = type(value)
+        if value_type is str:
+            return self._encode_str(value)
+        if value_type is int or (value_type is float
+                                 and value - value == 0.0):
+            # NOTE: `value - value` is nan for nan and infinity which are
+            # encoded by the JSON encoder
+            return repr(value)
+        if value is None:
+            return "null"
+        return self._encode_other(value)
+
+    def _get_tags_remover(self):
+        """Get the function that removes the color tags from a log message.
+
+        Returns
+        -------
+        function
+            :meth:`~pyutils.colored_logger.ColoredLogger._remove_all_tags`
+
+        """
+        if self._remove_all_tags is None:
+            # NOTE: imported here since colored_logger imports logutils
+            from pyutils.colored_logger import ColoredLogger
+            self._remove_all_tags = ColoredLogger._remove_all_tags
+        return self._remove_all_tags
+
+
+class LogCollector:
+    """A class that collects in one process the log records of worker
+    processes.
+
+    The worker processes (e.g. from :mod:`multiprocessing` or
+    :class:`concurrent.futures.ProcessPoolExecutor`) don't write to the log
+    files themselves. They send their log records through a
+    :class:`multiprocessing.Queue` (a pipe) to the collecting process. There, a
+    background thread passes each record to the logger with the same name,
+    e.g. a logger setup with :func:`setup_basic_logger`. Thus, only one process
+    writes to the log files and their lines don't get interleaved. If the
+    logger is a :class:`~pyutils.colored_logger.ColoredLogger`, the colors are
+    also rendered by the collecting process.
+
+    The worker processes must be initialized with :func:`init_worker_logging`.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        Maximum number of log records waiting in the queue. If it is less than
+        or equal to zero, the queue size is infinite (the default value is 0).
+    mp_context : multiprocessing.context.BaseContext, optional
+        The :mod:`multiprocessing` context used for creating the queue, e.g.
+        ``multiprocessing.get_context('spawn')`` (the default value is None
+        which implies that the default context is used).
+
+    Examples
+    --------
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> logger = setup_basic_logger("main", add_file_handler=True)
+    >>> with LogCollector() as collector:
+    ...     with ProcessPoolExecutor(initializer=init_worker_logging,
+    ...                              initargs=(collector.queue,)) as executor:
+    ...         results = list(executor.map(work, items))
+
+    """
+
+    def __init__(self, queue_size=0, mp_context=None):
+        if mp_context is None:
+            import multiprocessing as mp_context
+        self.queue = mp_context.Queue(queue_size)
+        self._listener = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Start the background thread that collects the log records.
+        """
+        import logging.handlers
+        if self._listener is None:
+            self._listener = logging.handlers.QueueListener(
+                self.queue, _LoggerDispatchHandler())
+            self._listener.start()
+
+    def stop(self):
+        """Handle the remaining log records and stop the background thread.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class LoggingConfigWatcher:
+    """A class that applies the changes of a YAML logging config file while
+    the program runs.
+
+    The file is setup with :func:`setup_logging_from_cfg` when the watcher
+    starts. Then, a background thread checks the modification time of the
+    file every `interval` seconds. When the file changes, only what changed
+    is applied:
+
+    - the loggers whose config changed get their new level, propagation and
+      handlers
+    - the handlers whose level, formatter or filters changed are updated in
+      place, i.e. their files are not closed and reopened
+    - the handlers whose other options changed (e.g. class or filename) are
+      rebuilt and the old ones are closed
+    - the handlers and loggers removed from the file are closed and reset
+    - the handlers that no logger uses are not built, and the ones that were
+      replaced or are no longer used are closed
+
+    The changes that can't be applied incrementally (e.g. the filters of a
+    logger or ``disable_existing_loggers``) make the whole config be setup
+    again with :func:`setup_logging_from_cfg`.
+
+    If the new config is invalid, the error is logged and the current config
+    is kept.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the YAML logging config file.
+    interval : float, optional
+        Number of seconds between two checks of the file (the default value is
+        1.0).
+
+    Attributes
+    ----------
+    config_dict : dict
+        The logging config :obj:`dict` currently applied, as read from the
+        file.
+
+    Examples
+    --------
+    >>> with LoggingConfigWatcher("logging.yaml", interval=5):
+    ...     run_server()
+
+    """
+
+    # Handler options that can be changed without rebuilding the handler
+    _inplaceHandlerKeys = {'level', 'formatter', 'filters'}
+    # Top-level options that need a full setup when they change
+    _fullSetupKeys = {'version', 'incremental', 'disable_existing_loggers',
+                      'add_datetime'}
+
+    def __init__(self, filepath, interval=1.0):
+        self.filepath = filepath
+        self.interval = interval
+        self.config_dict = None
+        self._stat_key = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def check(self):
+        """Apply the changes of the config file if it was modified.
+
+        Returns
+        -------
+        bool
+            True if the file was modified and its changes applied, False
+            otherwise.
+
+        Raises
+        ------
+        KeyError
+            Raised if a key in the new logging config :obj:`dict` is not found.
+        OSError
+            Raised if the YAML logging config file can't be read.
+        ValueError
+            Raised if the new logging config :obj:`dict` is invalid.
+
+        """
+        stat_key = _get_stat_key(self.filepath)
+        if stat_key == self._stat_key:
+            return False
+        new_config = _load_logging_cfg(self.filepath)
+        if self.config_dict is None \
+                or any(self.config_dict.get(k) != new_config.get(k)
+                       for k in self._fullSetupKeys):
+            self._setup_all(new_config)
+        else:
+            self._apply_changes(self.config_dict, new_config)
+        self.config_dict = new_config
+        self._stat_key = stat_key
+        return True
+
+    def start(self):
+        """Setup logging from the config file and start watching it.
+
+        Raises
+        ------
+        KeyError
+            Raised if a key in the logging config :obj:`dict` is not found.
+        OSError
+            Raised if the YAML logging config file doesn't exist.
+        ValueError
+            Raised if the logging config :obj:`dict` is invalid.
+
+        """
+        if self._thread is None:
+            self.check()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._monitor,
+                                            name="LoggingConfigWatcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop watching the config file. The current config is kept.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _apply_changes(self, old_config, new_config):
+        """Apply only the differences between two logging configs.
+
+        Parameters
+        ----------
+        old_config : dict
+            The logging config currently applied.
+        new_config : dict
+            The new logging config.
+
+        """
+        import logging.config
+        old_loggers = dict(old_config.get('loggers') or {})
+        new_loggers = dict(new_config.get('loggers') or {})
+        # The root logger is configured like the other loggers
+        old_loggers[''] = old_config.get('root')
+        new_loggers[''] = new_config.get('root')
+        if any(old_loggers.get(name) and new_loggers.get(name)
+               and old_loggers[name].get('filters')
+               != new_loggers[name].get('filters')
+               for name in new_loggers):
+            self._setup_all(new_config)
+            return
+        old_handlers = old_config.get('handlers') or {}
+        new_handlers = new_config.get('handlers') or {}
+        # The handlers currently used, by name
+        handlers = {}
+        for name in old_loggers:
+            for h in logging.getLogger(name or None).handlers:
+                if h.name in old_handlers:
+                    handlers[h.name] = h
+        old_objects = dict(handlers)
+        # NOTE: the configurator only builds the objects (formatters, filters
+        # and handlers) that are asked for, nothing is setup or closed
+        configurator = logging.config.DictConfigurator(
+            _add_datetime_to_filename(copy.deepcopy(new_config)))
+        config = configurator.config
+        builders = (('formatters', configurator.configure_formatter),
+                    ('filters', configurator.configure_filter))
+        for key, configure in builders:
+            objs = config.get(key, {})
+            for name in objs:
+                objs[name] = configure(objs[name])
+        changed_formatters = self._get_changed(old_config, new_config,
+                                               'formatters')
+        changed_filters = self._get_changed(old_config, new_config, 'filters')
+        # NOTE: a handler that no logger uses isn't built since nothing would
+        # close it, i.e. its file would be left open at each reload
+        used = {n for cfg in new_loggers.values()
+                for n in (cfg or {}).get('handlers') or []}
+        replaced = set()
+        built = []
+        for name, new_cfg in new_handlers.items():
+            old_cfg = old_handlers.get(name)
+            h = handlers.get(name)
+            diff = {k for k in set(new_cfg) | set(old_cfg or {})
+                    if new_cfg.get(k) != (old_cfg or {}).get(k)}
+            if h is None or old_cfg is None \
+                    or not diff <= self._inplaceHandlerKeys:
+                if name not in used:
+                    continue
+                if 'target' in new_cfg:
+                    # e.g. a MemoryHandler that needs its target handler
+                    for new_h in built:
+                        new_h.close()
+                    self._setup_all(new_config)
+                    return
+                new_h = configurator.configure_handler(
+                    config['handlers'][name])
+                new_h.name = name
+                handlers[name] = new_h
+                built.append(new_h)
+                replaced.add(name)
+                continue
+            if 'level' in diff:
+                h.setLevel(new_cfg.get('level', logging.NOTSET))
+            formatter = new_cfg.get('formatter')
+            if 'formatter' in diff or formatter in changed_formatters:
+                h.setFormatter(config['formatters'][formatter]
+                               if formatter else None)
+            filters = new_cfg.get('filters') or []
+            if 'filters' in diff or set(filters) & changed_filters:
+                for f in copy.copy(h.filters):
+                    h.removeFilter(f)
+                for f in filters:
+                    h.addFilter(config['filters'][f])
+        for name in set(old_loggers) | set(new_loggers):
+            old_cfg = old_loggers.get(name)
+            new_cfg = new_loggers.get(name)
+            handler_names = set((new_cfg or {}).get('handlers') or [])
+            if old_cfg == new_cfg and not handler_names & replaced:
+                continue
+            logger = logging.getLogger(name or None)
+            new_handlers_used = [handlers[n] for n in
+                                 (new_cfg or {}).get('handlers') or []]
+            # Only the handlers setup from the config are removed
+            for h in copy.copy(logger.handlers):
+                if h.name in old_handlers and h not in new_handlers_used:
+                    logger.removeHandler(h)
+            for h in new_handlers_used:
+                if h not in logger.handlers:
+                    logger.addHandler(h)
+            if new_cfg is None:
+                if name:
+                    logger.setLevel(logging.NOTSET)
+                    logger.propagate = True
+                continue
+            if 'level' in new_cfg:
+                logger.setLevel(new_cfg['level'])
+            if name:
+                logger.propagate = new_cfg.get('propagate', True)
+            logger.disabled = False
+        # The old handlers (replaced, removed or no longer used) and the new
+        # ones that no logger ended up using are closed
+        loggers = [logging.getLogger()] + [
+            logger for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger)]
+        in_use = {h for logger in loggers for h in logger.handlers}
+        for h in list(old_objects.values()) + built:
+            if h not in in_use:
+                h.close()
+
+    @staticmethod
+    def _get_changed(old_config, new_config, key):
+        """Get the names of the formatters or filters whose config changed.
+        """
+        old = old_config.get(key) or {}
+        new = new_config.get(key) or {}
+        return {name for name in set(old) | set(new)
+                if old.get(name) != new.get(name)}
+
+    def _monitor(self):
+        """Check the config file every `interval` seconds until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.getLogger(__name__).error(
+                    "The logging config '%s' couldn't be applied: %s",
+                    self.filepath, get_error_msg(e))
+
+    def _setup_all(self, new_config):
+        """Setup the whole logging config.
+
+        Parameters
+        ----------
+        new_config : dict
+            The logging config to be setup.
+
+        """
+        setup_logging_from_cfg(copy.deepcopy(new_config))
+
+
+class LoggingMetrics:
+    """A class that keeps statistics about the logging of some loggers.
+
+    These statistics are collected:
+
+    - the number of log records by logger and level
+    - the number of records, the number of bytes written and the time spent
+      (formatting and I/O) by handler
+    - the time spent adding color to the messages by each
+      :class:`~pyutils.colored_logger.ColoredLogger`
+
+    Nothing is collected (and nothing costs anything) until a logger is tracked
+    with :meth:`track`, e.g. through the `metrics` parameter of
+    :func:`setup_basic_logger`. The statistics can be read as a :obj:`dict`
+    with :meth:`snapshot` or written to a file in the Prometheus text format
+    with :meth:`write_prometheus`, e.g. for the textfile collector of the
+    node exporter.
+
+    The log records are counted by a filter added to the tracked logger. Thus,
+    only the records logged directly with this logger are counted, not the
+    records propagated from its children. The handlers' :meth:`emit` and
+    :meth:`format` methods are wrapped for measuring the time and the bytes.
+
+    Parameters
+    ----------
+    prefix : str, optional
+        Prefix of the names of the Prometheus metrics (the default value is
+        'pyutils_logging').
+
+    Examples
+    --------
+    >>> metrics = LoggingMetrics()
+    >>> logger = setup_basic_logger("main", add_console_handler=True,
+    ...                             metrics=metrics)
+    >>> logger.info("Hello")
+    >>> metrics.snapshot()['loggers']['main']['records']
+    {'INFO': 1}
+    >>> metrics.write_prometheus("/var/lib/node_exporter/logging.prom")
+
+    """
+
+    def __init__(self, prefix='pyutils_logging'):
+        self.prefix = prefix
+        self._loggers = {}
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def add_render_time(self, logger_name, seconds):
+        """Add time spent adding color to a message.
+
+        It is called by a tracked
+        :class:`~pyutils.colored_logger.ColoredLogger` when it colors a
+        message.
+
+        Parameters
+        ----------
+        logger_name : str
+            Name of the logger which colored the message.
+        seconds : float
+            Time spent in seconds.
+
+        """
+        with self._lock:
+            stats = self._get_logger_stats(logger_name)
+            stats['render_seconds'] += seconds
+
+    def reset(self):
+        """Set all the statistics to zero.
+        """
+        with self._lock:
+            for stats in self._loggers.values():
+                stats['records'].clear()
+                stats['render_seconds'] = 0.0
+            for stats in self._handlers.values():
+                stats.update(records=0, bytes=0, io_seconds=0.0)
+
+    def snapshot(self):
+        """Get a copy of the statistics.
+
+        Returns
+        -------
+        snapshot : dict
+            The statistics with two keys:
+
+            - 'loggers': for each logger name, the number of records by level
+              name ('records') and the time spent in seconds adding color to
+              the messages ('render_seconds')
+            - 'handlers': for each handler label (its name or its class and
+              the file where it writes), the number of records ('records'),
+              of bytes ('bytes') and the time spent in seconds formatting and
+              writing the records ('io_seconds')
+
+        """
+        with self._lock:
+            return copy.deepcopy({'loggers': self._loggers,
+                                  'handlers': self._handlers})
+
+    def to_prometheus(self):
+        """Get the statistics in the Prometheus text format.
+
+        Returns
+        -------
+        text : str
+            The metrics in the Prometheus text exposition format.
+
+        """
+        snapshot = self.snapshot()
+        lines = []
+        metrics = [
+            ('records_total', 'counter',
+             "Number of log records by logger and level.",
+             [({'logger': name, 'level': level}, nb)
+              for name, stats in snapshot['loggers'].items()
+              for level, nb in stats['records'].items()]),
+            ('render_seconds_total', 'counter',
+             "Time spent adding color to the log messages.",
+             [({'logger': name}, stats['render_seconds'])
+              for name, stats in snapshot['loggers'].items()]),
+            ('handler_records_total', 'counter',
+             "Number of log records emitted by handler.",
+             [({'handler': label}, stats['records'])
+              for label, stats in snapshot['handlers'].items()]),
+            ('handler_bytes_total', 'counter',
+             "Number of bytes written by handler.",
+             [({'handler': label}, stats['bytes'])
+              for label, stats in snapshot['handlers'].items()]),
+            ('handler_io_seconds_total', 'counter',
+             "Time spent formatting and writing the log records by handler.",
+             [({'handler': label}, stats['io_seconds'])
+              for label, stats in snapshot['handlers'].items()])
+        ]
+        for name, metric_type, help_text, samples in metrics:
+            name = "{}_{}".format(self.prefix, name)
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for labels, value in samples:
+                labels = ",".join(
+                    '{}="{}"'.format(k, self._escape_label_value(v))
+                    for k, v in labels.items())
+                lines.append("{}{{{}}} {}".format(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+    def track(self, logger):
+        """Start collecting statistics about a logger and its handlers.
+
+        Only the handlers already added to the logger are tracked. Tracking a
+        logger twice has no effect.
+
+        Parameters
+        ----------
+        logger : logging.Logger
+            The logger to be tracked.
+
+        """
+        with self._lock:
+            self._get_logger_stats(logger.name)
+        if not any(isinstance(f, _MetricsFilter) and f.metrics is self
+                   for f in logger.filters):
+            logger.addFilter(_MetricsFilter(self))
+        if hasattr(logger, '_metrics'):
+            # ColoredLogger: the time spent rendering colors is added
+            logger._metrics = self
+        for handler in logger.handlers:
+            self._track_handler(handler)
+
+    def untrack(self, logger):
+        """Stop collecting statistics about a logger and its handlers.
+
+        The statistics already collected are kept. The handlers still used by
+        another tracked logger (e.g. a shared file handler) stay tracked.
+
+        Parameters
+        ----------
+        logger : logging.Logger
+            The logger that is not tracked anymore.
+
+        """
+        for f in copy.copy(logger.filters):
+            if isinstance(f, _MetricsFilter) and f.metrics is self:
+                logger.removeFilter(f)
+        if getattr(logger, '_metrics', None) is self:
+            logger._metrics = None
+        # NOTE: a handler can be shared with other loggers that are still
+        # tracked, e.g. by get_shared_file_handler()
+        tracked_loggers = [
+            other for other in [logging.getLogger()]
+            + list(logging.Logger.manager.loggerDict.values())
+            if isinstance(other, logging.Logger) and other is not logger
+            and any(isinstance(f, _MetricsFilter) and f.metrics is self
+                    for f in other.filters)]
+        for handler in logger.handlers:
+            if getattr(handler, '_metrics', None) is self \
+                    and not any(handler in other.handlers
+                                for other in tracked_loggers):
+                # Remove the wrappers so that the class methods are used again
+                del handler.emit, handler.format, handler._metrics
+
+    def write_prometheus(self, filepath):
+        """Write the statistics to a file in the Prometheus text format.
+
+        The file is written to a temporary file and then renamed. Thus, a
+        scraper never reads a partially written file.
+
+        Parameters
+        ----------
+        filepath : str
+            Path to the file, e.g. in the directory of the textfile collector
+            of the node exporter. The extension should be '.prom'.
+
+        Raises
+        ------
+        OSError
+            Raised if any I/O related error occurs while writing the file.
+
+        """
+        tmp_filepath = "{}.{}.tmp".format(filepath, os.getpid())
+        with open(tmp_filepath, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_filepath, filepath)
+
+    def _count_record(self, record):
+        """Count a log record by logger and level.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be counted.
+
+        """
+        with self._lock:
+            records = self._get_logger_stats(record.name)['records']
+            records[record.levelname] = records.get(record.levelname, 0) + 1
+
+    @staticmethod
+    def _escape_label_value(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n") \
+            .replace('"', '\\"')
+
+    @staticmethod
+    def _get_handler_label(handler):
+        """Get the label of a handler in the statistics.
+
+        Parameters
+        ----------
+        handler : logging.Handler
+
+        Returns
+        -------
+        label : str
+            The name of the handler if it has one. Otherwise, its class name
+            and the path of its file (or the name of its stream), e.g.
+            'StreamHandler:<stderr>'.
+
+        """
+        if handler.name:
+            return handler.name
+        target = getattr(handler, 'baseFilename', None) \
+            or getattr(getattr(handler, 'stream', None), 'name', None) \
+            or hex(id(handler))
+        return "{}:{}".format(type(handler).__name__, target)
+
+    def _get_logger_stats(self, logger_name):
+        stats = self._loggers.get(logger_name)
+        if stats is None:
+            stats = self._loggers[logger_name] = {'records': {},
+                                                  'render_seconds': 0.0}
+        return stats
+
+    def _track_handler(self, handler):
+        """Wrap the methods of a handler to measure its time and bytes.
+
+        Parameters
+        ----------
+        handler : logging.Handler
+            The handler to be tracked.
+
+        """
+        if getattr(handler, '_metrics', None) is not None:
+            return
+        label = self._get_handler_label(handler)
+        with self._lock:
+            stats = self._handlers.setdefault(
+                label, {'records': 0, 'bytes': 0, 'io_seconds': 0.0})
+        emit = handler.emit
+        format_record = handler.format
+        terminator = getattr(handler, 'terminator', '')
+        lock = self._lock
+
+        def timed_emit(record):
+            start = time.perf_counter()
+            try:
+                emit(record)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats['records'] += 1
+                    stats['io_seconds'] += elapsed
+
+        def sized_format(record):
+            msg = format_record(record)
+            nb_bytes = len(msg) if msg.isascii() \
+                else len(msg.encode('utf-8', 'replace'))
+            with lock:
+                stats['bytes'] += nb_bytes + len(terminator)
+            return msg
+
+        handler.emit = timed_emit
+        handler.format = sized_format
+        handler._metrics = self
+
+
+class RateLimitFilter(logging.Filter):
+    """A filter that limits the rate of repeated log messages.
+
+    The log records are grouped by (logger name, level, format string), e.g.
+    all the records logged with ``logger.info("Waiting %s seconds...",
+    delay)`` by the same logger have the same key. For each key, at most
+    `rate` records are let through every `period` seconds. The other records
+    of the burst are dropped and counted.
+
+    When the burst ends, i.e. when a record with the same key arrives in a new
+    period, a summary record is logged before it, e.g.::
+
+        Message repeated 95 times: Waiting 8 seconds...
+
+    The keys are kept in a bounded LRU structure. If a key with dropped
+    records is evicted, its summary is logged right away. Thus, the memory used
+    by the filter stays flat.
+
+    The filter can be added to a :class:`logging.Logger` or a
+    :class:`~pyutils.colored_logger.ColoredLogger` with
+    :meth:`~logging.Logger.addFilter`. The summaries are logged through the
+    logger with the same name as the dropped records.
+
+    Parameters
+    ----------
+    rate : int, optional
+        Maximum number of records with the same key let through in a period
+        (the default value is 10).
+    period : float, optional
+        Length of a period in seconds (the default value is 1.0).
+    max_keys : int, optional
+        Maximum number of keys kept in memory (the default value is 1000).
+
+    """
+
+    summary_prefix = "Message repeated {} times: "
+
+    def __init__(self, rate=10, period=1.0, max_keys=1000):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.max_keys = max_keys
+        # Keys are (name, levelno, msg) and values are [start of the period,
+        # number of records in the period, number of dropped records, last
+        # dropped record]
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        """Determine if the log record is let through.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be checked.
+
+        Returns
+        -------
+        bool
+            True if the record is let through. Otherwise, False.
+
+        """
+        if getattr(record, '_rate_limit_summary', False) \
+                or not isinstance(record.msg, str):
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = record.created
+        summaries = []
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                state = [now, 0, 0, None]
+                self._keys[key] = state
+                if len(self._keys) > self.max_keys:
+                    _, old_state = self._keys.popitem(last=False)
+                    if old_state[2]:
+                        summaries.append(old_state[2:])
+            else:
+                self._keys.move_to_end(key)
+                if now - state[0] >= self.period:
+                    # New period: the burst has ended
+                    if state[2]:
+                        summaries.append(state[2:])
+                    state[:] = [now, 0, 0, None]
+            state[1] += 1
+            passed = state[1] <= self.rate
+            if not passed:
+                state[2] += 1
+                state[3] = record
+        for nb_dropped, last_record in summaries:
+            self._log_summary(nb_dropped, last_record)
+        return passed
+
+    def flush(self):
+        """Log the summaries of all the bursts with dropped records.
+
+        It can be called before the program exits so that the last bursts are
+        also summarized.
+
+        """
+        summaries = []
+        with self._lock:
+            for state in self._keys.values():
+                if state[2]:
+                    summaries.append(state[2:])
+                    state[2:] = [0, None]
+        for nb_dropped, last_record in summaries:
+            self._log_summary(nb_dropped, last_record)
+
+    def _log_summary(self, nb_dropped, last_record):
+        """Log the summary of a burst through the logger of the burst.
+
+        Parameters
+        ----------
+        nb_dropped : int
+            Number of records dropped during the burst.
+        last_record : logging.LogRecord
+            The last record dropped during the burst.
+
+        """
+        # NOTE: the format string of the burst is kept (and not the merged
+        # message) so that its color tags can still be processed
+        summary = copy.copy(last_record)
+        summary.msg = self.summary_prefix.format(nb_dropped) + last_record.msg
+        summary.exc_info = None
+        summary.exc_text = None
+        summary._rate_limit_summary = True
+        logging.getLogger(last_record.name).handle(summary)
+
+
+class RingBufferHandler(logging.Handler):
+    """A handler that keeps the last formatted log records in a ring buffer.
+
+    The formatted records are written in a buffer that is allocated once with
+    `capacity` slots of `slot_size` bytes. When the buffer is full, the oldest
+    record is overwritten. The buffer is dumped when a record with a level
+    greater than or equal to `dump_level` is handled (e.g. ERROR), or on demand
+    with :meth:`dump`.
+
+    Thus, a program can run with its console and file handlers at the WARNING
+    level and still get the DEBUG context around a failure, without writing
+    every DEBUG record to disk. The logger's level must be low enough (e.g.
+    DEBUG) so that the records are created.
+
+    If `filepath` is given, the buffer is a memory-mapped file. Its content
+    survives a crash of the process and can be read with
+    :func:`load_ring_buffer`. If the file already exists with the same
+    capacity and slot size, the records it contains are kept.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Number of log records kept in the buffer (the default value is 1000).
+    slot_size : int, optional
+        Maximum size in bytes of a formatted log record, including a 4-byte
+        length. Longer records are truncated (the default value is 512).
+    filepath : str, optional
+        Path to the file backing the buffer (the default value is None which
+        implies that the buffer is only in memory).
+    dump_level : int, optional
+        The records with this level or higher trigger a dump of the buffer
+        (the default value is ``logging.ERROR``). If None, the buffer is only
+        dumped on demand.
+    dump_stream : file object, optional
+        The stream where the buffer is dumped (the default value is None which
+        implies that :obj:`sys.stderr` is used).
+    level : int, optional
+        Level of the handler (the default value is ``logging.NOTSET``).
+
+    """
+
+    _header = struct.Struct("<8sIIQ")
+    _length = struct.Struct("<I")
+    _magic = b"PYRING01"
+
+    def __init__(self, capacity=1000, slot_size=512, filepath=None,
+                 dump_level=logging.ERROR, dump_stream=None,
+                 level=logging.NOTSET):
+        super().__init__(level)
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.filepath = filepath
+        self.dump_level = dump_level
+        self.dump_stream = dump_stream
+        self._count = 0
+        self._file = None
+        size = self._header.size + capacity * slot_size
+        if filepath:
+            import mmap
+            self._file = open(filepath, 'a+b')
+            same_geometry = self._file.seek(0, os.SEEK_END) == size
+            if not same_geometry:
+                self._file.truncate(0)
+                self._file.truncate(size)
+            self._buffer = mmap.mmap(self._file.fileno(), size)
+            if same_geometry:
+                magic, file_capacity, file_slot_size, count = \
+                    self._header.unpack_from(self._buffer)
+                if (magic, file_capacity, file_slot_size) \
+                        == (self._magic, capacity, slot_size):
+                    self._count = count
+        else:
+            self._buffer = bytearray(size)
+        self._write_header()
+
+    def clear(self):
+        """Remove all the records from the buffer.
+        """
+        self.acquire()
+        try:
+            self._count = 0
+            self._write_header()
+        finally:
+            self.release()
+
+    def close(self):
+        """Close the handler and the file backing the buffer (if any).
+        """
+        self.acquire()
+        try:
+            if self._file:
+                self._buffer.flush()
+                self._buffer.close()
+                self._file.close()
+                self._file = None
+        finally:
+            self.release()
+        super().close()
+
+    def dump(self, stream=None, clear=True):
+        """Write the records in the buffer to a stream, from oldest to newest.
+
+        Parameters
+        ----------
+        stream : file object, optional
+            The stream where the records are written (the default value is
+            None which implies that `dump_stream` is used).
+        clear : bool, optional
+            Whether the buffer is cleared after the dump (the default value is
+            True).
+
+        """
+        self.acquire()
+        try:
+            records = self.get_records()
+            if clear:
+                self._count = 0
+                self._write_header()
+        finally:
+            self.release()
+        if records:
+            stream = stream or self.dump_stream or sys.stderr
+            stream.write("\n".join(records) + "\n")
+            stream.flush()
+
+    def emit(self, record):
+        """Write a formatted record in the buffer.
+
+        The buffer is dumped if the record's level is greater than or equal to
+        `dump_level`.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be kept.
+
+        """
+        try:
+            data = self.format(record).encode('utf8')
+            data = data[:self.slot_size - self._length.size]
+            offset = self._header.size \
+                + (self._count % self.capacity) * self.slot_size
+            self._length.pack_into(self._buffer, offset, len(data))
+            start = offset + self._length.size
+            self._buffer[start:start + len(data)] = data
+            self._count += 1
+            self._write_header()
+        except Exception:
+            self.handleError(record)
+            return
+        if self.dump_level is not None and record.levelno >= self.dump_level:
+            self.dump()
+
+    def flush(self):
+        """Flush the memory-mapped file (if any) to disk.
+        """
+        self.acquire()
+        try:
+            if self._file:
+                self._buffer.flush()
+        finally:
+            self.release()
+
+    def get_records(self):
+        """Get the formatted records in the buffer, from oldest to newest.
+
+        Returns
+        -------
+        list of str
+            The formatted records.
+
+        """
+        return self._read_slots(self._buffer, self.capacity, self.slot_size,
+                                self._count)
+
+    @classmethod
+    def _read_slots(cls, buffer, capacity, slot_size, count):
+        """Read the formatted records from a buffer, from oldest to newest.
+
+        Parameters
+        ----------
+        buffer : bytearray or mmap.mmap
+            The buffer with the header and the slots.
+        capacity : int
+            Number of slots.
+        slot_size : int
+            Size of a slot in bytes.
+        count : int
+            Total number of records written in the buffer.
+
+        Returns
+        -------
+        records : list of str
+            The formatted records.
+
+        """
+        records = []
+        for i in range(max(count - capacity, 0), count):
+            offset = cls._header.size + (i % capacity) * slot_size
+            length, = cls._length.unpack_from(buffer, offset)
+            start = offset + cls._length.size
+            # NOTE: a truncated record can end in the middle of a character
+            records.append(
+                bytes(buffer[start:start + length]).decode('utf8', 'ignore'))
+        return records
+
+    def _write_header(self):
+        """Write the header of the buffer with the number of records written.
+        """
+        self._header.pack_into(self._buffer, 0, self._magic, self.capacity,
+                               self.slot_size, self._count)
+
+
+class RotatingCompressedFileHandler(logging.FileHandler):
+    """A file handler that rotates the log file by size and by time and
+    compresses the rotated files in a background thread.
+
+    The log file is rotated when writing a record would make it exceed
+    `max_bytes` bytes or when it has been opened for `rotation_interval`
+    seconds. A rotated file is named like the files setup with the option
+    ``add_datetime`` of :func:`setup_logging_from_cfg`, i.e. with the date and
+    time when the file was started before its name::
+
+        2019-08-29-00-58-22-debug.log.gz
+
+    A file is started when the handler is created or when the previous file
+    is rotated. Thus, its date and time can be earlier than its first record,
+    e.g. with `delay` or if nothing is logged for a while.
+
+    The rotated files are compressed (gzip or xz) by a background thread.
+    Thus, the logging thread never waits for the compression, only for the
+    rename of the file. When the handler is closed, it waits until all the
+    rotated files are compressed. Only the `backup_count` most recent rotated
+    files are kept.
+
+    If `add_datetime` is True, the current log file also has the date and time
+    before its name and a rotation simply starts a new file. This is what
+    :func:`setup_logging_from_cfg` does when the option ``add_datetime`` is
+    True and the file handler is a :class:`RotatingCompressedFileHandler`::
+
+        add_datetime: True
+        handlers:
+          file:
+            class: pyutils.logutils.RotatingCompressedFileHandler
+            filename: debug.log
+            max_bytes: 10485760
+            rotation_interval: 86400
+            backup_count: 30
+            compression: xz
+
+    Parameters
+    ----------
+    filename : str
+        Path to the log file.
+    mode : str, optional
+        Mode used to open the file (the default value is 'a').
+    encoding : str, optional
+        Encoding of the file (the default value is None which implies that
+        the platform-dependent encoding is used).
+    delay : bool, optional
+        Whether the file is only opened when the first record is written (the
+        default value is False).
+    max_bytes : int, optional
+        Maximum size of a log file in bytes, i.e. the records are counted once
+        encoded. If 0, the file is not rotated by size (the default value is
+        0).
+    rotation_interval : float, optional
+        Number of seconds after which the log file is rotated, counted from
+        when it was started. If None or 0, the file is not rotated by time
+        (the default value is None).
+    backup_count : int, optional
+        Number of rotated files kept. If 0, all the rotated files are kept (the
+        default value is 0).
+    compression : str, {'gzip', 'xz', None}, optional
+        Compression of the rotated files (the default value is 'gzip').
+    add_datetime : bool, optional
+        Whether the date and time is added before the name of the current log
+        file (the default value is False).
+
+    Raises
+    ------
+    ValueError
+        Raised if the compression is not supported.
+
+    """
+
+    _compressionToExtension = {None: '', 'gzip': '.gz', 'xz': '.xz'}
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 max_bytes=0, rotation_interval=None, backup_count=0,
+                 compression='gzip', add_datetime=False):
+        if compression not in self._compressionToExtension:
+            raise ValueError(
+                "Compression '{}' is not supported. These are the supported "
+                "compressions: {}".format(
+                    compression, list(self._compressionToExtension)))
+        self.max_bytes = max_bytes
+        self.rotation_interval = rotation_interval
+        self.backup_count = backup_count
+        self.compression = compression
+        self.add_datetime = add_datetime
+        # The filename without the date and time
+        self._filename = os.path.abspath(filename)
+        self._opened_at = time.time()
+        self._size = 0
+        self._queue = None
+        self._thread = None
+        if add_datetime:
+            filename = _get_datetime_filename(self._filename, self._opened_at)
+        super().__init__(filename, mode, encoding, delay)
+
+    def close(self):
+        """Close the log file and wait until the rotated files are compressed.
+        """
+        super().close()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def do_rollover(self):
+        """Rotate the log file and compress it in the background thread.
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) \
+                and os.path.getsize(self.baseFilename):
+            if self.add_datetime:
+                rotated_filepath = self.baseFilename
+            else:
+                rotated_filepath = self._get_free_filepath(
+                    _get_datetime_filename(self._filename, self._opened_at))
+                os.replace(self.baseFilename, rotated_filepath)
+            self._submit(rotated_filepath)
+        self._opened_at = time.time()
+        if self.add_datetime:
+            self.baseFilename = self._get_free_filepath(
+                _get_datetime_filename(self._filename, self._opened_at))
+        self.stream = self._open()
+        self._size = 0
+
+    def emit(self, record):
+        """Write a log record, after rotating the log file if needed.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The log record to be written.
+
+        """
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                if self.mode == 'w' and getattr(self, '_closed', False):
+                    return
+                self.stream = self._open()
+            # NOTE: the size of the file is in bytes, thus the record is
+            # encoded (only if it is needed)
+            if self.max_bytes:
+                msg_size = len(msg.encode(self.stream.encoding,
+                                          self.stream.errors))
+            else:
+                msg_size = len(msg)
+            if self._should_rollover(msg_size):
+                self.do_rollover()
+            self.stream.write(msg)
+            self.stream.flush()
+            self._size += msg_size
+        except Exception:
+            self.handleError(record)
+
+    def _compress(self, filepath):
+        """Compress a rotated log file and remove the oldest ones.
+
+        It runs in the background thread.
+
+        Parameters
+        ----------
+        filepath : str
+            Path to the rotated log file.
+
+        """
+        import shutil
+        extension = self._compressionToExtension[self.compression]
+        if extension:
+            if self.compression == 'gzip':
+                import gzip as compression_module
+            else:
+                import lzma as compression_module
+            tmp_filepath = filepath + extension + ".tmp"
+            with open(filepath, 'rb') as src, \
+                    compression_module.open(tmp_filepath, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_filepath, filepath + extension)
+            os.remove(filepath)
+        if self.backup_count:
+            for old_filepath in self._get_rotated_filepaths()[
+                                :-self.backup_count]:
+                os.remove(old_filepath)
+
+    def _get_free_filepath(self, filepath):
+        """Get a path not used by a log file, compressed or not.
+
+        A number is added at the end of the path if it is already used, e.g.
+        when the file is rotated twice in the same second.
+
+        """
+        extension = self._compressionToExtension[self.compression]
+        candidate = filepath
+        i = 0
+        while os.path.exists(candidate) \
+                or os.path.exists(candidate + extension):
+            i += 1
+            candidate = "{}.{}".format(filepath, i)
+        return candidate
+
+    def _get_rotated_filepaths(self):
+        """Get the paths of the rotated log files, from oldest to newest.
+        """
+        import glob
+        dirname, basename = os.path.split(self._filename)
+        pattern = os.path.join(glob.escape(dirname),
+                               "[0-9]" * 4 + "-[0-9][0-9]" * 5 + "-"
+                               + glob.escape(basename) + "*")
+        extension = self._compressionToExtension[self.compression]
+        # NOTE: the glob also matches the other files with the same prefix,
+        # e.g. 'debug.log.bak' or the temporary files of _compress(). Only
+        # the optional number added by _get_free_filepath() is accepted.
+        regex = re.compile(r"(\d{4}(?:-\d{2}){5}-)" + re.escape(basename)
+                           + r"(?:\.(\d+))?" + re.escape(extension))
+        rotated_filepaths = []
+        for filepath in glob.glob(pattern):
+            match = regex.fullmatch(os.path.basename(filepath))
+            if match and filepath != self.baseFilename:
+                # The date and time, then the number
+                order = match.group(1), int(match.group(2) or 0)
+                rotated_filepaths.append((order, filepath))
+        return [filepath for _, filepath in sorted(rotated_filepaths)]
+
+    def _monitor(self):
+        """Compress the rotated log files until the handler is closed.
+        """
+        while True:
+            filepath = self._queue.get()
+            if filepath is None:
+                break
+            try:
+                self._compress(filepath)
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+
+    def _open(self):
+        stream = super()._open()
+        # NOTE: the position at the end of a text file is its size in bytes,
+        # like the sizes of the records added in emit()
+        self._size = stream.seek(0, os.SEEK_END)
+        return stream
+
+    def _should_rollover(self, msg_size):
+        if self.max_bytes and self._size \
+                and self._size + msg_size > self.max_bytes:
+            return True
+        if self.rotation_interval \
+                and time.time() - self._opened_at >= self.rotation_interval:
+            return True
+        return False
+
+    def _submit(self, filepath):
+        """Give a rotated log file to the background thread.
+        """
+        if self._thread is None:
+            import queue
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._monitor, name="RotatingFileCompressor",
+                daemon=True)
+            self._thread.start()
+        self._queue.put(filepath)
+
+
+class _LoggerDispatchHandler(logging.Handler):
+    """Handler that passes a log record to the logger with the same name.
+
+    It is used by the background thread of :class:`LogCollector`. The
+    handlers' levels are checked by the logger itself.
+
+    """
+
+    def handle(self, record):
+        logger = logging.getLogger(record.name)
+        logger.handle(record)
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+
+class _SharedHandlerMixin:
+    """Mixin of the file handlers returned by :func:`get_shared_file_handler`.
+
+    Each call to :func:`get_shared_file_handler` counts as a user of the
+    handler and each call to :meth:`close` releases one. The handler is only
+    closed (and removed from the registry of shared handlers) when its last
+    user releases it. Thus, a logger that is torn down doesn't close the file
+    of the other loggers, and the next call to :func:`get_shared_file_handler`
+    after the last release opens the file again.
+
+    """
+
+    _registry_key = None
+    _nb_users = 0
+
+    def close(self):
+        with _sharedFileHandlersLock:
+            self._nb_users = max(self._nb_users - 1, 0)
+            if self._nb_users:
+                return
+            if _sharedFileHandlers.get(self._registry_key) is self:
+                del _sharedFileHandlers[self._registry_key]
+        super().close()
+
+
+class _SharedBufferedFileHandler(_SharedHandlerMixin, BufferedFileHandler):
+    pass
+
+
+class _SharedFileHandler(_SharedHandlerMixin, logging.FileHandler):
+    pass
+
+
+class _MetricsFilter(logging.Filter):
+    """Filter that counts the log records of a logger tracked by
+    :class:`LoggingMetrics`. It lets all the records through.
+
+    """
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def filter(self, record):
+        self.metrics._count_record(record)
+        return True
+
+
+class _WorkerFormatter(logging.Formatter):
+    """Formatter of the queue handler of a worker process (see
+    :func:`init_worker_logging`).
+
+    The queue handler merges the arguments into the message before the record
+    is sent to the :class:`LogCollector`. If the message has color tags, the
+    record also gets the message whose literal text was unescaped before the
+    merge (see :func:`~pyutils.colored_logger._unescape_markup`). Thus, the
+    collecting process colors the message without unescaping the HTML
+    character references of the arguments, like the worker process would.
+
+    """
+
+    def format(self, record):
+        msg = record.msg
+        if isinstance(msg, str) and "<" in msg:
+            # NOTE: imported here since colored_logger imports logutils
+            from pyutils.colored_logger import ColoredLogger, _unescape_markup
+            if ColoredLogger._found_tags(msg):
+                unescaped_record = copy.copy(record)
+                unescaped_record.msg = _unescape_markup(msg)
+                record._unescaped_msg = super().format(unescaped_record)
+        return super().format(record)
 
 
 def get_error_msg(exc):
@@ -45,13 +1774,376 @@ def get_error_msg(exc):
     return error_msg
 
 
+def get_line_regex(fmt):
+    """Get the regex that parses the log lines written with a format string.
+
+    Parameters
+    ----------
+    fmt : str
+        The format string of a :class:`logging.Formatter` with the '%' style,
+        e.g. ``"%(asctime)s | %(levelname)-8s | %(message)s"``.
+
+    Returns
+    -------
+    regex : re.Pattern
+        The compiled regex whose named groups are the fields of the format
+        string.
+
+    """
+    parts = []
+    pos = 0
+    seen = set()
+    for match in _placeholderRegex.finditer(fmt):
+        parts.append(re.escape(fmt[pos:match.start()]))
+        field = match.group(1)
+        if field in seen:
+            # A field can only be captured once
+            parts.append(".*?")
+        else:
+            seen.add(field)
+            group = "(?P<{}>{})".format(field,
+                                        _fieldToRegex.get(field, r".*?"))
+            if match.group(2):
+                # The value is padded with spaces, e.g. %(levelname)-8s
+                group = " *" + group + " *"
+            parts.append(group)
+        pos = match.end()
+    parts.append(re.escape(fmt[pos:]))
+    return re.compile(r"^\s*" + "".join(parts) + r"\s*$", re.DOTALL)
+
+
+def get_shared_file_handler(log_filepath, fmt=None, level=logging.DEBUG,
+                            buffered=False):
+    """Get the file handler shared by all the loggers of the process that
+    write to the same file with the same format and level.
+
+    Only one file handler is created for each (file path, format, level,
+    type of handler). Thus, dozens of loggers writing to the same file use
+    one file descriptor and one buffer, and their lines don't get
+    interleaved.
+
+    Each call counts as a user of the handler. Closing the handler (e.g. when
+    a logger is torn down) only releases one user: the file is closed when
+    the last user closes the handler. The next call then opens the file again
+    with a new handler. At exit, :func:`logging.shutdown` flushes the handler
+    even if it still has users.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file.
+    fmt : str, optional
+        Format string of the handler's :class:`logging.Formatter` (the default
+        value is None which implies that the default format of
+        :mod:`logging` is used).
+    level : int, optional
+        Log level of the handler (the default value is ``logging.DEBUG``).
+    buffered : bool, optional
+        Whether the handler is a :class:`BufferedFileHandler` that writes the
+        records in batches (the default value is False which implies that a
+        :class:`logging.FileHandler` is used).
+
+    Returns
+    -------
+    handler : logging.FileHandler
+        The shared file handler.
+
+    Raises
+    ------
+    OSError
+        Raised if the log file can't be opened.
+
+    """
+    key = (os.path.abspath(log_filepath), fmt, level, buffered)
+    with _sharedFileHandlersLock:
+        handler = _sharedFileHandlers.get(key)
+        if handler is None:
+            if buffered:
+                handler = _SharedBufferedFileHandler(log_filepath)
+            else:
+                handler = _SharedFileHandler(log_filepath)
+            handler._registry_key = key
+            handler.setLevel(level)
+            if fmt:
+                handler.setFormatter(logging.Formatter(fmt))
+            _sharedFileHandlers[key] = handler
+        handler._nb_users += 1
+    return handler
+
+
+def init_worker_logging(log_queue, level=logging.DEBUG,
+                        remove_all_initial_handlers=True):
+    """Setup logging in a worker process so that it sends its log records to a
+    :class:`LogCollector`.
+
+    A :class:`logging.handlers.QueueHandler` is added to the root logger. It
+    can be used as the `initializer` of a :class:`multiprocessing.pool.Pool`
+    or of a :class:`concurrent.futures.ProcessPoolExecutor`, with
+    ``initargs=(collector.queue,)``.
+
+    Parameters
+    ----------
+    log_queue : multiprocessing.Queue
+        The queue of the :class:`LogCollector`, i.e. ``collector.queue``.
+    level : int, optional
+        Log level of the root logger in the worker process (the default value
+        is ``logging.DEBUG``).
+    remove_all_initial_handlers : bool, optional
+        Whether all the handlers of the loggers inherited from the parent
+        process are removed and the loggers set to propagate their records to
+        the root logger (the default value is True which implies that no
+        worker process writes directly to a log file, e.g. when the worker
+        processes are forked from a process that has already setup its
+        loggers).
+
+    Returns
+    -------
+    queue_handler : logging.handlers.QueueHandler
+        The handler added to the root logger.
+
+    """
+    import logging.handlers
+    root = logging.getLogger()
+    if remove_all_initial_handlers:
+        loggers = [root] + [
+            logger for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger)]
+        for logger in loggers:
+            handlers = copy.copy(logger.handlers)
+            for h in handlers:
+                logger.removeHandler(h)
+            logger.propagate = True
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(_WorkerFormatter())
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    return queue_handler
+
+
+def load_ring_buffer(filepath):
+    """Load the formatted log records from the file of a
+    :class:`RingBufferHandler`.
+
+    It can be used after a crash to get the last log records.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file backing the ring buffer.
+
+    Returns
+    -------
+    list of str
+        The formatted log records, from oldest to newest.
+
+    Raises
+    ------
+    OSError
+        Raised if any I/O related error occurs while reading the file, e.g. the
+        file doesn't exist.
+    ValueError
+        Raised if the file is not a ring buffer file.
+
+    """
+    with open(filepath, 'rb') as f:
+        buffer = f.read()
+    header = RingBufferHandler._header
+    if len(buffer) < header.size:
+        raise ValueError("'{}' is not a ring buffer file".format(filepath))
+    magic, capacity, slot_size, count = header.unpack_from(buffer)
+    if magic != RingBufferHandler._magic \
+            or len(buffer) != header.size + capacity * slot_size:
+        raise ValueError("'{}' is not a ring buffer file".format(filepath))
+    return RingBufferHandler._read_slots(buffer, capacity, slot_size, count)
+
+
+def parse_log_line(line, line_regex=None):
+    """Parse a log line written with one of the configured formats.
+
+    Parameters
+    ----------
+    line : str
+        The log line without its newline.
+    line_regex : re.Pattern, optional
+        The regex returned by :func:`get_line_regex` for the format string of
+        the formatter that wrote the line (the default value is None which
+        implies that the line is a JSON object written by
+        :class:`JsonFormatter`).
+
+    Returns
+    -------
+    fields : tuple or None
+        The timestamp (as written by ``asctime``), level name, logger name
+        and message of the log record, or None if the line doesn't start a new
+        log record, e.g. it is a line of a traceback.
+
+    """
+    if line_regex is None:
+        import json
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        timestamp = obj.get('asctime')
+        if timestamp is None and 'created' in obj:
+            created = float(obj['created'])
+            timestamp = "{},{:03d}".format(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created)),
+                int(created * 1000) % 1000)
+        return (timestamp, obj.get('levelname'), obj.get('name'),
+                str(obj.get('message', line)))
+    match = line_regex.match(line)
+    if match is None:
+        return None
+    fields = match.groupdict()
+    level = fields.get('levelname')
+    return (fields.get('asctime'), level.strip() if level else None,
+            (fields.get('name') or '').strip() or None,
+            fields.get('message', line))
+
+
+def read_log_records(log_filepath, fmt=VERBOSE_FORMAT, level=None,
+                     start=None, end=None, logger_name=None, follow=False,
+                     poll_interval=0.5, offset=0):
+    """Read the log records of a log file one at a time.
+
+    The log file is memory-mapped and parsed line by line with
+    :func:`parse_log_line`. Thus, a log file of many gigabytes can be filtered
+    without loading it in memory. The lines that don't start a log record
+    (e.g. the lines of a traceback) are added to the message of the previous
+    record.
+
+    In follow mode, the generator doesn't stop at the end of the file: like
+    ``tail -f``, it waits for the lines appended to the file. If the file is
+    truncated or replaced (e.g. rotated), it is read again from the beginning.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file.
+    fmt : str, optional
+        The format string of the formatter that wrote the log file, or 'json'
+        for a file written by :class:`JsonFormatter` (the default value is
+        `VERBOSE_FORMAT`, the format of the verbose formatter of the YAML
+        logging config files).
+    level : int or str, optional
+        Only the records with this level or higher, e.g. 'WARNING' (the
+        default value is None which implies that all levels are read).
+    start : str, optional
+        Only the records logged at or after this date and time, in the format
+        of ``asctime``, e.g. '2019-08-29 00:58:22'.
+    end : str, optional
+        Only the records logged before this date and time.
+    logger_name : str, optional
+        Only the records of this logger and its children, e.g. 'scripts' for
+        the records of 'scripts.scraper'.
+    follow : bool, optional
+        Whether to wait for the records appended to the file (the default
+        value is False).
+    poll_interval : float, optional
+        Number of seconds between two checks of the file in follow mode (the
+        default value is 0.5).
+    offset : int, optional
+        Byte offset where the reading starts. It must be the beginning of a
+        line (the default value is 0).
+
+    Yields
+    ------
+    record : dict
+        A log record with the keys 'timestamp', 'level', 'logger', 'message'
+        and 'offset' (byte offset of the record in the file).
+
+    Raises
+    ------
+    OSError
+        Raised if the log file can't be read.
+    TypeError
+        Raised if the level is neither an integer nor a string.
+    ValueError
+        Raised if the level is a string that isn't the name of a log level,
+        e.g. 'EROR'.
+
+    Examples
+    --------
+    >>> for record in read_log_records("debug.log", level='ERROR',
+    ...                                start="2019-08-29"):
+    ...     print(record['timestamp'], record['message'])
+
+    """
+    line_regex = None if fmt == 'json' else get_line_regex(fmt)
+    if isinstance(level, str):
+        levelno = logging.getLevelName(level.upper())
+        # NOTE: getLevelName() returns 'Level <name>' for an unknown name
+        if not isinstance(levelno, int):
+            raise ValueError("Level '{}' is not a log level".format(level))
+        level = levelno
+    elif level is not None and not isinstance(level, int):
+        raise TypeError("Level {!r} is neither an integer nor a "
+                        "string".format(level))
+    logger_prefix = logger_name + "." if logger_name else None
+
+    def is_selected(record):
+        if level is not None:
+            levelno = logging.getLevelName(record['level'])
+            if not isinstance(levelno, int) or levelno < level:
+                return False
+        if start is not None or end is not None:
+            timestamp = record['timestamp']
+            if timestamp is None or start is not None and timestamp < start \
+                    or end is not None and timestamp >= end:
+                return False
+        if logger_name is not None:
+            name = record['logger']
+            if name != logger_name \
+                    and not (name and name.startswith(logger_prefix)):
+                return False
+        return True
+
+    # The record whose continuation lines may follow, and whether it is
+    # selected by the filters
+    record = None
+    selected = False
+    for line_offset, line in _iter_log_lines(log_filepath, offset, follow,
+                                             poll_interval):
+        if line is None:
+            # No new line for now (follow mode): the record is complete
+            if selected:
+                yield record
+            record = None
+            selected = False
+            continue
+        text = line.decode('utf-8', 'replace').rstrip("\r")
+        fields = parse_log_line(text, line_regex)
+        if fields is None and record is not None:
+            # Continuation of the previous message, e.g. a traceback
+            record['message'] += "\n" + text
+            continue
+        if selected:
+            yield record
+        if fields is None:
+            fields = (None, None, None, text)
+        record = dict(zip(('timestamp', 'level', 'logger', 'message'),
+                          fields), offset=line_offset)
+        selected = is_selected(record)
+    if selected:
+        yield record
+
+
 def setup_basic_logger(name, add_console_handler=False, add_file_handler=False,
                        console_format=None, file_format=None,
                        log_filepath="debug.log",
                        remove_all_initial_handlers=False,
-                       initial_handlers_to_remove=None):
+                       initial_handlers_to_remove=None, metrics=None,
+                       buffered_file_handler=False):
     """TODO: specify log level DEBUG used by default
 
+    The function can be called many times on the same logger: a handler is
+    only added if the logger doesn't already have an equivalent one. All the
+    loggers writing to the same log file share the same file handler (see
+    :func:`get_shared_file_handler`).
+
     Parameters
     ----------
     name
@@ -62,6 +2154,13 @@ def setup_basic_logger(name, add_console_handler=False, add_file_handler=False,
     log_filepath
     remove_all_initial_handlers
     initial_handlers_to_remove
+    metrics : LoggingMetrics, optional
+        If given, statistics are collected about the logger and its handlers
+        (the default value is None which implies that no statistics are
+        collected). See :class:`LoggingMetrics`.
+    buffered_file_handler : bool, optional
+        Whether the file handler writes the log records in batches (the
+        default value is False). See :class:`BufferedFileHandler`.
 
     Returns
     -------
@@ -77,7 +2176,8 @@ def setup_basic_logger(name, add_console_handler=False, add_file_handler=False,
         for h in handlers:
             if remove_all_initial_handlers or h in initial_handlers_to_remove:
                 logger.removeHandler(h)
-    if add_console_handler:
+    if add_console_handler and not _has_console_handler(
+            logger, console_format, logging.DEBUG):
         # Setup console handler
         ch = logging.StreamHandler()
         ch.setLevel(logging.DEBUG)
@@ -87,12 +2187,15 @@ def setup_basic_logger(name, add_console_handler=False, add_file_handler=False,
         logger.addHandler(ch)
     if add_file_handler:
         # Setup file handler
-        fh = logging.FileHandler(log_filepath)
-        fh.setLevel(logging.DEBUG)
-        if file_format:
-            formatter = logging.Formatter(console_format)
-            fh.setFormatter(formatter)
-        logger.addHandler(fh)
+        fh = get_shared_file_handler(log_filepath, file_format, logging.DEBUG,
+                                     buffered_file_handler)
+        if fh in logger.handlers:
+            # The logger already uses it, e.g. the function is called twice
+            fh.close()
+        else:
+            logger.addHandler(fh)
+    if metrics is not None:
+        metrics.track(logger)
     return logger
 
 
@@ -109,6 +2212,11 @@ def setup_logging_from_cfg(logging_config):
 
         2019-08-29-00-58-22-debug.log
 
+    The YAML configuration files are only parsed once as long as they don't
+    change: the parsed configs are cached by path, modification time and size.
+    For applying the changes of a configuration file while the program runs,
+    see :class:`LoggingConfigWatcher`.
+
     Parameters
     ----------
     logging_config : str or dict
@@ -141,28 +2249,293 @@ def setup_logging_from_cfg(logging_config):
     Logging`_.
 
     """
+    # NOTE: imported here since logging.config (and logging.handlers) is slow
+    # to import and only needed for setting up logging from a config
+    import logging.config
     try:
         # Check type of logging_config
         if isinstance(logging_config, str):
             # It is a YAML configuration file
-            config_dict = load_yaml(logging_config)
+            config_dict = _load_logging_cfg(logging_config)
         else:
             # It is a logging config dictionary
             config_dict = logging_config
-        if config_dict.get('add_datetime'):
-            # Add the datetime to the beginning of the log filename
-            # ref.: https://stackoverflow.com/a/45447081
-            filename = config_dict['handlers']['file']['filename']
-            # In case that the filename is a path, e.g. /test/debug.log
-            dirname = os.path.dirname(filename)
-            filename = os.path.basename(filename)
-            new_filename = '{:%Y-%m-%d-%H-%M-%S}-{}'.format(
-                datetime.now(), filename)
-            new_filename = os.path.join(dirname, new_filename)
-            config_dict['handlers']['file']['filename'] = new_filename
+        _add_datetime_to_filename(config_dict)
         # Update the logging config dict with new values from config_dict
         logging.config.dictConfig(config_dict)
     except (KeyError, OSError, ValueError):
         raise
     else:  # No error
         return config_dict
+
+
+def tail_log_records(log_filepath, nb_records=10, fmt=VERBOSE_FORMAT,
+                     follow=False, poll_interval=0.5, **filters):
+    """Read the last log records of a log file, like ``tail``.
+
+    The log file is memory-mapped and searched backwards for the beginning of
+    the last `nb_records` records. Thus, only the end of the file is read. In
+    follow mode, the records appended to the file are then read, like
+    ``tail -f``.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file.
+    nb_records : int, optional
+        Number of records read from the end of the file (the default value is
+        10). The filters are applied on these records.
+    fmt : str, optional
+        The format string of the formatter that wrote the log file, or 'json'
+        (the default value is `VERBOSE_FORMAT`).
+    follow : bool, optional
+        Whether to wait for the records appended to the file (the default
+        value is False).
+    poll_interval : float, optional
+        Number of seconds between two checks of the file in follow mode (the
+        default value is 0.5).
+    **filters
+        The filters `level`, `start`, `end` and `logger_name` of
+        :func:`read_log_records`.
+
+    Returns
+    -------
+    records : generator of dict
+        The log records, as yielded by :func:`read_log_records`.
+
+    Raises
+    ------
+    OSError
+        Raised if the log file can't be read.
+
+    """
+    import mmap
+    line_regex = None if fmt == 'json' else get_line_regex(fmt)
+    offset = 0
+    with open(log_filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size and nb_records > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Skip the last newline
+                end = size - 1 if mm[size - 1:size] == b"\n" else size
+                nb_found = 0
+                while end > 0:
+                    line_start = mm.rfind(b"\n", 0, end) + 1
+                    text = mm[line_start:end].decode('utf-8', 'replace')
+                    if parse_log_line(text.rstrip("\r"), line_regex):
+                        nb_found += 1
+                        if nb_found == nb_records:
+                            offset = line_start
+                            break
+                    end = line_start - 1
+    return read_log_records(log_filepath, fmt, follow=follow,
+                            poll_interval=poll_interval, offset=offset,
+                            **filters)
+
+
+def _add_datetime_to_filename(config_dict):
+    """Add the date and time to the filename of the file handler if the option
+    ``add_datetime`` is True.
+
+    Parameters
+    ----------
+    config_dict : dict
+        The logging config :obj:`dict`, modified in place.
+
+    Returns
+    -------
+    config_dict : dict
+        The same logging config :obj:`dict`.
+
+    Raises
+    ------
+    KeyError
+        Raised if the handler 'file' is not found.
+
+    """
+    if config_dict.get('add_datetime'):
+        handler_cfg = config_dict['handlers']['file']
+        if handler_cfg.get('class') in (
+                RotatingCompressedFileHandler,
+                'pyutils.logutils.RotatingCompressedFileHandler'):
+            # The handler adds the datetime itself, also to the new files
+            # created when the log file is rotated
+            handler_cfg['add_datetime'] = True
+        else:
+            handler_cfg['filename'] = _get_datetime_filename(
+                handler_cfg['filename'])
+    return config_dict
+
+
+def _get_datetime_filename(filename, timestamp=None):
+    """Add a date and time to the beginning of a log filename.
+
+    Parameters
+    ----------
+    filename : str
+        The log filename or path, e.g. /test/debug.log
+    timestamp : float, optional
+        The date and time as a POSIX timestamp (the default value is None
+        which implies that the current date and time is used).
+
+    Returns
+    -------
+    new_filename : str
+        The filename with the date and time, e.g.
+        /test/2019-08-29-00-58-22-debug.log
+
+    """
+    # Add the datetime to the beginning of the log filename
+    # ref.: https://stackoverflow.com/a/45447081
+    # In case that the filename is a path, e.g. /test/debug.log
+    dirname = os.path.dirname(filename)
+    filename = os.path.basename(filename)
+    new_filename = '{}-{}'.format(
+        time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime(timestamp)),
+        filename)
+    return os.path.join(dirname, new_filename)
+
+
+def _get_stat_key(filepath):
+    """Get what identifies a version of a file: its modification time (in
+    nanoseconds) and its size.
+
+    Raises
+    ------
+    OSError
+        Raised if the file doesn't exist.
+
+    """
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _has_console_handler(logger, fmt, level):
+    """Check if a logger already has a console handler writing to the current
+    :data:`sys.stderr` with the given format and level.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    fmt : str or None
+        Format string of the handler's formatter.
+    level : int
+        Log level of the handler.
+
+    Returns
+    -------
+    bool
+
+    """
+    for h in logger.handlers:
+        if type(h) is logging.StreamHandler and h.stream is sys.stderr \
+                and h.level == level \
+                and (h.formatter._fmt if h.formatter else None) == fmt:
+            return True
+    return False
+
+
+def _iter_log_lines(log_filepath, offset=0, follow=False, poll_interval=0.5):
+    """Read the lines of a log file with memory mapping.
+
+    Parameters
+    ----------
+    log_filepath : str
+        Path to the log file.
+    offset : int, optional
+        Byte offset where the reading starts (the default value is 0).
+    follow : bool, optional
+        Whether to wait for the lines appended to the file (the default value
+        is False).
+    poll_interval : float, optional
+        Number of seconds between two checks of the file in follow mode (the
+        default value is 0.5).
+
+    Yields
+    ------
+    line_offset : int
+        Byte offset of the line.
+    line : bytes or None
+        The line without its newline. In follow mode, None is yielded when
+        there is no new line for now.
+
+    Raises
+    ------
+    OSError
+        Raised if the log file can't be read.
+
+    """
+    import mmap
+    f = open(log_filepath, 'rb')
+    try:
+        inode = os.fstat(f.fileno()).st_ino
+        pos = offset
+        while True:
+            size = os.fstat(f.fileno()).st_size
+            if size < pos:
+                # The file was truncated
+                pos = 0
+            if size > pos:
+                # NOTE: the whole file is mapped but only the pages read are
+                # loaded in memory
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    find = mm.find
+                    while True:
+                        end = find(b"\n", pos)
+                        if end == -1:
+                            break
+                        yield pos, mm[pos:end]
+                        pos = end + 1
+                    if not follow and pos < size:
+                        # Last line without newline
+                        yield pos, mm[pos:size]
+                        pos = size
+            if not follow:
+                return
+            yield pos, None
+            time.sleep(poll_interval)
+            try:
+                if os.stat(log_filepath).st_ino != inode:
+                    # The file was replaced (e.g. rotated): read the new one
+                    f.close()
+                    f = open(log_filepath, 'rb')
+                    inode = os.fstat(f.fileno()).st_ino
+                    pos = 0
+            except FileNotFoundError:
+                # The file is being rotated
+                pass
+    finally:
+        f.close()
+
+
+def _load_logging_cfg(filepath):
+    """Load a YAML logging config file, parsing it only if it changed.
+
+    The parsed configs are cached by path, modification time and size.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the YAML logging config file.
+
+    Returns
+    -------
+    config_dict : dict
+        A copy of the parsed config that the caller can modify.
+
+    Raises
+    ------
+    OSError
+        Raised if any I/O related error occurs while reading the file, e.g. the
+        file doesn't exist or there is an error in the YAML structure of the
+        file.
+
+    """
+    from pyutils.genutils import load_yaml
+    filepath = os.path.abspath(filepath)
+    stat_key = _get_stat_key(filepath)
+    cached = _loggingConfigCache.get(filepath)
+    if cached is None or cached[0] != stat_key:
+        cached = (stat_key, load_yaml(filepath))
+        _loggingConfigCache[filepath] = cached
+    return copy.deepcopy(cached[1])
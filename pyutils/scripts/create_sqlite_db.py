@@ -47,12 +47,12 @@ def main():
     setup_basic_logger(
         name=__name__,
         add_console_handler=True,
-        handlers_to_remove=[logging.NullHandler])
+        initial_handlers_to_remove=[logging.NullHandler])
     # Setup logging for create_db
     setup_basic_logger(
         name=dbutils.__name__,
         add_console_handler=True,
-        handlers_to_remove=[logging.NullHandler]
+        initial_handlers_to_remove=[logging.NullHandler]
     )
     dbutils.SLEEP = args.sleep
     if args.disable_color:
@@ -0,0 +1,96 @@
+#!/usr/script/env python
+"""Script for indexing and searching log files.
+
+The log files are indexed incrementally in a SQLite database (see
+:mod:`pyutils.logsearch`): only the lines appended since the last run are
+read. Then, the indexed log records can be searched by text, level, logger
+name and date and time.
+
+Examples
+--------
+Index two log files and search the errors about a timeout::
+
+    $ search_logs -d logs.sqlite -i debug.log -i other.log -l ERROR timeout
+
+Search the records of the logger 'scripts' (and its children) since a date::
+
+    $ search_logs -d logs.sqlite --logger scripts --start "2019-08-29"
+
+"""
+
+import argparse
+import logging
+import sqlite3
+
+from pyutils.logsearch import DEFAULT_FORMAT, LogIndex
+from pyutils.logutils import get_error_msg, setup_basic_logger
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def main():
+    """Index the log files and print the log records found.
+
+    Returns
+    -------
+    retcode : int
+        0 if the search was done, 1 if an error occurred.
+
+    """
+    # Setup argument parser
+    parser = argparse.ArgumentParser(
+        description="Index and search log files")
+    parser.add_argument("text", nargs="?", default=None,
+                        help="Full-text query on the messages (FTS5 syntax)")
+    parser.add_argument("-d", "--database", default="logs.sqlite",
+                        help="Path to the SQLite database of the index")
+    parser.add_argument("-i", "--index", action="append", default=[],
+                        metavar="LOG_FILE",
+                        help="Log file to be indexed before the search (can "
+                             "be repeated)")
+    parser.add_argument("-f", "--format", default=DEFAULT_FORMAT,
+                        help="Format string of the log lines, or 'json'")
+    parser.add_argument("-l", "--level", action="append", default=None,
+                        help="Level of the log records, e.g. ERROR (can be "
+                             "repeated)")
+    parser.add_argument("--logger", default=None,
+                        help="Name of the logger (its children included)")
+    parser.add_argument("--start", default=None,
+                        help="Records logged at or after this date and time, "
+                             "e.g. '2019-08-29 00:58:22'")
+    parser.add_argument("--end", default=None,
+                        help="Records logged before this date and time")
+    parser.add_argument("-n", "--limit", type=int, default=100,
+                        help="Maximum number of records printed")
+    # Process command-line arguments
+    args = parser.parse_args()
+    # Setup logging for script
+    setup_basic_logger(
+        name=__name__,
+        add_console_handler=True,
+        initial_handlers_to_remove=[logging.NullHandler])
+    try:
+        with LogIndex(args.database, args.format) as index:
+            for log_filepath in args.index:
+                nb_records = index.index_file(log_filepath)
+                logger.info("{} new log records indexed from <color>{}"
+                            "</color>".format(nb_records, log_filepath))
+            records = index.search(args.text, args.level, args.logger,
+                                   args.start, args.end, args.limit)
+    except (OSError, sqlite3.Error) as e:
+        logger.error("<color>{}</color>".format(get_error_msg(e)))
+        return 1
+    for record in records:
+        print("{timestamp} | {logger} | {level} | {message}".format(**record))
+    return 0
+
+
+if __name__ == '__main__':
+    retcode = main()
+    msg = "\nScript exited with <color>{}</color>".format(retcode)
+    if retcode == 1:
+        logger.error(msg)
+    else:
+        logger.info(msg)
@@ -32,8 +32,11 @@ setup(name='py-common-utils',
       author='Raul C.',
       author_email='rchfe23@gmail.com',
       license='GPLv3',
-      packages=find_packages(exclude=['tests']),
+      packages=find_packages(exclude=['benchmarks', 'tests']),
       entry_points={
-        'console_scripts': ['create_sqlite_db=pyutils.scripts.create_sqlite_db:main']
+        'console_scripts': [
+            'create_sqlite_db=pyutils.scripts.create_sqlite_db:main',
+            'search_logs=pyutils.scripts.search_logs:main'
+        ]
       },
       zip_safe=False)
@@ -4,12 +4,24 @@
 
 """
 
+import asyncio
+import gc
+import io
 import logging
 import os
+import threading
+import time
 import unittest
+from unittest import mock
+import weakref
 
 from .utils import TestBase
-from pyutils.logutils import setup_basic_logger
+from pyutils.colored_logger import (
+    _compile_markup, _get_route, _render_markup, _ROUTE_COLOR, _ROUTE_RAW,
+    _ROUTE_SKIP, AsyncDispatcher, AsyncLoggerAdapter, flush_async_mode,
+    start_async_mode, stop_async_mode)
+from pyutils.genutils import read_file
+from pyutils.logutils import JsonFormatter, setup_basic_logger
 
 logging.getLogger(__name__).addHandler(logging.NullHandler)
 
@@ -40,27 +52,264 @@ class TestColoredLogging(TestBase):
         self.logger.info("The log message has the expected ANSI escape "
                          "sequence for coloring the message")
 
-    # @unittest.skip("test_add_handlers_back()")
-    def test_add_handlers_back(self):
+    # @unittest.skip("test_async_dispatcher_overflow()")
+    def test_async_dispatcher_overflow(self):
         """TODO
         """
-        self.logger.warning("\n\n<color>test_add_handlers_back()</color>")
-        self.logger.info("Testing <color>_add_removed_handlers()</color>...")
-        # Setup test logger
-        add_logger = setup_basic_logger(name="test_add")
-        # Setup console handler without adding it to the test logger
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.DEBUG)
-        # Add the handler to the logger's list of removed handlers
-        add_logger._removed_handlers.append(ch)
-        # Add the handler to the logger from the logger's list of removed handlers
-        add_logger._add_handlers_back()
-        # Assert that there is only one handler in the logger
-        nb_handlers = len(add_logger.handlers)
-        msg = "There should be only one handler but there are {} " \
-              "handlers".format(nb_handlers)
-        self.assertTrue(nb_handlers == 1, msg)
-        self.logger.info("The console handler was successfully added")
+        self.logger.warning("\n<color>test_async_dispatcher_overflow()</color>")
+        self.logger.info("Testing <color>AsyncDispatcher</color> with a full "
+                         "queue...")
+        # The background thread is not started so the queue stays full
+        for policy, expected_msgs in [("drop-new", ["0", "1"]),
+                                      ("drop-oldest", ["2", "3"])]:
+            dispatcher = AsyncDispatcher(queue_size=2, overflow_policy=policy)
+            for i in range(4):
+                record = logging.makeLogRecord({'msg': str(i)})
+                dispatcher.enqueue(self.logger, record)
+            msgs = [r.msg for _, r in list(dispatcher.queue.queue)]
+            msg = "The queued messages {} are not as expected {} with the " \
+                  "'{}' policy".format(msgs, expected_msgs, policy)
+            self.assertListEqual(msgs, expected_msgs, msg)
+            self.assertEqual(dispatcher.nb_dropped, 2)
+        with self.assertRaises(ValueError):
+            AsyncDispatcher(overflow_policy="bad-policy")
+        # The sentinel of stop() is never dropped to make room for a record
+        release = threading.Event()
+        blocked_logger = setup_basic_logger(
+            name="test_async_dispatcher_overflow",
+            remove_all_initial_handlers=True)
+        blocked_logger.propagate = False
+        blocked_logger.addHandler(logging.NullHandler())
+        blocked_logger.handlers[0].addFilter(
+            lambda record: release.wait(10) or True)
+        dispatcher = AsyncDispatcher(queue_size=2,
+                                     overflow_policy="drop-oldest")
+        dispatcher.start()
+        records = [logging.makeLogRecord({'msg': str(i),
+                                          'levelno': logging.INFO})
+                   for i in range(8)]
+        # The background thread is blocked by the first record
+        dispatcher.enqueue(blocked_logger, records[0])
+        while not dispatcher.queue.empty():
+            time.sleep(0.001)
+        for record in records[1:3]:
+            dispatcher.enqueue(blocked_logger, record)
+        # The queue is full: stop() waits for a free slot for the sentinel
+        stop_thread = threading.Thread(target=dispatcher.stop)
+        stop_thread.start()
+        while not dispatcher._stopped:
+            time.sleep(0.001)
+        for record in records[3:]:
+            dispatcher.enqueue(blocked_logger, record)
+        release.set()
+        stop_thread.join(10)
+        msg = "The background thread didn't get the sentinel"
+        self.assertFalse(stop_thread.is_alive(), msg)
+        self.assertEqual(dispatcher.nb_dropped, 5)
+        self.logger.info("The overflow policies dropped the expected records")
+
+    # @unittest.skip("test_async_mode()")
+    def test_async_mode(self):
+        """TODO
+        """
+        self.logger.warning("\n\n<color>test_async_mode()</color>")
+        self.logger.info("Testing <color>the asynchronous mode</color>...")
+        async_logger = setup_basic_logger(name="test_async_mode")
+        async_logger.propagate = False
+        stream = io.StringIO()
+        async_logger.addHandler(logging.StreamHandler(stream))
+        dispatcher = start_async_mode(queue_size=100)
+        try:
+            for i in range(10):
+                async_logger.info("<color>%s</color>", i)
+            flush_async_mode()
+            msg = "The log records were not handled by the background thread"
+            self.assertEqual(stream.getvalue().count("\n"), 10, msg)
+            self.assertEqual(dispatcher.nb_dropped, 0)
+        finally:
+            stop_async_mode()
+        self.logger.info("The background thread handled all the log records")
+
+    # @unittest.skip("test_async_mode_fork()")
+    @unittest.skipUnless(hasattr(os, 'fork'), "os.fork() is not available")
+    def test_async_mode_fork(self):
+        """Test that a forked child process handles its log records although
+        it doesn't inherit the background thread of the asynchronous mode.
+
+        """
+        self.logger.warning("\n\n<color>test_async_mode_fork()</color>")
+        self.logger.info("Testing <color>the asynchronous mode</color> in a "
+                         "forked process...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "fork.log")
+        fork_logger = setup_basic_logger(name="test_async_mode_fork",
+                                         remove_all_initial_handlers=True)
+        fork_logger.propagate = False
+        handler = logging.FileHandler(log_filepath)
+        fork_logger.addHandler(handler)
+        start_async_mode(queue_size=5)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                # Child: more records than the size of the queue
+                try:
+                    for i in range(20):
+                        fork_logger.info("<color>child %d</color>", i)
+                    handler.flush()
+                finally:
+                    os._exit(0)
+            deadline = time.time() + 10
+            while True:
+                child_pid, _ = os.waitpid(pid, os.WNOHANG)
+                if child_pid or time.time() > deadline:
+                    break
+                time.sleep(0.01)
+            if not child_pid:
+                os.kill(pid, 9)
+                os.waitpid(pid, 0)
+            msg = "The child process hung with a full queue"
+            self.assertTrue(child_pid, msg)
+        finally:
+            stop_async_mode()
+            fork_logger.removeHandler(handler)
+            handler.close()
+        msg = "The child's log records were not handled"
+        self.assertEqual(read_file(log_filepath).splitlines(),
+                         ["child {}".format(i) for i in range(20)], msg)
+        self.logger.info("The forked process handled its log records")
+
+    # @unittest.skip("test_async_logger_adapter()")
+    # The streams of the handlers are not TTYs
+    @mock.patch.dict(os.environ, {"FORCE_COLOR": "1"})
+    def test_async_logger_adapter(self):
+        """Test that AsyncLoggerAdapter handles the log records in a background
+        thread, in order and with colors.
+
+        """
+        self.logger.warning("\n\n<color>test_async_logger_adapter()</color>")
+        self.logger.info("Testing <color>AsyncLoggerAdapter</color>...")
+        adapter_logger = setup_basic_logger(name="test_async_logger_adapter",
+                                            remove_all_initial_handlers=True)
+        adapter_logger.propagate = False
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        adapter_logger.addHandler(handler)
+        handler_threads = set()
+        handler.addFilter(
+            lambda record: handler_threads.add(threading.get_ident()) or True)
+
+        async def log_messages():
+            async with AsyncLoggerAdapter(adapter_logger) as adapter:
+                for i in range(100):
+                    adapter.info("<color>%s</color>", i)
+                adapter.debug("Done")
+                await adapter.flush()
+                return stream.getvalue().splitlines()
+
+        lines = asyncio.run(log_messages())
+        adapter_logger.removeHandler(handler)
+        msg = "The log records were not handled in order"
+        color = adapter_logger._level_to_color['INFO']
+        self.assertEqual(lines[:3], ["\033[{}m{}\033[0m".format(color, i)
+                                     for i in range(3)], msg)
+        self.assertEqual(lines[-1], "Done", msg)
+        self.assertEqual(len(lines), 101)
+        msg = "The handler should be called from the background thread"
+        self.assertNotIn(threading.get_ident(), handler_threads, msg)
+        with self.assertRaises(TypeError):
+            AsyncLoggerAdapter(logging.Logger("not_colored"))
+        self.logger.info("The log records were handled in order in the "
+                         "background thread")
+
+    # @unittest.skip("test_async_logger_adapter_closed()")
+    def test_async_logger_adapter_closed(self):
+        """Test that AsyncLoggerAdapter refuses the log records once it is
+        closed instead of filling the queue of the stopped dispatcher.
+
+        """
+        self.logger.warning(
+            "\n\n<color>test_async_logger_adapter_closed()</color>")
+        self.logger.info("Testing <color>a closed AsyncLoggerAdapter</color>"
+                         "...")
+        adapter_logger = setup_basic_logger(
+            name="test_async_logger_adapter_closed",
+            remove_all_initial_handlers=True)
+        adapter_logger.propagate = False
+
+        async def log_after_close():
+            adapter = AsyncLoggerAdapter(adapter_logger, queue_size=2)
+            with self.assertRaises(TypeError):
+                adapter.log("INFO", "Not an integer level")
+            await adapter.aclose()
+            # With a blocking policy, the third record would block forever
+            for i in range(5):
+                with self.assertRaises(RuntimeError):
+                    adapter.info("After close %s", i)
+            return adapter
+
+        adapter = asyncio.run(
+            asyncio.wait_for(log_after_close(), timeout=10))
+        self.assertTrue(adapter.dispatcher.queue.empty())
+        # The stopped dispatcher also refuses the records of other adapters
+        dispatcher = AsyncDispatcher(queue_size=2)
+        dispatcher.start()
+        dispatcher.stop()
+        for i in range(5):
+            record = logging.makeLogRecord({'msg': str(i)})
+            dispatcher.enqueue(adapter_logger, record)
+        self.assertTrue(dispatcher.queue.empty())
+        self.assertEqual(dispatcher.nb_dropped, 5)
+        # A closed adapter and its dispatcher can be garbage collected, i.e.
+        # the exit function that stops the dispatcher is unregistered
+        adapter_ref = weakref.ref(adapter)
+        dispatcher_ref = weakref.ref(adapter.dispatcher)
+        del adapter
+        closed_adapter = AsyncLoggerAdapter(adapter_logger)
+        closed_adapter.close()
+        closed_dispatcher_ref = weakref.ref(closed_adapter.dispatcher)
+        del closed_adapter
+        gc.collect()
+        msg = "The closed adapter or its dispatcher is still alive"
+        self.assertIsNone(adapter_ref(), msg)
+        self.assertIsNone(dispatcher_ref(), msg)
+        self.assertIsNone(closed_dispatcher_ref(), msg)
+        self.logger.info("The closed adapter refused the log records")
+
+    # @unittest.skip("test_call_handlers()")
+    # The streams of the handlers are not TTYs
+    @mock.patch.dict(os.environ, {"FORCE_COLOR": "1"})
+    def test_call_handlers(self):
+        """TODO
+        """
+        self.logger.warning("\n\n<color>test_call_handlers()</color>")
+        self.logger.info("Testing <color>callHandlers()</color>...")
+        # Setup test logger with a console handler and a file handler
+        log_filepath = os.path.join(self.sandbox_tmpdir, 'test.log')
+        call_logger = setup_basic_logger(
+            name="test_call_handlers",
+            add_file_handler=True,
+            log_filepath=log_filepath)
+        stream = io.StringIO()
+        call_logger.addHandler(logging.StreamHandler(stream))
+        # Handler class added by mistake instead of a handler object
+        call_logger.addHandler(logging.NullHandler)
+        handlers = list(call_logger.handlers)
+        call_logger.info("Hello, <color>World</color>!")
+        # The handlers must not have been removed and added back
+        msg = "The handlers of the logger were modified"
+        self.assertListEqual(call_logger.handlers, handlers, msg)
+        # Only the console handler gets the colored message
+        info_color = call_logger._level_to_color['INFO']
+        expected_output = "Hello, \x1b[{}mWorld\x1b[0m!\n".format(info_color)
+        msg = "The console message '{}' is not as expected '{}'".format(
+            stream.getvalue(), expected_output)
+        self.assertEqual(stream.getvalue(), expected_output, msg)
+        for h in call_logger.handlers[:1]:
+            h.close()
+        log = read_file(log_filepath)
+        msg = "The log file '{}' is not as expected".format(log)
+        self.assertEqual(log, "Hello, World!\n", msg)
+        self.logger.info("The console handler got the colored message and the "
+                         "file handler got the message without tags")
 
     # @unittest.skip("test_all_logging_methods()")
     def test_all_logging_methods(self):
@@ -94,6 +343,23 @@ class TestColoredLogging(TestBase):
         self.logger.error("Exception message: <color>{}</color>".format(exc_msg))
         self.logger.info("All logging methods logged the expected messages")
 
+    # @unittest.skip("test_disabled_level()")
+    def test_disabled_level(self):
+        """TODO
+        """
+        self.logger.warning("\n\n<color>test_disabled_level()</color>")
+        self.logger.info("Testing <color>disabled log levels</color>...")
+        disabled_logger = setup_basic_logger(name="test_disabled_level")
+        disabled_logger.setLevel(logging.WARNING)
+        # The message must not be processed if the level is disabled
+        with mock.patch.object(disabled_logger, '_preprocess_msg') as m:
+            disabled_logger.debug("<color>DEBUG</color>")
+            disabled_logger.info(TypeError("INFO"))
+            disabled_logger.log(logging.DEBUG, "<color>LOG</color>")
+        msg = "The message was processed even though its level is disabled"
+        self.assertFalse(m.called, msg)
+        self.logger.info("The messages with disabled levels were not processed")
+
     # @unittest.skip("test_found_tags()")
     def test_found_tags(self):
         """TODO
@@ -109,34 +375,143 @@ class TestColoredLogging(TestBase):
         msg = "Tags were found in the log message: {}".format(log_msg2)
         self.assertFalse(found, msg)
 
-    # @unittest.skip("test_keep_everything_but()")
-    def test_keep_everything_but(self):
+    # @unittest.skip("test_get_route()")
+    # The streams of the handlers are not TTYs
+    @mock.patch.dict(os.environ, {"FORCE_COLOR": "1"})
+    def test_get_route(self):
         """TODO
         """
-        self.logger.warning("\n\n<color>test_keep_everything_but()</color>")
-        self.logger.info("Testing <color>_keep_everything_but()</color> "
-                         "(StreamHandler)...")
-        # Setup test logger
+        self.logger.warning("\n\n<color>test_get_route()</color>")
+        self.logger.info("Testing <color>_get_route()</color>...")
         log_filepath = os.path.join(self.sandbox_tmpdir, 'test.log')
-        keep_logger = setup_basic_logger(
-            name="test_keep_everything_but",
-            add_console_handler=True,
-            add_file_handler=True,
-            log_filepath=log_filepath)
-        # Keep only the file handler. The rests of handlers should be removed
-        keep_logger._keep_everything_but(
-            handlers_to_remove=[logging.StreamHandler])
-        # Assert that there is only one file handler in the test logger
-        nb_handlers = len(keep_logger.handlers)
-        msg = "There should be one handler in keep_logger but there are " \
-              "{} handlers".format(nb_handlers)
-        self.assertTrue(nb_handlers == 1, msg)
-        # Make sure that the handler left is a file handler
-        h = keep_logger.handlers[0]
-        msg = "The remaining handler '{}' is not of the expected type " \
-              "'{}'".format(h, logging.FileHandler)
-        self.assertIsInstance(h, logging.FileHandler, msg)
-        self.logger.info("Only the FileHandler is left in the logger")
+        fh = logging.FileHandler(log_filepath, delay=True)
+        handlers_and_routes = [
+            (logging.StreamHandler(), _ROUTE_COLOR),
+            (fh, _ROUTE_RAW),
+            (logging.NullHandler(), _ROUTE_RAW),
+            (logging.NullHandler, _ROUTE_SKIP)
+        ]
+        for h, expected_route in handlers_and_routes:
+            route = _get_route(h)
+            msg = "The route '{}' of the handler '{}' is not as expected " \
+                  "'{}'".format(route, h, expected_route)
+            self.assertEqual(route, expected_route, msg)
+        fh.close()
+        # The route is computed again when the formatter or the stream of the
+        # handler is replaced
+        sh = logging.StreamHandler()
+        self.assertEqual(_get_route(sh), _ROUTE_COLOR)
+        sh.setFormatter(JsonFormatter())
+        msg = "The JSON objects mustn't get color codes"
+        self.assertEqual(_get_route(sh), _ROUTE_RAW, msg)
+        sh.setFormatter(None)
+        self.assertEqual(_get_route(sh), _ROUTE_COLOR)
+        with mock.patch.dict(os.environ, {"FORCE_COLOR": "0"}):
+            sh.setStream(io.StringIO())
+            msg = "A stream that isn't a TTY mustn't get color codes"
+            self.assertEqual(_get_route(sh), _ROUTE_RAW, msg)
+        self.logger.info("The handlers have the expected routes")
+
+    # @unittest.skip("test_render_markup()")
+    def test_render_markup(self):
+        """Test that the attributes and the nested <color> tags are rendered
+        and that each message is compiled only once.
+
+        """
+        self.logger.warning("\n\n<color>test_render_markup()</color>")
+        self.logger.info("Testing <color>_render_markup()</color>...")
+        info_color = self.logger._level_to_color['INFO']
+        msgs_and_outputs = [
+            ("<color>%s</color>", "\033[{}m%s\033[0m".format(info_color)),
+            ('<color fg="red" bold>%s</color>', "\033[1;31m%s\033[0m"),
+            ("<color fg='bright_blue' bg=white>x</color>",
+             "\033[47;94mx\033[0m"),
+            ('<color fg="208" underline>x</color>',
+             "\033[4;38;5;208mx\033[0m"),
+            # Nested tags: the outer style is restored after the inner tag
+            ('a<color bold>b<color fg="red">c</color>d</color>e',
+             "a\033[1;{0}mb\033[1;31mc\033[0m\033[1;{0}md\033[0me".format(
+                 info_color)),
+            # Unknown attributes are ignored and unclosed tags are reset
+            ('<color fg="unknown" foo>x', "\033[{}mx\033[0m".format(
+                info_color)),
+            ("<log>Tom &amp; Jerry</log></color>", "Tom & Jerry")
+        ]
+        for log_msg, expected_output in msgs_and_outputs:
+            output = _render_markup(log_msg, 'INFO', self.logger._env)
+            msg = "The log message '{}' is not as expected '{}'".format(
+                output, expected_output)
+            self.assertEqual(output, expected_output, msg)
+            self.assertFalse(
+                self.logger._found_tags(self.logger._remove_all_tags(log_msg)))
+        # The compiled format string is reused with other arguments
+        fmt = "Item <color fg='cyan'>%s</color> <color>done</color>"
+        _compile_markup.cache_clear()
+        for level in ['DEBUG', 'INFO', 'ERROR']:
+            _render_markup(fmt, level, self.logger._env)
+        self.assertEqual(_compile_markup.cache_info().misses, 1)
+        self.logger.info("The attributes and the nested tags were rendered")
+
+    # @unittest.skip("test_supports_color()")
+    def test_supports_color(self):
+        """Test that the console handlers only get color codes when their
+        stream can display them.
+
+        """
+        self.logger.warning("\n\n<color>test_supports_color()</color>")
+        self.logger.info("Testing <color>_supports_color()</color>...")
+        tty_stream = io.StringIO()
+        tty_stream.isatty = lambda: True
+        envs_and_routes = [
+            ({}, io.StringIO(), _ROUTE_RAW),
+            ({}, tty_stream, _ROUTE_COLOR),
+            ({"NO_COLOR": "1"}, tty_stream, _ROUTE_RAW),
+            ({"TERM": "dumb"}, tty_stream, _ROUTE_RAW),
+            ({"PYCHARM_HOSTED": "1"}, io.StringIO(), _ROUTE_COLOR),
+            ({"FORCE_COLOR": "1"}, io.StringIO(), _ROUTE_COLOR),
+            ({"FORCE_COLOR": "1", "NO_COLOR": "1"}, io.StringIO(),
+             _ROUTE_COLOR),
+            ({"FORCE_COLOR": "0"}, io.StringIO(), _ROUTE_RAW)
+        ]
+        for env, stream, expected_route in envs_and_routes:
+            h = logging.StreamHandler(stream)
+            with mock.patch.dict(os.environ, env, clear=True):
+                route = _get_route(h)
+            msg = "The route '{}' with the environment {} is not as " \
+                  "expected '{}'".format(route, env, expected_route)
+            self.assertEqual(route, expected_route, msg)
+            # The route is cached: the environment is only checked once
+            self.assertEqual(_get_route(h), expected_route)
+        # A console handler that can't display colors gets the message
+        # without tags and without going through the markup rendering
+        color_logger = setup_basic_logger(name="test_supports_color",
+                                          remove_all_initial_handlers=True)
+        color_logger.propagate = False
+        stream = io.StringIO()
+        color_logger.addHandler(logging.StreamHandler(stream))
+        with mock.patch.dict(os.environ, {"NO_COLOR": "1"}, clear=True), \
+                mock.patch('pyutils.colored_logger._render_markup') as m:
+            color_logger.info("Hello, <color>World</color>!")
+        self.assertFalse(m.called, "The markup was rendered")
+        self.assertEqual(stream.getvalue(), "Hello, World!\n")
+        self.logger.info("Only the handlers that can display colors got the "
+                         "color codes")
+
+    # @unittest.skip("test_log()")
+    def test_log(self):
+        """TODO
+        """
+        self.logger.warning("\n\n<color>test_log()</color>")
+        self.logger.info("Testing <color>log()</color>...")
+        with self.assertLogs(self.logger, "DEBUG") as cm:
+            self.logger.log(logging.INFO, "Hello, <color>%s</color>!", "World")
+            self.logger.log(logging.ERROR, TypeError("ERROR"))
+        expected_messages = ["Hello, World!", "[TypeError] ERROR"]
+        messages = [r.getMessage() for r in cm.records]
+        self.assertListEqual(messages, expected_messages)
+        with self.assertRaises(TypeError):
+            self.logger.log("INFO", "The level must be an integer")
+        self.logger.info("log() logged the expected messages")
 
     # @unittest.skip("test_remove_all_tags()")
     def test_remove_all_tags(self):
@@ -150,59 +525,6 @@ class TestColoredLogging(TestBase):
         msg = "Tags were found in the log message: {}".format(raw_log_msg)
         self.assertFalse(found, msg)
 
-    # @unittest.skip("test_remove_everything_but()")
-    def test_remove_everything_but(self):
-        """TODO
-        """
-        self.logger.warning("\n\n<color>test_remove_everything_but()</color>")
-        self.logger.info("Testing <color>_remove_everything_but()</color> "
-                         "(StreamHandler)...")
-        # Setup test logger
-        log_filepath = os.path.join(self.sandbox_tmpdir, 'test.log')
-        remove_logger = setup_basic_logger(
-            name="test_remove_everything_but",
-            add_console_handler=True,
-            add_file_handler=True,
-            log_filepath=log_filepath)
-        # Remove all handlers but the console handler
-        remove_logger._remove_everything_but(
-            handlers_to_keep=[logging.StreamHandler])
-        # Assert that there is only one console handler in the test logger
-        nb_handlers = len(remove_logger.handlers)
-        msg = "There should be one handler in keep_logger but there are " \
-              "{} handlers".format(nb_handlers)
-        self.assertTrue(nb_handlers == 1, msg)
-        # Make sure that the handler left is a console handler
-        h = remove_logger.handlers[0]
-        msg = "The remaining handler '{}' is not of the expected type " \
-              "'{}'".format(h, logging.StreamHandler)
-        self.assertIsInstance(h, logging.StreamHandler, msg)
-        self.logger.info("Only the StreamHandler is left in the logger")
-
-    # @unittest.skip("test_remove_handler()")
-    def test_remove_handler(self):
-        """TODO
-        """
-        self.logger.warning("\n\n<color>test_remove_handler()</color>")
-        self.logger.info("Testing <color>_remove_handler()</color>...")
-        # Setup test logger
-        log_filepath = os.path.join(self.sandbox_tmpdir, 'test.log')
-        remove_logger = setup_basic_logger(
-            name="test_remove",
-            add_console_handler=True,
-            log_filepath=log_filepath)
-        msg = "There should only be one handler in remove_logger"
-        self.assertTrue(len(remove_logger.handlers) == 1, msg)
-        # Remove the handler from the test logger
-        ch = remove_logger.handlers[0]
-        remove_logger._remove_handler(ch)
-        # Assert that there should be no handler in the test logger
-        nb_handlers = len(remove_logger.handlers)
-        msg = "There should be no handler in remove_logger but there are " \
-              "{} handlers".format(nb_handlers)
-        self.assertTrue(nb_handlers == 0, msg)
-        self.logger.info("The console handler was successfully removed")
-
 
 if __name__ == '__main__':
     unittest.main()
@@ -6,18 +6,22 @@ Every functions in :mod:`~pyutils.genutils` are tested here.
 
 # TODO: add support for Python 3.4 and 3.5
 from datetime import datetime
+import json
 import os
 import time
 import unittest
+from unittest import mock
 
 import tzlocal
 import yaml
 
 from .utils import TestBase
 from pyutils.genutils import (
-    convert_utctime_to_local_tz, create_dir, create_timestamped_dir,
-    delete_folder_contents, dumps_json, dump_pickle, get_creation_date,
-    load_json, load_pickle, load_yaml, read_file, run_cmd, write_file)
+    FileCache, convert_utctime_to_local_tz, create_dir, create_timestamped_dir,
+    delete_folder_contents, dump_jsonl, dumps_json, dump_pickle,
+    get_creation_date, get_file_cache, iter_file, iter_json_array,
+    iter_jsonl, load_json, load_pickle, load_yaml, mmap_file,
+    read_binary_file, read_file, run_cmd, write_file)
 from pyutils.logutils import get_error_msg
 
 
@@ -405,6 +409,38 @@ class TestFunctions(TestBase):
         else:
             self.fail("An OSError exception was not raised as expected")
 
+    # @unittest.skip("test_dump_jsonl_and_iter_jsonl()")
+    def test_dump_jsonl_and_iter_jsonl(self):
+        """Test that dump_jsonl() writes records to a JSON Lines file and that
+        iter_jsonl() loads them back one by one.
+
+        """
+        self.logger.warning("\n\n<color>test_dump_jsonl_and_iter_jsonl()"
+                            "</color>")
+        self.logger.info("Testing <color>dump_jsonl() and iter_jsonl()"
+                         "</color>...")
+        # NOTE: U+2028 is a line separator for str.splitlines() but not for
+        # JSON Lines
+        records1 = [{'id': i, 'text': "line\u2028separator é"}
+                    for i in range(5)] + [[1, 2], None]
+        filepath = os.path.join(self.sandbox_tmpdir, "data.jsonl")
+        nb_records = dump_jsonl(filepath, (r for r in records1))
+        self.assertEqual(nb_records, len(records1))
+        self.assertEqual(len(read_file(filepath).split("\n")),
+                         len(records1) + 1)
+        records2 = iter_jsonl(filepath)
+        self.assertNotIsInstance(records2, list)
+        msg = "The JSON Lines records that were saved on disk are corrupted"
+        self.assertListEqual(list(records2), records1, msg)
+        write_file(filepath, '{"id": 1}\n\n{"id": 2\n')
+        with self.assertRaises(ValueError) as cm:
+            list(iter_jsonl(filepath))
+        self.assertIn("line 3", str(cm.exception))
+        with self.assertRaises(OSError):
+            iter_jsonl("/bad/file/path.jsonl")
+        self.logger.info("The JSON Lines records were saved and loaded "
+                         "correctly")
+
     # @unittest.skip("test_dump_and_load_pickle()")
     def test_dump_and_load_pickle(self):
         """Test that dump_pickle() dumps data to a file on disk and that
@@ -514,6 +550,140 @@ class TestFunctions(TestBase):
         self.logger.info("The JSON data was saved and loaded correctly with "
                          "its keys not sorted")
 
+    # @unittest.skip("test_dumps_and_load_json_case_3()")
+    def test_dumps_and_load_json_case_3(self):
+        """Test that dumps_json() in streaming mode writes the same JSON
+        document as without streaming.
+
+        Case 3 tests the streaming mode with small batches of elements so that
+        the top-level list and dict are split.
+
+        """
+        self.logger.warning("\n\n<color>test_dumps_and_load_json_case_3()"
+                            "</color>")
+        self.logger.info("Testing <color>case 3 of dumps_json() and "
+                         "load_json()</color> in streaming mode...")
+        filepath = os.path.join(self.sandbox_tmpdir, "data.json")
+        for data in [{'key{}'.format(i): [i, 'value é'] for i in range(7)},
+                     {1: 'int key', 'key': None}, list(range(7)), [], {},
+                     'string']:
+            for sort_keys in [True, False]:
+                if sort_keys and isinstance(data, dict) and 1 in data:
+                    continue
+                dumps_json(filepath, data, sort_keys=sort_keys)
+                expected = read_binary_file(filepath)
+                with mock.patch('pyutils.genutils._JSON_ITEMS_PER_CHUNK', 3):
+                    dumps_json(filepath, data, sort_keys=sort_keys,
+                               stream=True)
+                msg = "The streamed JSON document is not as expected"
+                self.assertEqual(read_binary_file(filepath), expected, msg)
+        self.logger.info("The streamed JSON documents are the same as without "
+                         "streaming")
+
+    # @unittest.skip("test_dumps_and_load_json_case_4()")
+    def test_dumps_and_load_json_case_4(self):
+        """Test that dumps_json() writes JSON data with a fast encoder which
+        load_json() loads back.
+
+        Case 4 tests the 'auto' encoder, which falls back to :mod:`json` if
+        no fast encoder is installed, and :mod:`orjson` if it is installed.
+
+        """
+        self.logger.warning("\n\n<color>test_dumps_and_load_json_case_4()"
+                            "</color>")
+        self.logger.info("Testing <color>case 4 of dumps_json() and "
+                         "load_json()</color> with a fast encoder...")
+        data1 = {
+            'key1': 'value1',
+            'key3': [1, 2.5, None, 2 ** 70],
+            'key2': 'valué2'
+        }
+        filepath = os.path.join(self.sandbox_tmpdir, "data.json")
+        encoders = ['auto']
+        try:
+            import orjson
+        except ImportError:
+            self.logger.info("orjson is not installed")
+        else:
+            encoders.append('orjson')
+        for encoder in encoders:
+            for stream in [False, True]:
+                data = data1 if encoder == 'auto' \
+                    else dict(data1, key3=[1, 2.5, None])
+                dumps_json(filepath, data, stream=stream, encoder=encoder)
+                data2 = load_json(filepath)
+                msg = "The JSON data that was saved on disk is corrupted"
+                self.assertDictEqual(data, data2, msg)
+                self.assertSequenceEqual(sorted(data.keys()),
+                                         list(data2.keys()))
+        with self.assertRaises(ValueError):
+            dumps_json(filepath, data1, encoder='simplejson')
+        self.logger.info("The JSON data was saved with the encoders "
+                         "{}".format(encoders))
+
+    # @unittest.skip("test_file_cache()")
+    def test_file_cache(self):
+        """Test that the loaders called with a cache only load a file again
+        when it is modified, and that the cached data can't be modified by
+        the callers.
+
+        """
+        self.logger.warning("\n\n<color>test_file_cache()</color>")
+        self.logger.info("Testing <color>FileCache</color>...")
+        filepath = os.path.join(self.sandbox_tmpdir, "data.json")
+        dumps_json(filepath, {'key1': [1, 2]})
+        cache = FileCache()
+        data = load_json(filepath, cache=cache)
+        with mock.patch('json.load') as m:
+            data2 = load_json(filepath, cache=cache)
+        msg = "The JSON file was loaded again even though it wasn't modified"
+        self.assertFalse(m.called, msg)
+        self.assertDictEqual(data, data2)
+        # Defensive copy: the cached data is not modified by the callers
+        data2['key1'].append(3)
+        self.assertDictEqual(load_json(filepath, cache=cache),
+                             {'key1': [1, 2]})
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+        # The modifications of the file are picked up
+        dumps_json(filepath, {'key1': [1, 2, 3]})
+        self.assertDictEqual(load_json(filepath, cache=cache),
+                             {'key1': [1, 2, 3]})
+        write_file(filepath + ".txt", "text")
+        self.assertEqual(read_file(filepath + ".txt", cache=cache), "text")
+        with open(filepath + ".txt", 'a') as f:
+            f.write(" appended in place")
+        self.assertEqual(read_file(filepath + ".txt", cache=cache),
+                         "text appended in place")
+        # Read-only views
+        readonly_cache = FileCache(readonly=True)
+        data = load_json(filepath, cache=readonly_cache)
+        self.assertIs(load_json(filepath, cache=readonly_cache), data)
+        with self.assertRaises(TypeError):
+            data['key2'] = 1
+        self.assertEqual(data['key1'], (1, 2, 3))
+        # LRU eviction by number of entries and by size
+        small_cache = FileCache(max_entries=2, max_bytes=100)
+        filepaths = []
+        for i in range(3):
+            filepaths.append(os.path.join(self.sandbox_tmpdir,
+                                          "file{}.txt".format(i)))
+            write_file(filepaths[-1], str(i) * 10)
+        for path in filepaths + filepaths[-1:]:
+            read_file(path, cache=small_cache)
+        stats = small_cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes']), (2, 20))
+        self.assertEqual((stats['hits'], stats['evictions']), (1, 1))
+        write_file(filepaths[0], "x" * 101)
+        read_file(filepaths[0], cache=small_cache)
+        self.assertEqual(small_cache.stats()['entries'], 2,
+                         "A file larger than max_bytes was cached")
+        with self.assertRaises(OSError):
+            read_file("/bad/file/path.txt", cache=True)
+        self.assertIsInstance(get_file_cache(), FileCache)
+        self.logger.info("The cached files were only loaded again when "
+                         "modified")
+
     # @unittest.skip("test_get_creation_date()")
     def test_get_creation_date(self):
         """Test that get_creation_date() returns a valid creation date for a
@@ -541,6 +711,115 @@ class TestFunctions(TestBase):
         self.logger.info("Current time: " + now)
         self.logger.info("Valid file creation date: " + creation)
 
+    # @unittest.skip("test_iter_file()")
+    def test_iter_file(self):
+        """Test that iter_file() yields the lines or the chunks of a file and
+        raises the same errors as read_file().
+
+        """
+        self.logger.warning("\n\n<color>test_iter_file()</color>")
+        self.logger.info("Testing <color>iter_file()</color>...")
+        text = "line 1\nline 2\nline 3"
+        filepath = os.path.join(self.sandbox_tmpdir, "file.txt")
+        write_file(filepath, text)
+        self.assertListEqual(list(iter_file(filepath)),
+                             ["line 1\n", "line 2\n", "line 3"])
+        chunks = list(iter_file(filepath, chunk_size=8))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual("".join(chunks), read_file(filepath))
+        chunks = list(iter_file(filepath, chunk_size=8, binary=True))
+        self.assertEqual(b"".join(chunks), read_binary_file(filepath))
+        # The errors are raised when calling the function, not when iterating
+        with self.assertRaises(OSError) as cm:
+            iter_file("/bad/file/path.txt")
+        self.logger.info("<color>Raised an OSError exception as expected:"
+                         "</color> {}".format(get_error_msg(cm.exception)))
+
+    # @unittest.skip("test_iter_json_array()")
+    def test_iter_json_array(self):
+        """Test that iter_json_array() yields the elements of the JSON array
+        of a file one by one.
+
+        The file is read by chunks of a few characters so that the elements
+        (e.g. the numbers) are split between chunks.
+
+        """
+        self.logger.warning("\n\n<color>test_iter_json_array()</color>")
+        self.logger.info("Testing <color>iter_json_array()</color>...")
+        data1 = [{'key1': 'valué1', 'key2': [1, 2.5e-10, None, True]},
+                 -12345.678, "string with ] and ,", [], {}, 10 ** 20]
+        filepath = os.path.join(self.sandbox_tmpdir, "data.json")
+        for read_size in [1, 3, 1 << 16]:
+            with mock.patch('pyutils.genutils._JSON_READ_SIZE', read_size):
+                for indent in [None, 2]:
+                    write_file(filepath, json.dumps(data1, indent=indent))
+                    msg = "The elements of the JSON array are not as expected"
+                    self.assertListEqual(list(iter_json_array(filepath)),
+                                         data1, msg)
+                for text, data in [("[]", []), (" [ 1 ] \n", [1])]:
+                    write_file(filepath, text)
+                    self.assertListEqual(list(iter_json_array(filepath)),
+                                         data)
+        for text in ["", '{"key": 1}', "[1, 2", "[1 2]", "[1]]"]:
+            write_file(filepath, text)
+            with self.assertRaises(ValueError):
+                list(iter_json_array(filepath))
+        with self.assertRaises(OSError):
+            iter_json_array("/bad/file/path.json")
+        self.logger.info("The elements of the JSON array were loaded one by "
+                         "one")
+
+    # @unittest.skip("test_iter_json_array_malformed()")
+    def test_iter_json_array_malformed(self):
+        """Test that iter_json_array() raises the error of a malformed element
+        without reading the rest of the file.
+
+        The error must have the same position, line and column as with
+        :func:`json.load`.
+
+        """
+        self.logger.warning(
+            "\n\n<color>test_iter_json_array_malformed()</color>")
+        self.logger.info("Testing <color>iter_json_array()</color> with a "
+                         "malformed element...")
+        filepath = os.path.join(self.sandbox_tmpdir, "data.json")
+        tail = ",\n".join(['{"key": "value", "number": 12345}'] * 100000)
+        for text in ['[1,\n {x}, ' + tail + ']',
+                     '[' + tail + ',\n  tru e, ' + tail + ']']:
+            write_file(filepath, text)
+            with self.assertRaises(json.JSONDecodeError) as cm:
+                json.loads(text)
+            expected = cm.exception
+            nb_chars_read = 0
+            open_ = open
+
+            def spy_open(*args, **kwargs):
+                f = open_(*args, **kwargs)
+                read = f.read
+
+                def spy_read(size=-1):
+                    nonlocal nb_chars_read
+                    chunk = read(size)
+                    nb_chars_read += len(chunk)
+                    return chunk
+
+                f.read = spy_read
+                return f
+
+            with mock.patch('pyutils.genutils.open', spy_open, create=True):
+                with self.assertRaises(json.JSONDecodeError) as cm:
+                    list(iter_json_array(filepath))
+            msg = "The error is not at the same position as with json.loads()"
+            self.assertEqual((cm.exception.pos, cm.exception.lineno,
+                              cm.exception.colno),
+                             (expected.pos, expected.lineno, expected.colno),
+                             msg)
+            self.assertEqual(str(cm.exception), str(expected))
+            msg = "The rest of the file was read after the malformed element"
+            self.assertLess(nb_chars_read - expected.pos, 2 * (1 << 16), msg)
+        self.logger.info("The error was raised without reading the rest of "
+                         "the file")
+
     # @unittest.skip("test_load_yaml()")
     def test_load_yaml(self):
         """Test that load_yaml() loads data correctly from a YAML file.
@@ -570,6 +849,30 @@ class TestFunctions(TestBase):
         self.assertDictEqual(data1, data2, msg)
         self.logger.info("The YAML data was saved and loaded correctly")
 
+    # @unittest.skip("test_mmap_file()")
+    def test_mmap_file(self):
+        """Test that mmap_file() returns a read-only view of the bytes of a
+        file and raises the same errors as read_file().
+
+        """
+        self.logger.warning("\n\n<color>test_mmap_file()</color>")
+        self.logger.info("Testing <color>mmap_file()</color>...")
+        filepath = os.path.join(self.sandbox_tmpdir, "file.txt")
+        write_file(filepath, "Hello World!\n")
+        view = mmap_file(filepath)
+        self.assertIsInstance(view, memoryview)
+        self.assertTrue(view.readonly)
+        self.assertEqual(bytes(view[:5]), b"Hello")
+        self.assertEqual(bytes(view), read_binary_file(filepath))
+        view.release()
+        # Empty file
+        write_file(filepath, "")
+        self.assertEqual(len(mmap_file(filepath)), 0)
+        with self.assertRaises(OSError) as cm:
+            mmap_file("/bad/file/path.txt")
+        self.logger.info("<color>Raised an OSError exception as expected:"
+                         "</color> {}".format(get_error_msg(cm.exception)))
+
     # @unittest.skip("test_read_file()")
     def test_read_file(self):
         """Test read_file() when a file doesn't exist.
@@ -614,6 +917,52 @@ class TestFunctions(TestBase):
         self.logger.info("<color>Command output:</color>")
         self.assertTrue(run_cmd("pwd") == 0)
 
+    # @unittest.skip("test_write_file_atomic()")
+    def test_write_file_atomic(self):
+        """Test that write_file(), dump_pickle() and dumps_json() replace the
+        file atomically with the given fsync policy.
+
+        A failed write must leave the file as is and no temporary file.
+
+        """
+        self.logger.warning("\n\n<color>test_write_file_atomic()</color>")
+        self.logger.info("Testing <color>the atomic writes</color>...")
+        filepath = os.path.join(self.sandbox_tmpdir, "atomic.txt")
+        write_file(filepath, "old\n")
+        os.chmod(filepath, 0o600)
+        # The data can't be written: the file is not modified
+        with self.assertRaises(TypeError):
+            write_file(filepath, 123)
+        self.assertEqual(read_file(filepath), "old\n")
+        pkl_filepath = os.path.join(self.sandbox_tmpdir, "atomic.pkl")
+        dump_pickle(pkl_filepath, [1, 2])
+        with self.assertRaises(Exception):
+            dump_pickle(pkl_filepath, [1, lambda: 2])
+        self.assertListEqual(load_pickle(pkl_filepath), [1, 2])
+        # Durability is opt-in: no fsync by default
+        with mock.patch('os.fsync') as m:
+            write_file(filepath, "default")
+            dump_pickle(pkl_filepath, [1, 2])
+            dumps_json(filepath + ".json", {'fsync': None})
+        self.assertEqual(m.call_count, 0)
+        # Number of fsyncs of each policy: the file and then its directory
+        for fsync, nb_fsyncs in [('none', 0), ('file', 1), ('file+dir', 2)]:
+            with mock.patch('os.fsync') as m:
+                write_file(filepath, fsync, fsync=fsync)
+                dumps_json(filepath + ".json", {'fsync': fsync}, fsync=fsync)
+            self.assertEqual(m.call_count, 2 * nb_fsyncs, fsync)
+            self.assertEqual(read_file(filepath), fsync)
+            self.assertDictEqual(load_json(filepath + ".json"),
+                                 {'fsync': fsync})
+        # The permissions of the file are kept
+        self.assertEqual(os.stat(filepath).st_mode & 0o777, 0o600)
+        with self.assertRaises(ValueError):
+            write_file(filepath, "new", fsync='always')
+        tmp_files = [f for f in os.listdir(self.sandbox_tmpdir)
+                     if f.endswith(".tmp")]
+        self.assertListEqual(tmp_files, [], "Temporary files were left")
+        self.logger.info("The files were replaced atomically")
+
     # @unittest.skip("test_read_file_case_1()")
     def test_write_and_read_file(self):
         """Test that write_file() writes text to a file on disk and that
@@ -0,0 +1,146 @@
+"""Module that defines tests for :mod:`~pyutils.logsearch`
+
+Every function in :mod:`~pyutils.logsearch` is tested here.
+
+"""
+
+import logging
+import os
+import unittest
+
+from .utils import TestBase
+from pyutils.logsearch import DEFAULT_FORMAT, LogIndex, get_line_regex
+from pyutils.logutils import JsonFormatter
+
+
+class TestFunctions(TestBase):
+    # TODO
+    test_module_name = "logsearch"
+
+    # @unittest.skip("test_get_line_regex()")
+    def test_get_line_regex(self):
+        """Test that get_line_regex() parses the log lines written with a
+        format string.
+
+        """
+        self.logger.warning("\n\n<color>test_get_line_regex()</color>")
+        self.logger.info("Testing <color>get_line_regex()</color>...")
+        regex = get_line_regex(DEFAULT_FORMAT)
+        line = "2019-08-29 00:58:22,123 | {:42} | {:8} | Done | 100%".format(
+            "scripts.scraper", "INFO")
+        fields = regex.match(line).groupdict()
+        self.assertEqual(fields['asctime'], "2019-08-29 00:58:22,123")
+        self.assertEqual(fields['name'].strip(), "scripts.scraper")
+        self.assertEqual(fields['levelname'], "INFO")
+        self.assertEqual(fields['message'], "Done | 100%")
+        msg = "A traceback line shouldn't match the format"
+        self.assertIsNone(regex.match("  File \"test.py\", line 1"), msg)
+        self.logger.info("The log line was parsed")
+
+    # @unittest.skip("test_log_index_case_1()")
+    def test_log_index_case_1(self):
+        """Test that LogIndex indexes a log file incrementally and searches its
+        log records.
+
+        Case 1 tests :class:`~pyutils.logsearch.LogIndex` with log lines
+        written with the default format.
+
+        """
+        self.logger.warning("\n\n<color>test_log_index_case_1()</color>")
+        self.logger.info("Testing <color>case 1 of LogIndex</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "debug.log")
+        db_filepath = os.path.join(self.sandbox_tmpdir, "logs.sqlite")
+        handler = logging.FileHandler(log_filepath)
+        handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        logger1 = logging.getLogger("test_logsearch.scraper")
+        logger2 = logging.getLogger("test_logsearch_other")
+        for logger in [logger1, logger2]:
+            logger.addHandler(handler)
+            logger.setLevel(logging.DEBUG)
+            logger.propagate = False
+        try:
+            logger1.info("Downloading page 1")
+            logger2.warning("Disk almost full")
+            try:
+                raise TimeoutError("Connection timeout")
+            except TimeoutError:
+                logger1.exception("Page 2 couldn't be downloaded")
+            with LogIndex(db_filepath) as index:
+                self.assertEqual(index.index_file(log_filepath), 3)
+                msg = "Nothing new should be indexed"
+                self.assertEqual(index.index_file(log_filepath), 0, msg)
+                # Resume from the last indexed offset
+                logger1.error("Page 3 couldn't be parsed")
+                self.assertEqual(index.index_file(log_filepath), 1)
+                # The traceback is part of the message
+                records = index.search("timeout")
+                self.assertEqual(len(records), 1)
+                self.assertEqual(records[0]['level'], "ERROR")
+                self.assertIn("TimeoutError: Connection timeout",
+                              records[0]['message'])
+                records = index.search(level="error")
+                self.assertEqual(len(records), 2)
+                # The records of 'test_logsearch_other' are not found
+                records = index.search(logger_name="test_logsearch")
+                self.assertEqual([r['message'].splitlines()[0]
+                                  for r in records],
+                                 ["Downloading page 1",
+                                  "Page 2 couldn't be downloaded",
+                                  "Page 3 couldn't be parsed"])
+                self.assertEqual(index.search(start="2000-01-01",
+                                              end="2000-01-02"), [])
+            # The index is kept in the database
+            with LogIndex(db_filepath) as index:
+                self.assertEqual(index.index_file(log_filepath), 0)
+                self.assertEqual(len(index.search(limit=10)), 4)
+        finally:
+            for logger in [logger1, logger2]:
+                logger.removeHandler(handler)
+            handler.close()
+        self.logger.info("The log file was indexed and searched")
+
+    # @unittest.skip("test_log_index_case_2()")
+    def test_log_index_case_2(self):
+        """Test that LogIndex indexes JSON log lines and reindexes a truncated
+        log file.
+
+        Case 2 tests :class:`~pyutils.logsearch.LogIndex` with log lines
+        written by :class:`~pyutils.logutils.JsonFormatter`.
+
+        """
+        self.logger.warning("\n\n<color>test_log_index_case_2()</color>")
+        self.logger.info("Testing <color>case 2 of LogIndex</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "debug.jsonl")
+        db_filepath = os.path.join(self.sandbox_tmpdir, "logs.sqlite")
+        handler = logging.FileHandler(log_filepath)
+        handler.setFormatter(JsonFormatter(
+            fields=['created', 'name', 'levelname', 'message']))
+        json_logger = logging.getLogger("test_logsearch_json")
+        json_logger.addHandler(handler)
+        json_logger.setLevel(logging.DEBUG)
+        json_logger.propagate = False
+        try:
+            json_logger.info("First message")
+            json_logger.warning("Second message")
+            with LogIndex(db_filepath, fmt='json') as index:
+                self.assertEqual(index.index_file(log_filepath), 2)
+                records = index.search(level="WARNING")
+                self.assertEqual(len(records), 1)
+                self.assertEqual(records[0]['logger'], "test_logsearch_json")
+                self.assertRegex(records[0]['timestamp'],
+                                 r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}$")
+                # The file is truncated, e.g. by a log rotation
+                handler.stream.truncate(0)
+                handler.stream.seek(0)
+                json_logger.info("Third message")
+                self.assertEqual(index.index_file(log_filepath), 1)
+                self.assertEqual([r['message'] for r in index.search()],
+                                 ["Third message"])
+        finally:
+            json_logger.removeHandler(handler)
+            handler.close()
+        self.logger.info("The JSON log file was indexed and searched")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,18 +4,141 @@ Every functions in :mod:`~pyutils.logutils` are tested here.
 
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+import gc
+import gzip
+import io
+import json
 import logging
+import os
+import time
 import unittest
+from unittest import mock
+import warnings
 
 from .utils import TestBase
-from pyutils.logutils import get_error_msg, setup_logging_from_cfg
+from pyutils.genutils import read_file, write_file
+from pyutils.logutils import (
+    BufferedFileHandler, JsonFormatter, LogCollector, LoggingConfigWatcher,
+    LoggingMetrics, RateLimitFilter, RingBufferHandler,
+    RotatingCompressedFileHandler, VERBOSE_FORMAT, get_error_msg,
+    get_shared_file_handler, init_worker_logging, load_ring_buffer,
+    read_log_records, setup_basic_logger, setup_logging_from_cfg,
+    tail_log_records)
+
+
+def log_in_worker(i):
+    """Log messages from a worker process.
+
+    It is used for testing :class:`~pyutils.logutils.LogCollector`.
+
+    Parameters
+    ----------
+    i : int
+        Number of the task.
+
+    """
+    logger = logging.getLogger("test_log_collector")
+    for j in range(10):
+        logger.info("Task %d: <color>message %d</color>", i, j)
+
+
+def log_entities_in_worker(value):
+    """Log a message whose format string and argument have HTML character
+    references from a worker process.
+
+    It is used for testing :class:`~pyutils.logutils.LogCollector`.
+
+    Parameters
+    ----------
+    value : str
+        The argument merged into the message.
+
+    """
+    logger = logging.getLogger("test_log_collector_entities")
+    logger.info("<color>%s</color> &lt;3", value)
 
 
 class TestFunctions(TestBase):
     # TODO
     test_module_name = "logutils"
 
+    # @unittest.skip("test_buffered_file_handler()")
+    def test_buffered_file_handler(self):
+        """Test that BufferedFileHandler writes the log records in batches.
+
+        """
+        self.logger.warning("\n\n<color>test_buffered_file_handler()</color>")
+        self.logger.info("Testing <color>BufferedFileHandler</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "buffered.log")
+        handler = BufferedFileHandler(log_filepath, buffer_size=20,
+                                      flush_interval=None)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        buffered_logger = setup_basic_logger(
+            name="test_buffered_file_handler",
+            remove_all_initial_handlers=True)
+        buffered_logger.addHandler(handler)
+        buffered_logger.propagate = False
+        try:
+            buffered_logger.info("one")
+            self.assertEqual(read_file(log_filepath), "",
+                             "The record should still be in the buffer")
+            # The ERROR is written right away with the records before it
+            buffered_logger.error("two")
+            self.assertEqual(read_file(log_filepath),
+                             "INFO one\nERROR two\n")
+            # The buffer is written when it is full
+            buffered_logger.info("three")
+            buffered_logger.info("four")
+            self.assertEqual(read_file(log_filepath),
+                             "INFO one\nERROR two\nINFO three\nINFO four\n")
+            buffered_logger.info("five")
+        finally:
+            buffered_logger.removeHandler(handler)
+            handler.close()
+        self.assertTrue(read_file(log_filepath).endswith("INFO five\n"),
+                        "The buffer should be written when closed")
+        # Periodic flush, with the handler setup from a logging config dict
+        log_filepath = os.path.join(self.sandbox_tmpdir, "periodic.log")
+        setup_logging_from_cfg({
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {'file': {
+                'class': 'pyutils.logutils.BufferedFileHandler',
+                'filename': log_filepath,
+                'flush_interval': 0.05,
+                'flush_level': 'CRITICAL'}},
+            'loggers': {'test_periodic_flush': {
+                'level': 'DEBUG', 'handlers': ['file'], 'propagate': False}}
+        })
+        periodic_logger = logging.getLogger("test_periodic_flush")
+        handler = periodic_logger.handlers[0]
+        try:
+            periodic_logger.error("six")
+            for _ in range(100):
+                if read_file(log_filepath):
+                    break
+                time.sleep(0.01)
+            self.assertEqual(read_file(log_filepath), "six\n")
+        finally:
+            periodic_logger.removeHandler(handler)
+            handler.close()
+        # The flush level is checked when the handler is created, not when
+        # the first record is handled
+        log_filepath = os.path.join(self.sandbox_tmpdir, "bad_level.log")
+        with self.assertRaises(ValueError):
+            BufferedFileHandler(log_filepath, flush_level="EROR")
+        with self.assertRaises(TypeError):
+            BufferedFileHandler(log_filepath, flush_level=None)
+        self.assertFalse(os.path.exists(log_filepath),
+                         "The log file shouldn't be opened")
+        handler = BufferedFileHandler(log_filepath, flush_interval=None,
+                                      flush_level="warning")
+        handler.close()
+        self.assertEqual(handler.flush_level, logging.WARNING)
+        self.logger.info("The log records were written in batches")
+
     # @unittest.skip("test_get_error_msg()")
     def test_get_error_msg(self):
         """Test that get_error_msg() returns an error message.
@@ -35,6 +158,617 @@ class TestFunctions(TestBase):
         self.logger.info("<color>The error message is the expected one:</color> "
                          "{}".format(error_msg))
 
+    # @unittest.skip("test_json_formatter()")
+    def test_json_formatter(self):
+        """Test that JsonFormatter writes one JSON object per log record.
+
+        The formatter is selected from a logging config dict and the color
+        tags must be removed from the messages.
+
+        """
+        self.logger.warning("\n\n<color>test_json_formatter()</color>")
+        self.logger.info("Testing <color>JsonFormatter</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, 'json.log')
+        config_dict = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {
+                'json': {
+                    'class': 'pyutils.logutils.JsonFormatter',
+                    'format': 'name levelname message'
+                }
+            },
+            'handlers': {
+                'file': {
+                    'class': 'logging.FileHandler',
+                    'filename': log_filepath,
+                    'formatter': 'json'
+                }
+            },
+            'loggers': {
+                'test_json_formatter': {
+                    'level': 'DEBUG',
+                    'handlers': ['file'],
+                    'propagate': False
+                }
+            }
+        }
+        setup_logging_from_cfg(config_dict)
+        json_logger = logging.getLogger('test_json_formatter')
+        json_logger.info('Hello, <color>"%s"</color>!', "World")
+        try:
+            raise TypeError("bad type")
+        except TypeError:
+            json_logger.exception("Error")
+        for h in json_logger.handlers:
+            h.close()
+        records = [json.loads(line)
+                   for line in read_file(log_filepath).splitlines()]
+        expected = {'name': 'test_json_formatter', 'levelname': 'INFO',
+                    'message': 'Hello, "World"!'}
+        self.assertDictEqual(records[0], expected)
+        msg = "The exception was not written in the JSON object"
+        self.assertIn("TypeError: bad type", records[1]['exc_info'], msg)
+        # The fields can also be given with the () key
+        formatter = JsonFormatter(fields=['levelno', 'message'])
+        record = logging.makeLogRecord({'msg': "<color>test</color>",
+                                        'levelno': logging.DEBUG})
+        self.assertEqual(formatter.format(record),
+                         '{"levelno": 10, "message": "test"}')
+        self.logger.info("The log records were written as JSON objects")
+
+    # @unittest.skip("test_log_collector()")
+    def test_log_collector(self):
+        """Test that LogCollector writes the log records of worker processes.
+
+        The worker processes send their log records to the collecting process
+        which is the only one that writes in the log file.
+
+        """
+        self.logger.warning("\n\n<color>test_log_collector()</color>")
+        self.logger.info("Testing <color>LogCollector</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, 'workers.log')
+        collector_logger = setup_basic_logger(
+            name="test_log_collector",
+            add_file_handler=True,
+            log_filepath=log_filepath,
+            remove_all_initial_handlers=True)
+        collector_logger.propagate = False
+        with LogCollector() as collector:
+            with ProcessPoolExecutor(max_workers=2,
+                                     initializer=init_worker_logging,
+                                     initargs=(collector.queue,)) as executor:
+                list(executor.map(log_in_worker, range(4)))
+        for h in collector_logger.handlers:
+            h.close()
+        lines = read_file(log_filepath).splitlines()
+        msg = "The log file has {} lines instead of 40".format(len(lines))
+        self.assertEqual(len(lines), 40, msg)
+        msg = "Some lines in the log file are corrupted or have tags"
+        self.assertTrue(all(line.startswith("Task ") and "<" not in line
+                            for line in lines), msg)
+        self.logger.info("All the log records of the worker processes were "
+                         "written in the log file")
+
+    # @unittest.skip("test_log_collector_entities()")
+    # The stream of the console handler is not a TTY
+    @mock.patch.dict(os.environ, {"FORCE_COLOR": "1"})
+    def test_log_collector_entities(self):
+        """Test that the collecting process only unescapes the HTML character
+        references of the format string, not of the arguments, like the
+        logging process.
+
+        """
+        self.logger.warning(
+            "\n\n<color>test_log_collector_entities()</color>")
+        self.logger.info("Testing <color>LogCollector</color> with HTML "
+                         "character references...")
+        collector_logger = setup_basic_logger(
+            name="test_log_collector_entities",
+            remove_all_initial_handlers=True)
+        collector_logger.propagate = False
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        collector_logger.addHandler(handler)
+        try:
+            # The expected output, rendered in the logging process
+            log_entities_in_worker("&amp;")
+            with LogCollector() as collector:
+                with ProcessPoolExecutor(
+                        max_workers=1, initializer=init_worker_logging,
+                        initargs=(collector.queue,)) as executor:
+                    list(executor.map(log_entities_in_worker, ["&amp;"]))
+        finally:
+            collector_logger.removeHandler(handler)
+        expected, line = stream.getvalue().splitlines()
+        self.assertIn("&amp;\033[0m <3", expected)
+        msg = "The argument of the worker's record was unescaped"
+        self.assertEqual(line, expected, msg)
+        self.logger.info("Only the format string was unescaped")
+
+    # @unittest.skip("test_logging_config_watcher()")
+    def test_logging_config_watcher(self):
+        """Test that LoggingConfigWatcher only applies the changes of a YAML
+        logging config file.
+
+        """
+        self.logger.warning("\n\n<color>test_logging_config_watcher()</color>")
+        self.logger.info("Testing <color>LoggingConfigWatcher</color>...")
+        cfg_template = """
+version: 1
+disable_existing_loggers: False
+formatters:
+  short:
+    format: "short %(message)s"
+  long:
+    format: "long %(levelname)s %(message)s"
+handlers:
+  file:
+    class: logging.FileHandler
+    filename: {filename}
+    formatter: {formatter}
+  unused:
+    class: logging.FileHandler
+    filename: {unused_filename}
+loggers:
+  test_logging_config_watcher:
+    level: {level}
+    handlers: [file]
+    propagate: False
+"""
+        cfg_filepath = os.path.join(self.sandbox_tmpdir, "logging.yaml")
+        log_filepath1 = os.path.join(self.sandbox_tmpdir, "first.log")
+        log_filepath2 = os.path.join(self.sandbox_tmpdir, "second.log")
+        unused_filepath = os.path.join(self.sandbox_tmpdir, "unused.log")
+
+        def write_cfg(**kwargs):
+            with open(cfg_filepath, 'w') as f:
+                f.write(cfg_template.format(unused_filename=unused_filepath,
+                                            **kwargs))
+            # Make sure that the modification time changes
+            stat = os.stat(cfg_filepath)
+            mtime_ns = stat.st_mtime_ns + next(mtime_offsets)
+            os.utime(cfg_filepath, ns=(mtime_ns, mtime_ns))
+
+        mtime_offsets = iter(range(10 ** 9, 10 ** 10, 10 ** 9))
+        write_cfg(filename=log_filepath1, formatter="short", level="INFO")
+        watcher = LoggingConfigWatcher(cfg_filepath)
+        self.assertTrue(watcher.check())
+        self.assertFalse(watcher.check(), "The file didn't change")
+        watched_logger = logging.getLogger("test_logging_config_watcher")
+        file_handler = watched_logger.handlers[0]
+        watched_logger.info("first")
+        watched_logger.debug("not logged")
+        # Change the level of the logger and the formatter of the handler
+        write_cfg(filename=log_filepath1, formatter="long", level="DEBUG")
+        self.assertTrue(watcher.check())
+        msg = "The file handler shouldn't have been rebuilt"
+        self.assertIs(watched_logger.handlers[0], file_handler, msg)
+        watched_logger.debug("second")
+        # Change the filename: the handler is rebuilt and the old one closed
+        write_cfg(filename=log_filepath2, formatter="long", level="DEBUG")
+        self.assertTrue(watcher.check())
+        self.assertEqual(len(watched_logger.handlers), 1)
+        self.assertIsNot(watched_logger.handlers[0], file_handler)
+        self.assertIsNone(file_handler.stream, "The old handler isn't closed")
+        watched_logger.info("third")
+        # The reloads don't leave any file open, e.g. of the unused handler.
+        # NOTE: a handler that isn't closed can still have its file closed
+        # when it is garbage collected, with a ResourceWarning.
+        # The garbage of the first setup (dictConfig() builds the unused
+        # handler too) is collected before the reloads.
+        gc.collect()
+        fds_dirpath = "/proc/self/fd"
+        nb_fds = len(os.listdir(fds_dirpath)) \
+            if os.path.isdir(fds_dirpath) else None
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            for level in ["INFO", "DEBUG"] * 3:
+                write_cfg(filename=log_filepath2, formatter="long",
+                          level=level)
+                self.assertTrue(watcher.check())
+            gc.collect()
+        msg = "The reloads left files open"
+        self.assertFalse([w for w in caught
+                          if issubclass(w.category, ResourceWarning)], msg)
+        if nb_fds is not None:
+            self.assertEqual(len(os.listdir(fds_dirpath)), nb_fds, msg)
+        self.assertEqual(watched_logger.level, logging.DEBUG)
+        watched_logger.handlers[0].close()
+        self.assertEqual(read_file(log_filepath1),
+                         "short first\nlong DEBUG second\n")
+        self.assertEqual(read_file(log_filepath2), "long INFO third\n")
+        self.logger.info("Only the changes of the config were applied")
+
+    # @unittest.skip("test_logging_metrics()")
+    def test_logging_metrics(self):
+        """Test that LoggingMetrics counts the log records, bytes and time by
+        logger and handler and writes them in the Prometheus text format.
+
+        """
+        self.logger.warning("\n\n<color>test_logging_metrics()</color>")
+        self.logger.info("Testing <color>LoggingMetrics</color>...")
+        metrics = LoggingMetrics()
+        stream = io.StringIO()
+        metrics_logger = setup_basic_logger(
+            name="test_logging_metrics", remove_all_initial_handlers=True)
+        handler = logging.StreamHandler(stream)
+        handler.set_name("memory")
+        metrics_logger.addHandler(handler)
+        metrics_logger.propagate = False
+        metrics.track(metrics_logger)
+        # Tracking twice has no effect
+        metrics.track(metrics_logger)
+        try:
+            metrics_logger.info("caf\u00e9")
+            metrics_logger.info("abc")
+            metrics_logger.warning("abc")
+            metrics_logger.debug("abc")
+        finally:
+            metrics.untrack(metrics_logger)
+            metrics_logger.removeHandler(handler)
+        metrics_logger.info("Not counted")
+        snapshot = metrics.snapshot()
+        logger_stats = snapshot['loggers']["test_logging_metrics"]
+        self.assertDictEqual(logger_stats['records'],
+                             {'INFO': 2, 'WARNING': 1, 'DEBUG': 1})
+        handler_stats = snapshot['handlers']["memory"]
+        self.assertEqual(handler_stats['records'], 4)
+        # 'café\n' is 6 bytes in UTF-8 and 'abc\n' is 4 bytes
+        self.assertEqual(handler_stats['bytes'], 6 + 3 * 4)
+        self.assertGreater(handler_stats['io_seconds'], 0)
+        self.assertNotIn('emit', vars(handler), "emit() should be restored")
+        prom_filepath = os.path.join(self.sandbox_tmpdir, "logging.prom")
+        metrics.write_prometheus(prom_filepath)
+        prom = read_file(prom_filepath)
+        self.assertIn('# TYPE pyutils_logging_records_total counter', prom)
+        self.assertIn('pyutils_logging_records_total{logger="test_logging_'
+                      'metrics",level="INFO"} 2', prom)
+        self.assertIn('pyutils_logging_handler_bytes_total{handler="memory"} '
+                      '18', prom)
+        metrics.reset()
+        self.assertDictEqual(
+            metrics.snapshot()['loggers']["test_logging_metrics"]['records'],
+            {})
+        self.logger.info("The metrics were collected and written")
+
+    # @unittest.skip("test_rate_limit_filter()")
+    def test_rate_limit_filter(self):
+        """Test that RateLimitFilter drops the repeated log messages and logs a
+        summary of the bursts.
+
+        """
+        self.logger.warning("\n\n<color>test_rate_limit_filter()</color>")
+        self.logger.info("Testing <color>RateLimitFilter</color>...")
+        rate_logger = setup_basic_logger(name="test_rate_limit_filter")
+        rate_filter = RateLimitFilter(rate=5, period=60, max_keys=2)
+        rate_logger.addFilter(rate_filter)
+        try:
+            with self.assertLogs(rate_logger, "DEBUG") as cm:
+                for i in range(100):
+                    rate_logger.info("Waiting <color>%s</color> seconds...", 8)
+                rate_logger.info("200: OK")
+                rate_logger.warning("200: OK")
+                # The first key was evicted and thus summarized
+                rate_filter.flush()
+        finally:
+            rate_logger.removeFilter(rate_filter)
+        messages = [r.getMessage() for r in cm.records]
+        expected_messages = ["Waiting 8 seconds..."] * 5 + [
+            "200: OK",
+            "Message repeated 95 times: Waiting 8 seconds...",
+            "200: OK"]
+        self.assertListEqual(messages, expected_messages)
+        msg = "The rate filter should only keep 2 keys"
+        self.assertEqual(len(rate_filter._keys), 2, msg)
+        self.logger.info("The repeated messages were dropped and summarized")
+
+    # @unittest.skip("test_read_log_records()")
+    def test_read_log_records(self):
+        """Test that read_log_records() parses and filters the log records of
+        a log file.
+
+        """
+        self.logger.warning("\n\n<color>test_read_log_records()</color>")
+        self.logger.info("Testing <color>read_log_records()</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "records.log")
+        line = "2019-08-29 00:58:{:02d},000 | {:42} | {:8} | {}\n"
+        with open(log_filepath, 'w') as f:
+            f.write(line.format(1, "scripts.scraper", "INFO", "Start"))
+            f.write(line.format(2, "scripts.scraper", "ERROR", "Failed"))
+            f.write("Traceback (most recent call last):\n")
+            f.write("TimeoutError: timeout\n")
+            f.write(line.format(3, "scripts_other", "WARNING", "Slow"))
+            f.write(line.format(4, "scripts.scraper", "DEBUG", "Done"))
+        records = list(read_log_records(log_filepath))
+        self.assertEqual([r['level'] for r in records],
+                         ["INFO", "ERROR", "WARNING", "DEBUG"])
+        self.assertEqual(records[1]['message'],
+                         "Failed\nTraceback (most recent call last):\n"
+                         "TimeoutError: timeout")
+        self.assertEqual(records[2]['logger'], "scripts_other")
+        # Filter by level, time range and logger
+        records = read_log_records(log_filepath, level='WARNING')
+        self.assertEqual([r['message'][:6] for r in records],
+                         ["Failed", "Slow"])
+        records = read_log_records(log_filepath, start="2019-08-29 00:58:02",
+                                   end="2019-08-29 00:58:04")
+        self.assertEqual([r['message'][:6] for r in records],
+                         ["Failed", "Slow"])
+        records = list(read_log_records(log_filepath, logger_name="scripts"))
+        self.assertEqual([r['message'][:6] for r in records],
+                         ["Start", "Failed", "Done"])
+        # Start from the offset of a record
+        offset = records[-1]['offset']
+        records = list(read_log_records(log_filepath, offset=offset))
+        self.assertEqual([r['message'] for r in records], ["Done"])
+        # An unknown level name is an error, not a failed comparison
+        with self.assertRaises(ValueError):
+            list(read_log_records(log_filepath, level='VERBOSE'))
+        with self.assertRaises(TypeError):
+            list(read_log_records(log_filepath, level=1.5))
+        records = read_log_records(log_filepath, level=logging.ERROR)
+        self.assertEqual([r['level'] for r in records], ["ERROR"])
+        self.logger.info("The log records were read and filtered")
+
+    # @unittest.skip("test_ring_buffer_handler()")
+    def test_ring_buffer_handler(self):
+        """Test that RingBufferHandler keeps the last log records and dumps
+        them when an error is logged.
+
+        The buffer is also tested with a memory-mapped file.
+
+        """
+        self.logger.warning("\n\n<color>test_ring_buffer_handler()</color>")
+        self.logger.info("Testing <color>RingBufferHandler</color>...")
+        ring_logger = setup_basic_logger(name="test_ring_buffer_handler")
+        ring_logger.propagate = False
+        stream = io.StringIO()
+        rh = RingBufferHandler(capacity=3, slot_size=16, dump_stream=stream)
+        ring_logger.addHandler(rh)
+        for i in range(5):
+            ring_logger.debug("<color>DEBUG %s</color>", i)
+        self.assertListEqual(rh.get_records(),
+                             ["DEBUG 2", "DEBUG 3", "DEBUG 4"])
+        msg = "The buffer was dumped before an error was logged"
+        self.assertEqual(stream.getvalue(), "", msg)
+        ring_logger.error("ERROR with a very long message")
+        self.assertEqual(stream.getvalue(),
+                         "DEBUG 3\nDEBUG 4\nERROR with a\n")
+        msg = "The buffer was not cleared after the dump"
+        self.assertListEqual(rh.get_records(), [], msg)
+        ring_logger.removeHandler(rh)
+        rh.close()
+        # Ring buffer backed by a file
+        filepath = os.path.join(self.sandbox_tmpdir, 'ring.buf')
+        rh = RingBufferHandler(capacity=3, filepath=filepath, dump_level=None)
+        ring_logger.addHandler(rh)
+        for i in range(4):
+            ring_logger.info("INFO %s", i)
+        ring_logger.removeHandler(rh)
+        rh.close()
+        expected_records = ["INFO 1", "INFO 2", "INFO 3"]
+        self.assertListEqual(load_ring_buffer(filepath), expected_records)
+        # The records are kept when the file is reopened
+        rh = RingBufferHandler(capacity=3, filepath=filepath)
+        self.assertListEqual(rh.get_records(), expected_records)
+        rh.close()
+        self.logger.info("The ring buffer kept the last log records")
+
+    # @unittest.skip("test_rotating_compressed_file_handler()")
+    def test_rotating_compressed_file_handler(self):
+        """Test that RotatingCompressedFileHandler rotates the log file by size
+        and compresses the rotated files.
+
+        """
+        self.logger.warning(
+            "\n\n<color>test_rotating_compressed_file_handler()</color>")
+        self.logger.info(
+            "Testing <color>RotatingCompressedFileHandler</color>...")
+        log_dirpath = os.path.join(self.sandbox_tmpdir, "rotating")
+        os.mkdir(log_dirpath)
+        log_filepath = os.path.join(log_dirpath, "debug.log")
+        handler = RotatingCompressedFileHandler(
+            log_filepath, max_bytes=100, backup_count=2, compression='gzip')
+        rotating_logger = setup_basic_logger(
+            name="test_rotating_compressed_file_handler",
+            remove_all_initial_handlers=True)
+        rotating_logger.addHandler(handler)
+        rotating_logger.propagate = False
+        try:
+            # 20 bytes per record, thus 5 records per file
+            for i in range(20):
+                rotating_logger.info("Log message #%03d", i)
+        finally:
+            rotating_logger.removeHandler(handler)
+            # Wait until the rotated files are compressed
+            handler.close()
+        self.assertEqual(read_file(log_filepath).splitlines(),
+                         ["Log message #{:03d}".format(i)
+                          for i in range(15, 20)])
+        rotated_filenames = sorted(f for f in os.listdir(log_dirpath)
+                                   if f != "debug.log")
+        msg = "Only the 2 most recent rotated files should be kept"
+        self.assertEqual(len(rotated_filenames), 2, msg)
+        lines = []
+        for filename in rotated_filenames:
+            self.assertRegex(filename, r"^\d{4}(-\d{2}){5}-debug\.log"
+                                       r"(\.\d+)?\.gz$")
+            with gzip.open(os.path.join(log_dirpath, filename), 'rt') as f:
+                lines.extend(f.read().splitlines())
+        self.assertEqual(sorted(lines), ["Log message #{:03d}".format(i)
+                                         for i in range(5, 15)])
+        # With the option add_datetime of a logging config
+        setup_logging_from_cfg({
+            'version': 1,
+            'add_datetime': True,
+            'disable_existing_loggers': False,
+            'handlers': {'file': {
+                'class': 'pyutils.logutils.RotatingCompressedFileHandler',
+                'filename': os.path.join(log_dirpath, "app.log"),
+                'delay': True}},
+            'loggers': {'test_rotating_add_datetime': {'handlers': ['file']}}
+        })
+        rotating_logger = logging.getLogger("test_rotating_add_datetime")
+        handler = rotating_logger.handlers[0]
+        rotating_logger.removeHandler(handler)
+        handler.close()
+        msg = "The handler should add the datetime to the log filename"
+        self.assertTrue(handler.add_datetime, msg)
+        self.assertRegex(os.path.basename(handler.baseFilename),
+                         r"^\d{4}(-\d{2}){5}-app\.log$")
+        self.logger.info("The log file was rotated and compressed")
+
+    # @unittest.skip("test_rotating_compressed_file_handler_bytes()")
+    def test_rotating_compressed_file_handler_bytes(self):
+        """Test that RotatingCompressedFileHandler counts the size of the log
+        file in bytes and ignores the other files with the same prefix.
+
+        """
+        self.logger.warning("\n\n<color>test_rotating_compressed_file_"
+                            "handler_bytes()</color>")
+        self.logger.info("Testing <color>RotatingCompressedFileHandler</color>"
+                         " with non-ASCII records and stray files...")
+        log_dirpath = os.path.join(self.sandbox_tmpdir, "rotating_bytes")
+        os.mkdir(log_dirpath)
+        log_filepath = os.path.join(log_dirpath, "debug.log")
+        # Files that share the prefix of the rotated files
+        stray_filenames = ["2020-01-01-00-00-00-debug.log.bak",
+                           "2020-01-01-00-00-00-debug.log.1.tmp"]
+        for filename in stray_filenames:
+            write_file(os.path.join(log_dirpath, filename), "stray")
+        handler = RotatingCompressedFileHandler(
+            log_filepath, encoding='utf8', max_bytes=50, backup_count=1,
+            compression=None)
+        rotating_logger = setup_basic_logger(
+            name="test_rotating_compressed_file_handler_bytes",
+            remove_all_initial_handlers=True)
+        rotating_logger.addHandler(handler)
+        rotating_logger.propagate = False
+        try:
+            # 12 characters but 21 bytes per record, thus 2 records per file
+            for i in range(6):
+                rotating_logger.info("%s %d", "é" * 9, i)
+        finally:
+            rotating_logger.removeHandler(handler)
+            handler.close()
+        msg = "The log file should be rotated by bytes, not by characters"
+        self.assertEqual(read_file(log_filepath).splitlines(),
+                         ["é" * 9 + " 4", "é" * 9 + " 5"], msg)
+        filenames = sorted(os.listdir(log_dirpath))
+        rotated_filenames = [f for f in filenames
+                             if f not in stray_filenames + ["debug.log"]]
+        msg = "Only the most recent rotated file should be kept"
+        self.assertEqual(len(rotated_filenames), 1, msg)
+        self.assertEqual(
+            read_file(os.path.join(log_dirpath, rotated_filenames[0])),
+            "é" * 9 + " 2\n" + "é" * 9 + " 3\n")
+        msg = "The stray files shouldn't be removed"
+        self.assertTrue(set(stray_filenames) <= set(filenames), msg)
+        self.logger.info("The log file was rotated by bytes and the stray "
+                         "files were ignored")
+
+    # @unittest.skip("test_shared_file_handler_teardown()")
+    def test_shared_file_handler_teardown(self):
+        """Test that tearing down one of the loggers sharing a file handler
+        doesn't close or untrack it for the other loggers.
+
+        """
+        self.logger.warning(
+            "\n\n<color>test_shared_file_handler_teardown()</color>")
+        self.logger.info("Testing the teardown of <color>a shared file "
+                         "handler</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "teardown.log")
+        metrics = LoggingMetrics()
+        logger1, logger2 = [
+            setup_basic_logger(name=name, add_file_handler=True,
+                               file_format="%(name)s: %(message)s",
+                               log_filepath=log_filepath,
+                               remove_all_initial_handlers=True,
+                               metrics=metrics)
+            for name in ["test_teardown_1", "test_teardown_2"]]
+        for logger in [logger1, logger2]:
+            logger.propagate = False
+        fh = logger1.handlers[0]
+        self.assertIs(fh, logger2.handlers[0])
+
+        def teardown(logger):
+            metrics.untrack(logger)
+            for h in list(logger.handlers):
+                logger.removeHandler(h)
+                h.close()
+
+        teardown(logger1)
+        msg = "The shared handler was closed for the other logger"
+        self.assertIsNotNone(fh.stream, msg)
+        msg = "The shared handler was untracked for the other logger"
+        self.assertIn('emit', vars(fh), msg)
+        logger2.info("after teardown")
+        self.assertEqual(read_file(log_filepath),
+                         "test_teardown_2: after teardown\n")
+        self.assertEqual(metrics.snapshot()['handlers'][
+            metrics._get_handler_label(fh)]['records'], 1)
+        teardown(logger2)
+        msg = "The shared handler should be closed by its last user"
+        self.assertIsNone(fh.stream, msg)
+        self.assertNotIn('emit', vars(fh))
+        self.logger.info("The shared handler was only closed by its last "
+                         "user")
+
+    # @unittest.skip("test_setup_basic_logger()")
+    def test_setup_basic_logger(self):
+        """Test that setup_basic_logger() shares the file handlers and doesn't
+        add duplicate handlers when called many times.
+
+        """
+        self.logger.warning("\n\n<color>test_setup_basic_logger()</color>")
+        self.logger.info("Testing <color>setup_basic_logger()</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "shared.log")
+        file_format = "%(name)s: %(message)s"
+        loggers = []
+        for name in ["test_basic_1", "test_basic_2", "test_basic_1"]:
+            loggers.append(setup_basic_logger(
+                name=name, add_console_handler=True, add_file_handler=True,
+                file_format=file_format, log_filepath=log_filepath))
+        logger1, logger2 = loggers[:2]
+        shared_fh = logger1.handlers[1]
+        try:
+            msg = "Repeated calls shouldn't add duplicate handlers"
+            self.assertEqual(len(logger1.handlers), 2, msg)
+            msg = "The loggers should share the same file handler"
+            self.assertIs(shared_fh, logger2.handlers[1], msg)
+            logger1.info("one")
+            logger2.info("two")
+        finally:
+            for logger in loggers[:2]:
+                # NOTE: a copy since the handlers are removed from the list
+                for h in list(logger.handlers):
+                    h.close()
+                    logger.removeHandler(h)
+        for logger in loggers[:2]:
+            self.assertListEqual(logger.handlers, [])
+        self.assertIsNone(shared_fh.stream, "The shared handler is not closed")
+        self.assertEqual(read_file(log_filepath),
+                         "test_basic_1: one\ntest_basic_2: two\n")
+        # Once closed, the shared handler is removed from the registry. The
+        # key is the one used by setup_basic_logger().
+        fh = get_shared_file_handler(log_filepath, file_format, logging.DEBUG,
+                                     False)
+        try:
+            msg = "The closed handler should be removed from the registry"
+            self.assertIsNot(fh, shared_fh, msg)
+            self.assertIsNotNone(fh.stream, "A new handler should be opened")
+        finally:
+            fh.close()
+        buffered_logger = setup_basic_logger(
+            name="test_basic_3", add_file_handler=True,
+            log_filepath=log_filepath, buffered_file_handler=True)
+        fh = buffered_logger.handlers[-1]
+        buffered_logger.removeHandler(fh)
+        fh.close()
+        self.assertIsInstance(fh, BufferedFileHandler)
+        self.logger.info("The file handler was shared")
+
     # @unittest.skip("test_setup_logging_case_1()")
     def test_setup_logging_case_1(self):
         """Test that setup_logging() can successfully setup logging from a
@@ -127,6 +861,45 @@ class TestFunctions(TestBase):
         self.logger.info("<color>Raised a KeyError exception as expected:"
                          "</color> {}".format(get_error_msg(cm.exception)))
 
+    # @unittest.skip("test_tail_log_records()")
+    def test_tail_log_records(self):
+        """Test that tail_log_records() reads the last log records of a log
+        file and follows the records appended to it.
+
+        """
+        self.logger.warning("\n\n<color>test_tail_log_records()</color>")
+        self.logger.info("Testing <color>tail_log_records()</color>...")
+        log_filepath = os.path.join(self.sandbox_tmpdir, "tail.log")
+        handler = logging.FileHandler(log_filepath)
+        handler.setFormatter(logging.Formatter(VERBOSE_FORMAT))
+        tail_logger = setup_basic_logger(name="test_tail_log_records",
+                                         remove_all_initial_handlers=True)
+        tail_logger.addHandler(handler)
+        tail_logger.propagate = False
+        try:
+            for i in range(10):
+                tail_logger.info("Message %d", i)
+            try:
+                raise ValueError("bad value")
+            except ValueError:
+                tail_logger.exception("Message 10")
+            records = list(tail_log_records(log_filepath, nb_records=3))
+            self.assertEqual([r['message'].splitlines()[0] for r in records],
+                             ["Message 8", "Message 9", "Message 10"])
+            records = tail_log_records(log_filepath, nb_records=1,
+                                       follow=True, poll_interval=0.01)
+            self.assertEqual(next(records)['message'].splitlines()[-1],
+                             "ValueError: bad value")
+            tail_logger.warning("Message 11")
+            record = next(records)
+            records.close()
+            self.assertEqual((record['level'], record['message']),
+                             ("WARNING", "Message 11"))
+        finally:
+            tail_logger.removeHandler(handler)
+            handler.close()
+        self.logger.info("The last log records were read and followed")
+
     def setup_logging_for_testing(self, logging_cfg):
         """Setup logging for testing from a logging config file or dict.
 
@@ -53,7 +53,7 @@ class TestBase(unittest.TestCase):
             add_console_handler=True,
             add_file_handler=cls.ADD_FILE_HANDLER,
             log_filepath=cls.log_filepath,
-            remove_all_handlers=True
+            remove_all_initial_handlers=True
         )
         # IMPORTANT: no printing before
         # Print name of module to be tested